@@ -1,81 +1,303 @@
+import io
+import time
 import pandas as pd
 import numpy as np
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from typing import Dict, Any, Optional, List, Tuple
 from ..models.api_models import AgentType
+from ..config import settings
+from .streaming_stats import StreamingAnalyzer
+from ..metrics import ANALYSIS_COMPUTE_SECONDS
+from ..services.deadlines import clamp
+from ..services.artifacts import artifact_store, current_artifact_scope, is_artifact_ref
 import asyncio
 
+EXECUTION_MODES = ("inline", "thread", "process")
+
+# Pools are shared by all AnalysisAgent instances so max_workers caps the whole process
+_executors: Dict[str, Executor] = {}
+
+def _get_executor(mode: str, max_workers: int) -> Executor:
+    executor = _executors.get(mode)
+    if executor is None:
+        if mode == "process":
+            executor = ProcessPoolExecutor(max_workers=max_workers)
+        else:
+            executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis")
+        _executors[mode] = executor
+    return executor
+
+def shutdown_executors():
+    for executor in _executors.values():
+        executor.shutdown(wait=False, cancel_futures=True)
+    _executors.clear()
+
+def _run_analysis(input_data: Dict[str, Any], scope: Optional[str] = None) -> Dict[str, Any]:
+    # Module-level so it can be pickled into a worker process
+    return AnalysisAgent(execution_mode="inline")._analyze(input_data, scope)
+
 class AnalysisAgent:
     agent_type = AgentType.analysis
 
-    def __init__(self):
-        pass
+    def __init__(
+        self,
+        execution_mode: Optional[str] = None,
+        max_workers: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ):
+        self.execution_mode = execution_mode or settings.analysis_execution_mode
+        if self.execution_mode not in EXECUTION_MODES:
+            raise ValueError(f"Unknown analysis execution mode: {self.execution_mode}")
+        self.max_workers = max_workers or settings.analysis_max_workers
+        self.timeout = timeout if timeout is not None else settings.analysis_timeout
 
     async def execute(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Main async entrypoint: receives raw input_data, processes, analyzes, and returns insights.
+        In thread/process mode the pandas work runs off the event loop, bounded by `timeout`.
+        A timeout stops waiting but cannot interrupt a job a pool worker has already
+        started: it runs to completion and keeps that worker busy until it does.
         """
         try:
-            df = self._preprocess(input_data)
-            stats = self._basic_statistics(df)
-            trends, patterns = self._trend_and_pattern_analysis(df)
-            insights = self._generate_insights(stats, trends, patterns)
-            confidence = self.get_confidence(df, stats, insights)
-            return {
-                "statistics": stats,
-                "trends": trends,
-                "patterns": patterns,
-                "insights": insights,
-                "confidence": confidence,
-            }
+            # Stage timings recorded inside a worker process stay there; "total" is always visible
+            with ANALYSIS_COMPUTE_SECONDS.time(stage="total"):
+                return await self._execute(input_data)
+        except asyncio.TimeoutError:
+            return self.handle_error(f"Analysis timed out after {self.timeout}s")
         except Exception as e:
             return self.handle_error(str(e))
 
+    async def _execute(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        scope = current_artifact_scope.get()
+        if self.execution_mode == "inline":
+            return self._analyze(input_data, scope)
+        if self.execution_mode == "process":
+            # Building the columns is pandas work too; keep it off the event loop
+            input_data = await asyncio.to_thread(self._columnar_payload, input_data)
+            # A worker process cannot publish into this process's artifact store
+            scope = None
+        loop = asyncio.get_running_loop()
+        job = loop.run_in_executor(
+            _get_executor(self.execution_mode, self.max_workers), _run_analysis, input_data, scope
+        )
+        # Timing out (or the caller being cancelled) cancels the job if it has not started yet;
+        # the budget is cut further by any workflow/step deadline in effect
+        return await asyncio.wait_for(job, clamp(self.timeout))
+
+    def _analyze(self, input_data: Dict[str, Any], scope: Optional[str] = None) -> Dict[str, Any]:
+        if input_data.get("stream") is not None:
+            with ANALYSIS_COMPUTE_SECONDS.time(stage="stream"):
+                return self._analyze_stream(input_data)
+        with ANALYSIS_COMPUTE_SECONDS.time(stage="preprocess"):
+            df = self._preprocess(input_data)
+        with ANALYSIS_COMPUTE_SECONDS.time(stage="statistics"):
+            summary = self._numeric_summary(df)
+            stats = self._basic_statistics(df, summary)
+            trends, patterns = self._trend_and_pattern_analysis(df, summary)
+        insights = self._generate_insights(stats, trends, patterns)
+        confidence = self.get_confidence(df, stats, insights)
+        result = {
+            "statistics": stats,
+            "trends": trends,
+            "patterns": patterns,
+            "insights": insights,
+            "confidence": confidence,
+        }
+        if scope is not None and settings.artifact_handoff and len(df) >= settings.artifact_min_rows:
+            # Downstream steps read the cleaned frame from the store instead of re-parsing it
+            result["artifact"] = artifact_store.put(df, scope=scope)
+        return result
+
+    def _analyze_stream(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Bounded-memory analysis of a CSV or JSON Lines source (path or file object)
+        read in chunks. Uses running mergeable statistics and approximate
+        (Bloom filter) row deduplication; missing values are skipped rather than
+        mean-filled, and distinct counts are HyperLogLog estimates.
+        """
+        source = input_data["stream"]
+        fmt = input_data.get("format", "csv")
+        chunksize = int(input_data.get("chunksize", settings.analysis_stream_chunksize))
+        if fmt == "csv":
+            reader = pd.read_csv(source, chunksize=chunksize)
+        elif fmt in ("jsonl", "ndjson"):
+            reader = pd.read_json(source, lines=True, chunksize=chunksize)
+        else:
+            raise ValueError(f"Unsupported stream format: {fmt}")
+
+        analyzer = StreamingAnalyzer(dedup_capacity=settings.analysis_stream_dedup_capacity)
+        with reader:
+            for chunk in reader:
+                analyzer.add_chunk(chunk)
+        if analyzer.rows == 0:
+            raise ValueError("Data is empty after preprocessing.")
+
+        summary = analyzer.summary()
+        stats = self._basic_statistics(None, summary)
+        trends, patterns = self._trend_and_pattern_analysis(None, summary)
+        insights = self._generate_insights(stats, trends, patterns)
+        insight_factor = min(len(insights) / len(analyzer.all_columns), 1)
+        confidence = round(0.5 * analyzer.completeness() + 0.5 * insight_factor, 2)
+        return {
+            "statistics": stats,
+            "trends": trends,
+            "patterns": patterns,
+            "insights": insights,
+            "confidence": confidence,
+        }
+
+    @staticmethod
+    def _columnar_payload(input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Converts record lists, column dicts and DataFrames to a dict of NumPy column
+        arrays, which pickle as contiguous buffers instead of per-cell Python objects
+        when sent to a worker process. Artifact references are resolved here since
+        the worker cannot see this process's store, and nothing is published back
+        from the worker.
+        """
+        records = AnalysisAgent._extract_records(input_data)
+        if is_artifact_ref(records) or AnalysisAgent._is_artifact_list(records):
+            records = AnalysisAgent._artifact_frame(records, input_data.get("columns"))
+        elif isinstance(records, (list, dict)) and records:
+            # Built exactly as _preprocess would, so the worker sees the same frame
+            records = pd.DataFrame(records)
+        if isinstance(records, pd.DataFrame):
+            # Drop the source records (from "data" or "results") so they are not pickled as well
+            payload = {k: v for k, v in input_data.items() if k not in ("data", "results")}
+            payload["data"] = {col: records[col].to_numpy() for col in records.columns}
+            return payload
+        return input_data
+
+    @staticmethod
+    def _extract_records(input_data: Dict[str, Any]) -> Any:
+        # Explicit None checks: DataFrames have no truth value
+        records = input_data.get("data")
+        if records is None or (isinstance(records, (list, str)) and not records):
+            records = input_data.get("results", records)
+        return records
+
+    @staticmethod
+    def _is_artifact_list(records: Any) -> bool:
+        return isinstance(records, list) and bool(records) and all(is_artifact_ref(r) for r in records)
+
+    @staticmethod
+    def _artifact_frame(records: Any, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Reads one or more stored frames, loading only `columns` when given."""
+        if is_artifact_ref(records):
+            return artifact_store.frame(records, columns)
+        return pd.concat([artifact_store.frame(ref, columns) for ref in records], ignore_index=True)
+
     def _preprocess(self, input_data: Dict[str, Any]) -> pd.DataFrame:
         """
         Validates and preprocesses input data into a clean DataFrame.
-        Accepts ResearchAgent output, CSV/JSON, or already structured records.
+        Accepts ResearchAgent output, CSV/JSON, already structured records, or
+        references to frames an earlier analysis step stored.
         """
         # Handle research output or direct data
-        records = input_data.get("data") or input_data.get("results")
+        records = self._extract_records(input_data)
         if records is None:
             raise ValueError("No data provided for analysis.")
+        if is_artifact_ref(records) or self._is_artifact_list(records):
+            # Stored frames were cleaned by the step that produced them
+            df = self._artifact_frame(records, input_data.get("columns"))
+            if df.empty:
+                raise ValueError("Data is empty after preprocessing.")
+            return df
         if isinstance(records, str):
             # Try to interpret as CSV or JSON string
             try:
                 df = pd.read_json(records)
             except Exception:
-                df = pd.read_csv(pd.compat.StringIO(records))
+                df = pd.read_csv(io.StringIO(records))
         elif isinstance(records, list):
             df = pd.DataFrame(records)
         elif isinstance(records, pd.DataFrame):
             df = records
+        elif isinstance(records, dict):
+            # Columnar input: column name -> array/list of values
+            df = pd.DataFrame(records)
         else:
             raise ValueError("Unsupported data format for analysis.")
 
         # Data cleaning: drop duplicates, handle missing values
         df = df.drop_duplicates()
-        df = df.apply(lambda col: col.fillna(col.mean()) if np.issubdtype(col.dtype, np.number) else col.fillna("N/A"))
+        numeric = df.select_dtypes(include=[np.number]).columns
+        if len(numeric):
+            df[numeric] = df[numeric].fillna(df[numeric].mean())
+        other = df.columns.difference(numeric, sort=False)
+        if len(other):
+            df[other] = df[other].fillna("N/A")
         if df.empty:
             raise ValueError("Data is empty after preprocessing.")
         return df
 
-    def _basic_statistics(self, df: pd.DataFrame) -> Dict[str, Any]:
+    def _numeric_summary(self, df: pd.DataFrame) -> Dict[str, Any]:
+        """
+        Vectorized pass over the numeric block as one 2-D float array: moments,
+        min/max, least-squares slope against row order and distinct counts for
+        every column at once.
+        """
+        numeric = df.select_dtypes(include=[np.number])
+        columns = list(numeric.columns)
+        block = numeric.to_numpy(dtype=np.float64, na_value=np.nan)
+        n = block.shape[0]
+        if not columns or n == 0:
+            empty = np.empty(0)
+            return {"columns": columns, "is_int": [], "n": n, "mean": empty, "std": empty,
+                    "min": empty, "max": empty, "slope": empty, "distinct": empty}
+
+        mean = block.mean(axis=0)
+        centered = block - mean
+        with np.errstate(invalid="ignore", divide="ignore"):
+            std = np.sqrt((centered * centered).sum(axis=0) / (n - 1)) if n > 1 else np.full(len(columns), np.nan)
+            # Closed-form OLS slope for all columns: cov(x, y) / var(x) with x = row index
+            x = np.arange(n, dtype=np.float64) - (n - 1) / 2.0
+            slope = (x @ centered) / (x @ x) if n > 1 else np.zeros(len(columns))
+
+        # Distinct counts: sort each column once, count value changes (NaNs sort last and are skipped)
+        ordered = np.sort(block, axis=0)
+        valid = ~np.isnan(ordered)
+        distinct = valid[0].astype(np.int64) + ((ordered[1:] != ordered[:-1]) & valid[1:]).sum(axis=0)
+
+        return {
+            "columns": columns,
+            "is_int": [pd.api.types.is_integer_dtype(dtype) for dtype in numeric.dtypes],
+            "n": n,
+            "mean": mean,
+            "std": std,
+            "min": block.min(axis=0),
+            "max": block.max(axis=0),
+            "slope": slope,
+            "distinct": distinct,
+        }
+
+    def _basic_statistics(self, df: Optional[pd.DataFrame], summary: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Computes statistics for numerical columns."""
-        return {col: {"mean": df[col].mean(), "std": df[col].std(), "min": df[col].min(), "max": df[col].max()}
-                for col in df.select_dtypes(include=[np.number]).columns}
-
-    def _trend_and_pattern_analysis(self, df: pd.DataFrame) -> Tuple[List[str], List[str]]:
-        """Stub: performs trend and pattern detection. Extend for ML or more advanced analytics."""
-        trends = []
-        patterns = []
-        # Example: rising trend detection on all numeric columns
-        for col in df.select_dtypes(include=[np.number]).columns:
-            series = df[col].values
-            if len(series) > 1 and np.polyfit(np.arange(len(series)), series, 1)[0] > 0:
-                trends.append(f"{col} shows an increasing trend.")
-            # Detect repeats/patterns
-            if df[col].nunique() < len(df) * 0.2:
-                patterns.append(f"{col} has many repeated values (potential pattern/cluster).")
+        summary = summary or self._numeric_summary(df)
+        stats = {}
+        for i, col in enumerate(summary["columns"]):
+            cast = int if summary["is_int"][i] and np.isfinite(summary["min"][i]) else float
+            stats[col] = {
+                "mean": float(summary["mean"][i]),
+                "std": float(summary["std"][i]),
+                "min": cast(summary["min"][i]),
+                "max": cast(summary["max"][i]),
+            }
+        return stats
+
+    def _trend_and_pattern_analysis(
+        self, df: Optional[pd.DataFrame], summary: Optional[Dict[str, Any]] = None
+    ) -> Tuple[List[str], List[str]]:
+        """Rising-trend and repeated-value detection for all numeric columns."""
+        summary = summary or self._numeric_summary(df)
+        columns = summary["columns"]
+        rising = summary["slope"] > 0 if summary["n"] > 1 else np.zeros(len(columns), dtype=bool)
+        repeated = summary["distinct"] < summary["n"] * 0.2
+        trends = [f"{col} shows an increasing trend." for col, flag in zip(columns, rising) if flag]
+        patterns = [
+            f"{col} has many repeated values (potential pattern/cluster)."
+            for col, flag in zip(columns, repeated) if flag
+        ]
         return trends, patterns
 
     def _generate_insights(self, stats: Dict[str, Any], trends: List[str], patterns: List[str]) -> List[str]:
@@ -1,13 +1,88 @@
-from typing import Dict, Any, List, Optional
+import math
+from typing import Dict, Any, Iterator, List, Optional, Sequence
 from ..models.api_models import AgentType
-import numpy as np
+
+def _recommendations(research: Dict[str, Any], analysis: Dict[str, Any], conf_research, conf_analysis) -> List[str]:
+    recommendations = []
+    if conf_analysis >= 0.6 and analysis.get("insights"):
+        recommendations.extend([f"Data insight: {msg}" for msg in analysis["insights"]])
+    if conf_research >= 0.6 and research.get("results"):
+        recommendations.extend([f"Research: {str(r)}" for r in research["results"]])
+    return recommendations or ["Insufficient data for automated decision."]
+
+def _decision(confidence: float, auto_approved: bool, recommendations: Optional[List[str]]) -> Dict[str, Any]:
+    result = {} if recommendations is None else {"recommendations": recommendations}
+    result.update({
+        "confidence": confidence,
+        "status": "auto_approved" if auto_approved else "human_verification_required",
+        "next_action": "Proceed automatically." if auto_approved else "Escalate to human review for low confidence.",
+    })
+    return result
+
+def _error(error: str) -> Dict[str, Any]:
+    return {
+        "recommendations": [],
+        "confidence": 0.0,
+        "status": "error",
+        "next_action": "Escalate to human review due to system error.",
+        "error": error,
+    }
+
+class DecisionBatch:
+    """
+    Result of `DecisionAgent.execute_many`: confidences and decisions as arrays,
+    with the per-item dicts (and their recommendation strings) only built when
+    an item is read.
+    """
+
+    def __init__(self, research, analysis, scores, confidence, auto_approved, invalid, thresholds):
+        self._research = research
+        self._analysis = analysis
+        self._scores = scores
+        self.confidence = confidence
+        self.auto_approved = auto_approved
+        self.invalid = invalid
+        self.thresholds = thresholds
+
+    def __len__(self) -> int:
+        return len(self.confidence)
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        return self.item(i)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return (self.item(i) for i in range(len(self)))
+
+    def item(self, i: int, include_recommendations: bool = True) -> Dict[str, Any]:
+        if self.invalid[i]:
+            return _error("Confidence is not a real number")
+        recommendations = None
+        if include_recommendations:
+            conf_research, conf_analysis = (-math.inf if math.isnan(c) else c for c in self._scores[i].tolist())
+            recommendations = _recommendations(self._research[i], self._analysis[i], conf_research, conf_analysis)
+        return _decision(float(self.confidence[i]), bool(self.auto_approved[i]), recommendations)
+
+    def results(self, include_recommendations: bool = True) -> List[Dict[str, Any]]:
+        return [self.item(i, include_recommendations) for i in range(len(self))]
+
+    def summary(self) -> Dict[str, int]:
+        errors = int(self.invalid.sum())
+        approved = int(self.auto_approved.sum())
+        return {
+            "total": len(self),
+            "auto_approved": approved,
+            "human_verification_required": len(self) - approved - errors,
+            "error": errors,
+        }
 
 class DecisionAgent:
     agent_type = AgentType.decision
 
-    def __init__(self, human_threshold: float = 0.7):
+    def __init__(self, human_threshold: float = 0.7, tenant_thresholds: Optional[Dict[str, float]] = None):
         # Below this confidence, trigger human-in-the-loop
         self.human_threshold = human_threshold
+        # Per-tenant overrides of human_threshold for execute_many
+        self.tenant_thresholds = dict(tenant_thresholds or {})
 
     async def execute(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -20,46 +95,75 @@ class DecisionAgent:
             conf_research = research.get("confidence", 0)
             conf_analysis = analysis.get("confidence", 0)
             confidence = self.get_confidence([conf_research, conf_analysis])
-
-            # Synthesize recommendations
-            recommendations = []
-            if conf_analysis >= 0.6 and analysis.get("insights"):
-                recommendations.extend([f"Data insight: {msg}" for msg in analysis["insights"]])
-            if conf_research >= 0.6 and research.get("results"):
-                recommendations.extend([f"Research: {str(r)}" for r in research["results"]])
-            
+            recommendations = _recommendations(research, analysis, conf_research, conf_analysis)
             # Basic logic: if both above threshold, auto decision; else, require human
-            decision_status = (
-                "auto_approved" if confidence >= self.human_threshold else "human_verification_required"
-            )
-            next_action = (
-                "Proceed automatically."
-                if decision_status == "auto_approved"
-                else "Escalate to human review for low confidence."
-            )
-            return {
-                "recommendations": recommendations or ["Insufficient data for automated decision."],
-                "confidence": confidence,
-                "status": decision_status,
-                "next_action": next_action,
-            }
+            return _decision(confidence, confidence >= self.human_threshold, recommendations)
         except Exception as e:
             return self.handle_error(str(e))
 
+    async def execute_many(
+        self,
+        inputs: Sequence[Dict[str, Any]],
+        tenants: Optional[Sequence[Optional[str]]] = None,
+        tenant_thresholds: Optional[Dict[str, float]] = None,
+    ) -> DecisionBatch:
+        """
+        Scores many research/analysis pairs at once. Only partly vectorized:
+        the confidences are pulled out of the input dicts in one Python pass,
+        then the geometric means, rounding and threshold decisions are array
+        operations. For numeric confidences the scores match `execute` item
+        for item. `tenants[i]` selects item i's threshold from
+        `tenant_thresholds` (or the agent's own), falling back to
+        `human_threshold`.
+        """
+        import numpy as np
+        research = [item.get("research") or {} for item in inputs]
+        analysis = [item.get("analysis") or {} for item in inputs]
+        # Non-numeric confidences are left out of the mean, as in get_confidence
+        scores = np.column_stack([
+            np.fromiter((_numeric(r.get("confidence", 0)) for r in research), dtype=float, count=len(research)),
+            np.fromiter((_numeric(a.get("confidence", 0)) for a in analysis), dtype=float, count=len(analysis)),
+        ])
+        counts = (~np.isnan(scores)).sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            confidence = np.where(counts > 0, np.nanprod(scores, axis=1) ** (1 / np.maximum(counts, 1)), 0.0)
+        # np.round scales by 100 first, and that product's rounding error can flip
+        # values within ~1e-15 of a .xx5 boundary (0.025 -> 0.02, where round()
+        # gives 0.03). Values within 1e-6 of a boundary go through round() so the
+        # scores agree with execute() exactly; everything else stays in numpy.
+        scaled = confidence * 100
+        near_half = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+        rounded = np.round(scaled) / 100
+        if near_half.any():
+            rounded[near_half] = [round(c, 2) for c in confidence[near_half].tolist()]
+        confidence = rounded
+        # A negative product has no real geometric mean
+        invalid = np.isnan(confidence)
+        thresholds = self._thresholds(len(scores), tenants, {**self.tenant_thresholds, **(tenant_thresholds or {})})
+        auto_approved = ~invalid & (confidence >= thresholds)
+        return DecisionBatch(research, analysis, scores, confidence, auto_approved, invalid, thresholds)
+
+    def _thresholds(self, size: int, tenants: Optional[Sequence[Optional[str]]], overrides: Dict[str, float]):
+        import numpy as np
+        if tenants is None or not overrides:
+            return np.full(size, self.human_threshold)
+        if len(tenants) != size:
+            raise ValueError("tenants must have one entry per input")
+        names, index = np.unique(np.array([t or "" for t in tenants], dtype=str), return_inverse=True)
+        table = np.array([overrides.get(name, self.human_threshold) for name in names], dtype=float)
+        return table[index]
+
     def get_confidence(self, confidences: List[float]) -> float:
         """Multi-factor aggregation for confidence."""
         confidences = [c for c in confidences if isinstance(c, (float, int))]
         if not confidences:
             return 0.0
         # Use geometric mean for conservative aggregation
-        confidence = float(np.prod(confidences) ** (1/len(confidences)))
+        confidence = float(math.prod(confidences) ** (1/len(confidences)))
         return round(confidence, 2)
 
     def handle_error(self, error: str) -> Dict[str, Any]:
-        return {
-            "recommendations": [],
-            "confidence": 0.0,
-            "status": "error",
-            "next_action": "Escalate to human review due to system error.",
-            "error": error,
-        }
+        return _error(error)
+
+def _numeric(value: Any) -> float:
+    return float(value) if isinstance(value, (float, int)) else math.nan
@@ -3,49 +3,198 @@ import httpx
 from typing import Dict, Any, List, Optional, Tuple
 from ..models.api_models import AgentTask, AgentResult, AgentType
 from ..config import settings
+from ..services.http_client import http_clients
+from ..services.result_cache import TTLCache, SingleFlight, SqliteCacheStore
+from ..services.batching import MicroBatcher
+from ..services.local_model import LocalModelBackend, get_local_backend
+from ..services.deadlines import DeadlineExceeded, remaining
+from ..services.resilience import backoff_delay, get_circuit_breaker, get_rate_limiter, parse_retry_after
+from ..metrics import CACHE_EVENTS, UPSTREAM_REQUESTS, UPSTREAM_RETRIES, UPSTREAM_SECONDS
 import time
 
+# Shared by every ResearchAgent instance in the process
+research_cache = TTLCache(
+    max_size=settings.research_cache_size,
+    ttl=settings.research_cache_ttl,
+    store=SqliteCacheStore(settings.research_cache_path) if settings.research_cache_path else None,
+)
+research_inflight = SingleFlight()
+
 class ResearchAgent:
     agent_type = AgentType.research
 
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        client: Optional[httpx.AsyncClient] = None,
+        cache: Optional[TTLCache] = None,
+        batch_size: Optional[int] = None,
+        batch_wait_ms: Optional[float] = None,
+        local_backend: Optional[LocalModelBackend] = None,
+        api_url: Optional[str] = None,
+    ):
         self.api_key = api_key or settings.huggingface_api_token
-        self.api_url = "https://api-inference.huggingface.co/models/microsoft/DialoGPT-large"
-        self.client = httpx.AsyncClient(timeout=20)
+        self.api_url = api_url or settings.research_api_url
+        if local_backend is None and settings.research_backend == "local":
+            if not settings.local_model_path:
+                raise ValueError("research_backend is 'local' but local_model_path is not set.")
+            local_backend = get_local_backend(settings.local_model_path)
+        self.local_backend = local_backend
+        self._client = client
+        self.cache = cache if cache is not None else research_cache
+        self.inflight = research_inflight
+        batch_size = batch_size or settings.research_batch_size
+        self.batcher = MicroBatcher(
+            self._post_batch,
+            max_batch_size=batch_size,
+            max_wait_ms=batch_wait_ms if batch_wait_ms is not None else settings.research_batch_wait_ms,
+        ) if batch_size > 1 else None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Shared pooled client unless one was injected; created lazily on the running loop
+        return self._client or http_clients.get("research")
+
+    async def warmup(self):
+        """Loads the local model ahead of the first query; the hosted API needs nothing."""
+        if self.local_backend is not None:
+            await self.local_backend.warmup()
 
     async def execute(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         query = input_data.get("query")
         if not query:
             raise ValueError("Missing research query input.")
 
-        # Basic retry logic for API call
-        max_attempts = 3
-        delay = 2
+        key = self._cache_key(query)
+        cached = await self.cache.aget(key)
+        CACHE_EVENTS.inc(result="miss" if cached is None else "hit")
+        if cached is not None:
+            return cached
+        # Identical queries already in flight share one upstream call
+        return await self.inflight.do(key, lambda: self._fetch_and_cache(key, query))
+
+    @property
+    def model_id(self) -> str:
+        if self.local_backend is not None:
+            return f"local:{self.local_backend.model_path}"
+        return self.api_url
+
+    def _cache_key(self, query: str) -> str:
+        normalized = " ".join(str(query).split()).casefold()
+        return f"{self.model_id}|{normalized}"
+
+    async def _fetch_and_cache(self, key: str, query: str) -> Dict[str, Any]:
+        result = await self._fetch(query)
+        if "error" not in result:
+            self.cache.set(key, result)
+        return result
+
+    async def _fetch(self, query: str) -> Dict[str, Any]:
+        try:
+            if self.local_backend is not None:
+                data = await self.local_backend.generate(query)
+            elif self.batcher is not None:
+                data = await self.batcher.submit(query)
+            else:
+                data = await self._post({"inputs": query})
+        except Exception as e:
+            return self.handle_error(str(e))
+        citations, sources = self.extract_citations(data)
+        confidence = self.get_confidence(sources)
+        return {
+            "results": data,
+            "citations": citations,
+            "sources": sources,
+            "confidence": confidence
+        }
+
+    async def _post_batch(self, queries: List[str]) -> List[Any]:
+        """Sends several queries as one batched `inputs` list and splits the reply per query."""
+        data = await self._post({"inputs": queries})
+        if not isinstance(data, list):
+            raise ValueError("Batched inference response is not a list.")
+        # Each item is shaped like a single-query response: a list of generations
+        return [item if isinstance(item, list) else [item] for item in data]
+
+    async def _post(self, payload: Dict[str, Any]) -> Any:
+        """
+        POSTs to the inference endpoint through the shared per-upstream rate
+        limiter and circuit breaker, retrying 429/5xx/transport errors with
+        jittered exponential backoff that honours Retry-After.
+        """
+        upstream = httpx.URL(self.api_url).host
+        limiter = get_rate_limiter(upstream)
+        breaker = get_circuit_breaker(upstream)
+        max_attempts = settings.upstream_max_attempts
+        last_error: Exception = RuntimeError("Exceeded max retry attempts")
         for attempt in range(1, max_attempts + 1):
+            await limiter.acquire()
+            retry_after = None
+            budget = remaining()
+            if budget is not None and budget <= 0:
+                raise DeadlineExceeded(f"Deadline exceeded before attempt {attempt}") from (
+                    last_error if attempt > 1 else None
+                )
+            # Taken last: a half-open trial slot is only held while the request is on the wire
+            breaker.before_call()
+            recorded = False
+            start = time.perf_counter()
             try:
                 response = await self.client.post(
                     self.api_url,
-                    json={"inputs": query},
-                    headers={"Authorization": f"Bearer {self.api_key}"}
+                    json=payload,
+                    headers={"Authorization": f"Bearer {self.api_key}"},
+                    # Never wait on the upstream past the step/workflow deadline
+                    **({"timeout": self._timeout_within(budget)} if budget is not None else {}),
                 )
-                if response.status_code == 429:
-                    await asyncio.sleep(delay * attempt)
-                    continue
-                response.raise_for_status()
-                data = response.json()
-                citations, sources = self.extract_citations(data)
-                confidence = self.get_confidence(sources)
-                return {
-                    "results": data,
-                    "citations": citations,
-                    "sources": sources,
-                    "confidence": confidence
-                }
-            except (httpx.HTTPError, Exception) as e:
-                if attempt == max_attempts:
-                    return self.handle_error(str(e))
-                await asyncio.sleep(delay * attempt)
-        return self.handle_error("Exceeded max retry attempts")
+            except httpx.HTTPError as e:
+                UPSTREAM_REQUESTS.inc(upstream=upstream, status="transport_error")
+                breaker.record_failure()
+                recorded = True
+                last_error = e
+                retry_reason = "transport_error"
+            else:
+                UPSTREAM_REQUESTS.inc(upstream=upstream, status=response.status_code)
+                retry_reason = "429" if response.status_code == 429 else "5xx"
+                if response.status_code == 429 or response.status_code >= 500:
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                    if response.status_code == 429:
+                        # Throttling says nothing about upstream health; the limiter handles it
+                        limiter.on_throttle(retry_after)
+                    else:
+                        breaker.record_failure()
+                        recorded = True
+                    last_error = httpx.HTTPStatusError(
+                        f"Upstream returned {response.status_code}", request=response.request, response=response
+                    )
+                else:
+                    # Any other answer means the upstream is reachable; 4xx is not retried
+                    breaker.record_success()
+                    recorded = True
+                    response.raise_for_status()
+                    limiter.on_success()
+                    return response.json()
+            finally:
+                if not recorded:
+                    # 429 or cancellation: hand a half-open trial slot back instead of leaking it
+                    breaker.release()
+                UPSTREAM_SECONDS.observe(time.perf_counter() - start, upstream=upstream)
+            if attempt < max_attempts:
+                delay = backoff_delay(attempt, settings.upstream_backoff_base, settings.upstream_backoff_cap, retry_after)
+                budget = remaining()
+                if budget is not None and delay >= budget:
+                    # The retry could not finish before the deadline anyway
+                    break
+                UPSTREAM_RETRIES.inc(upstream=upstream, reason=retry_reason)
+                await asyncio.sleep(delay)
+        raise last_error
+
+    @staticmethod
+    def _timeout_within(budget: float) -> httpx.Timeout:
+        return httpx.Timeout(
+            min(settings.research_timeout, budget),
+            connect=min(settings.research_connect_timeout, budget),
+        )
 
     def extract_citations(self, api_data: Any) -> Tuple[List[str], List[Dict[str, Any]]]:
         # Adapt for HuggingFace response format
@@ -57,7 +206,7 @@ class ResearchAgent:
             result = api_data[0]
             if isinstance(result, dict) and "generated_text" in result:
                 # Create mock citation/source for demo
-                citations.append(f"Generated by {self.api_url}")
+                citations.append(f"Generated by {self.model_id}")
                 sources.append({
                     "quality": "high",
                     "relevance": 0.8,
@@ -107,5 +256,7 @@ class ResearchAgent:
             return 0.0
 
     async def get_health(self) -> bool:
+        if self.local_backend is not None:
+            return True
         # Check API key availability
         return bool(self.api_key)
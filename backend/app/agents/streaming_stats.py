@@ -0,0 +1,223 @@
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List, Optional
+
+def hash_values(values: np.ndarray) -> np.ndarray:
+    """Stable 64-bit hashes for a 1-D array of values."""
+    return pd.util.hash_array(np.asarray(values, dtype=object) if values.dtype.kind == "O" else values)
+
+class HyperLogLog:
+    """Approximate distinct counter with 2**p registers (~1.04/sqrt(2**p) relative error)."""
+
+    def __init__(self, p: int = 12):
+        self.p = p
+        self.m = 1 << p
+        self.registers = np.zeros(self.m, dtype=np.uint8)
+
+    def add_hashes(self, hashes: np.ndarray):
+        if hashes.size == 0:
+            return
+        hashes = hashes.astype(np.uint64, copy=False)
+        index = (hashes >> np.uint64(64 - self.p)).astype(np.int64)
+        rest = hashes & np.uint64((1 << (64 - self.p)) - 1)
+        # Position of the leftmost 1-bit in the remaining (64 - p) bits; exact in float64 for p >= 12
+        _, bit_length = np.frexp(rest.astype(np.float64))
+        rank = (64 - self.p) - bit_length + 1
+        np.maximum.at(self.registers, index, rank.astype(np.uint8))
+
+    def merge(self, other: "HyperLogLog"):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def count(self) -> float:
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        estimate = alpha * self.m * self.m / np.sum(np.exp2(-self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * self.m and zeros:
+            # Small-range correction: linear counting
+            estimate = self.m * np.log(self.m / zeros)
+        return float(estimate)
+
+class BloomFilter:
+    """Fixed-size Bloom filter over 64-bit hashes, used for approximate row deduplication."""
+
+    def __init__(self, capacity: int = 1_000_000, error_rate: float = 0.001):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * np.log(error_rate) / (np.log(2) ** 2)))
+        self.hash_count = max(1, int(round(self.size / capacity * np.log(2))))
+        self.bits = np.zeros((self.size + 7) // 8, dtype=np.uint8)
+
+    def _positions(self, hashes: np.ndarray) -> np.ndarray:
+        # Double hashing: position_i = h1 + i * h2
+        h1 = (hashes & np.uint64(0xFFFFFFFF)).astype(np.uint64)
+        h2 = (hashes >> np.uint64(32)) | np.uint64(1)
+        steps = np.arange(self.hash_count, dtype=np.uint64)
+        return ((h1[:, None] + steps[None, :] * h2[:, None]) % np.uint64(self.size)).astype(np.int64)
+
+    def contains(self, hashes: np.ndarray) -> np.ndarray:
+        positions = self._positions(hashes.astype(np.uint64, copy=False))
+        return ((self.bits[positions >> 3] >> (positions & 7).astype(np.uint8)) & 1).all(axis=1)
+
+    def add(self, hashes: np.ndarray):
+        flat = self._positions(hashes.astype(np.uint64, copy=False)).ravel()
+        np.bitwise_or.at(self.bits, flat >> 3, (1 << (flat & 7)).astype(np.uint8))
+
+    def add_new(self, hashes: np.ndarray) -> np.ndarray:
+        """Adds the hashes and returns a mask of the ones that were (probably) not seen before."""
+        hashes = hashes.astype(np.uint64, copy=False)
+        # Repeats inside the same chunk are not in the filter yet
+        new = ~self.contains(hashes) & ~pd.Series(hashes).duplicated().to_numpy()
+        self.add(hashes[new])
+        return new
+
+class ScalableBloomFilter:
+    """
+    Bloom filter that starts at `initial_capacity` and adds stages of doubling
+    capacity as it fills, so memory follows the rows actually seen rather
+    than a worst-case guess. Stage error rates halve each time, keeping the
+    overall false-positive rate under `error_rate`.
+    """
+
+    def __init__(self, initial_capacity: int = 100_000, error_rate: float = 0.001):
+        self.initial_capacity = initial_capacity
+        self.error_rate = error_rate
+        self.stages: List[BloomFilter] = []
+        self._fill = 0  # hashes added to the newest stage
+
+    @property
+    def nbytes(self) -> int:
+        return sum(stage.bits.nbytes for stage in self.stages)
+
+    def add_new(self, hashes: np.ndarray) -> np.ndarray:
+        """Adds the hashes and returns a mask of the ones that were (probably) not seen before."""
+        hashes = hashes.astype(np.uint64, copy=False)
+        new = ~pd.Series(hashes).duplicated().to_numpy()
+        for stage in self.stages:
+            new &= ~stage.contains(hashes)
+        count = int(new.sum())
+        if not count:
+            return new
+        if not self.stages or self._fill + count > self.stages[-1].capacity:
+            capacity = max(2 * self.stages[-1].capacity if self.stages else self.initial_capacity, count)
+            self.stages.append(BloomFilter(capacity, self.error_rate * 0.5 ** (len(self.stages) + 1)))
+            self._fill = 0
+        self.stages[-1].add(hashes[new])
+        self._fill += count
+        return new
+
+class RunningColumnStats:
+    """
+    Mergeable per-column statistics over numeric chunks: count, mean and M2
+    (Welford/Chan), min/max, a streaming least-squares slope against the global
+    row index and a HyperLogLog distinct count. Missing values are skipped.
+    """
+
+    def __init__(self, columns: List[str], is_int: List[bool], hll_precision: int = 12):
+        self.columns = columns
+        self.is_int = is_int
+        k = len(columns)
+        self.count = np.zeros(k)
+        self.mean = np.zeros(k)
+        self.m2 = np.zeros(k)
+        self.mean_x = np.zeros(k)
+        self.m2_x = np.zeros(k)
+        self.c_xy = np.zeros(k)
+        self.min = np.full(k, np.inf)
+        self.max = np.full(k, -np.inf)
+        self.sketches = [HyperLogLog(hll_precision) for _ in columns]
+
+    def update(self, block: np.ndarray, row_index: np.ndarray):
+        valid = ~np.isnan(block)
+        count = valid.sum(axis=0).astype(np.float64)
+        if not count.any():
+            return
+        x = np.broadcast_to(row_index.astype(np.float64)[:, None], block.shape)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(valid, block, 0).sum(axis=0) / count
+            mean_x = np.where(valid, x, 0).sum(axis=0) / count
+            dy = np.where(valid, block - mean, 0)
+            dx = np.where(valid, x - mean_x, 0)
+        self._merge(
+            count,
+            np.nan_to_num(mean),
+            (dy * dy).sum(axis=0),
+            np.nan_to_num(mean_x),
+            (dx * dx).sum(axis=0),
+            (dx * dy).sum(axis=0),
+        )
+        self.min = np.fmin(self.min, np.nanmin(np.where(valid, block, np.inf), axis=0))
+        self.max = np.fmax(self.max, np.nanmax(np.where(valid, block, -np.inf), axis=0))
+        for i, sketch in enumerate(self.sketches):
+            sketch.add_hashes(hash_values(block[valid[:, i], i]))
+
+    def _merge(self, count, mean, m2, mean_x, m2_x, c_xy):
+        total = self.count + count
+        with np.errstate(invalid="ignore", divide="ignore"):
+            weight = np.where(total > 0, self.count * count / total, 0)
+            share = np.where(total > 0, count / total, 0)
+        delta = mean - self.mean
+        delta_x = mean_x - self.mean_x
+        self.m2 += m2 + delta * delta * weight
+        self.m2_x += m2_x + delta_x * delta_x * weight
+        self.c_xy += c_xy + delta_x * delta * weight
+        self.mean += delta * share
+        self.mean_x += delta_x * share
+        self.count = total
+
+    def summary(self, n_rows: int) -> Dict[str, Any]:
+        """Same shape as AnalysisAgent._numeric_summary."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            std = np.sqrt(self.m2 / (self.count - 1))
+            slope = self.c_xy / self.m2_x
+        empty = self.count == 0
+        return {
+            "columns": self.columns,
+            "is_int": self.is_int,
+            "n": n_rows,
+            "mean": np.where(empty, np.nan, self.mean),
+            "std": np.where(self.count > 1, std, np.nan),
+            "min": np.where(empty, np.nan, self.min),
+            "max": np.where(empty, np.nan, self.max),
+            "slope": np.nan_to_num(slope),
+            "distinct": np.array([round(s.count()) for s in self.sketches]),
+        }
+
+class StreamingAnalyzer:
+    """Consumes DataFrame chunks and keeps only bounded-size running state."""
+
+    def __init__(self, dedup_capacity: int = 100_000, dedup_error_rate: float = 0.001):
+        # Starts at dedup_capacity rows and grows with the stream
+        self.dedup = ScalableBloomFilter(dedup_capacity, dedup_error_rate)
+        self.stats: Optional[RunningColumnStats] = None
+        self.all_columns: List[str] = []
+        self.non_null: Dict[str, int] = {}
+        self.rows = 0
+
+    def add_chunk(self, chunk: pd.DataFrame):
+        if chunk.empty:
+            return
+        if self.stats is None:
+            numeric = chunk.select_dtypes(include=[np.number])
+            self.stats = RunningColumnStats(
+                list(numeric.columns), [pd.api.types.is_integer_dtype(d) for d in numeric.dtypes]
+            )
+            self.all_columns = list(chunk.columns)
+        row_hashes = pd.util.hash_pandas_object(chunk, index=False).to_numpy()
+        chunk = chunk[self.dedup.add_new(row_hashes)]
+        if chunk.empty:
+            return
+        for col, present in chunk.notnull().sum().items():
+            self.non_null[col] = self.non_null.get(col, 0) + int(present)
+        block = np.column_stack([
+            pd.to_numeric(chunk[col], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+            if col in chunk else np.full(len(chunk), np.nan)
+            for col in self.stats.columns
+        ]) if self.stats.columns else np.empty((len(chunk), 0))
+        self.stats.update(block, np.arange(self.rows, self.rows + len(chunk)))
+        self.rows += len(chunk)
+
+    def summary(self) -> Dict[str, Any]:
+        return self.stats.summary(self.rows)
+
+    def completeness(self) -> float:
+        cells = self.rows * len(self.all_columns)
+        return sum(self.non_null.values()) / cells if cells else 0.0
@@ -1,5 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException
-from ...models.api_models import AgentTask, AgentResult, AgentType
+import tempfile
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Request
+from ...models.api_models import AgentTask, AgentResult, AgentType, DecisionBatchRequest, DecisionBatchResponse
+from ...agents.decision_agent import DecisionAgent
+from ...services.serialization import trusted_response
+from ...config import settings
 
 router = APIRouter()
 
@@ -17,3 +22,43 @@ async def execute_agent_task(task: AgentTask):
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Agent processing failed: {e}")
+
+@router.post("/analysis/stream", response_model=AgentResult)
+async def stream_analysis(request: Request, format: str = "csv", chunksize: Optional[int] = None):
+    """
+    Analyzes a raw CSV or JSON Lines request body in chunks. The body is spooled
+    to a temporary file (in memory up to a limit, then on disk) and analyzed off
+    the event loop with bounded memory.
+    """
+    with tempfile.SpooledTemporaryFile(max_size=settings.analysis_stream_spool_bytes) as spool:
+        async for chunk in request.stream():
+            spool.write(chunk)
+        spool.seek(0)
+        input_data = {"stream": spool, "format": format}
+        if chunksize:
+            input_data["chunksize"] = chunksize
+        # Imported here so pandas/numpy stay out of app startup
+        from ...agents.analysis_agent import AnalysisAgent
+        output = await AnalysisAgent(execution_mode="thread").execute(input_data)
+    return AgentResult(
+        agent_type=AgentType.analysis,
+        output_data=output,
+        success="error" not in output,
+        error=output.get("error"),
+    )
+
+@router.post("/decision/batch", response_model=DecisionBatchResponse)
+async def decide_batch(batch: DecisionBatchRequest):
+    """
+    Scores many research/analysis pairs in one batch, e.g. for backfills;
+    the scoring itself runs as array operations. Each item's tenant picks its auto-approval threshold.
+    """
+    scored = await DecisionAgent().execute_many(
+        [{"research": item.research, "analysis": item.analysis} for item in batch.items],
+        tenants=[item.tenant for item in batch.items],
+        tenant_thresholds=batch.tenant_thresholds,
+    )
+    return trusted_response(DecisionBatchResponse(
+        results=scored.results(include_recommendations=batch.include_recommendations),
+        summary=scored.summary(),
+    ))
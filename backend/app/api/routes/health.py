@@ -1,7 +1,14 @@
 from fastapi import APIRouter
+from .orchestrate import agent_manager
 
 router = APIRouter()
 
 @router.get("/", tags=["Health"])
 async def health():
-    return {"status": "ok"}
+    agent_health = await agent_manager.health_check()
+    status = "ok" if all(agent_health.values()) else "degraded"
+    return {
+        "status": status,
+        "agents": {str(getattr(k, "value", k)): v for k, v in agent_health.items()},
+        "replicas": {str(getattr(k, "value", k)): v for k, v in agent_manager.replica_status().items()},
+    }
@@ -0,0 +1,9 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from ...metrics import registry
+
+router = APIRouter()
+
+@router.get("", response_class=PlainTextResponse, tags=["Metrics"])
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
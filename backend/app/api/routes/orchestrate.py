@@ -1,28 +1,161 @@
-from fastapi import APIRouter, Depends, HTTPException
-from ...models.api_models import OrchestrationRequest, OrchestrationResponse
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from ...models.api_models import (
+    OrchestrationRequest, OrchestrationResponse, JobSubmission, JobStatus, BatchOrchestrationRequest,
+)
 from ...orchestration.agent_manager import AgentManager, BaseAgent
-from ...orchestration.task_router import TaskRouter
+from ...orchestration.task_router import create_task_router
+from ...orchestration.task_queue import QueueFullError
 from ...orchestration.workflow_engine import WorkflowEngine
-from ...orchestration.state_manager import StateManager
+from ...orchestration.state_manager import StateManager, WorkflowRunningError
+from ...orchestration.job_manager import JobManager
+from ...orchestration.batch_runner import BatchRunner
+from ...db.write_behind import WriteBehindBuffer
+from ...db.mongo import wait_for_db
+from ...config import settings
+from ...metrics import registry
+from ...services.serialization import dumps, trusted_response
 
 router = APIRouter()
 
 # Instantiate managers and router for demo. Use DI for production!
 agent_manager = AgentManager()
 state_manager = StateManager()
-task_router = TaskRouter(agent_manager)
-workflow_engine = WorkflowEngine(task_router, state_manager)
+task_router = create_task_router(agent_manager)
+registry.add_collector(task_router.collect_metrics)
+write_buffer = WriteBehindBuffer(
+    batch_size=settings.write_behind_batch_size,
+    max_buffered=settings.write_behind_max_buffered,
+    flush_interval=settings.write_behind_flush_interval,
+    max_retries=settings.write_behind_max_retries,
+    ready=wait_for_db,
+) if settings.persist_results else None
+if write_buffer is not None:
+    registry.add_collector(write_buffer.collect_metrics)
+workflow_engine = WorkflowEngine(task_router, state_manager, persistence=write_buffer)
+job_manager = JobManager(workflow_engine, max_jobs=settings.job_max_retained, result_ttl=settings.job_result_ttl)
+batch_runner = BatchRunner(workflow_engine, max_concurrency=settings.batch_max_concurrency)
 
-@router.post("/", response_model=OrchestrationResponse)
-async def run_orchestration(req: OrchestrationRequest):
-    try:
-        # Demo: register dummy agents for research, analysis, decision
-        class DummyAgent(BaseAgent):
-            async def handle_task(self, input_data):
-                return {"dummy": "response", "input": input_data}
-        for agent_type in ["research", "analysis", "decision"]:
+class DummyAgent(BaseAgent):
+    async def handle_task(self, input_data):
+        return {"dummy": "response", "input": input_data}
+
+async def register_demo_agents():
+    # Demo: register dummy agents for research, analysis, decision (once per process)
+    for agent_type in ["research", "analysis", "decision"]:
+        if await agent_manager.get_agent(agent_type) is None:
             await agent_manager.register_agent(agent_type, DummyAgent())
 
-        return await workflow_engine.run_workflow(req)
+async def watch_disconnect(request: Request, cancel_event: asyncio.Event):
+    while not cancel_event.is_set():
+        if await request.is_disconnected():
+            cancel_event.set()
+            return
+        await asyncio.sleep(settings.disconnect_poll_interval)
+
+async def run_until_disconnect(req: OrchestrationRequest, request: Request) -> OrchestrationResponse:
+    # A client that hangs up cancels the workflow instead of leaving it running unread
+    cancel_event = asyncio.Event()
+    watcher = asyncio.create_task(watch_disconnect(request, cancel_event))
+    try:
+        await register_demo_agents()
+        return trusted_response(await workflow_engine.run_workflow(req, cancel_event=cancel_event))
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except WorkflowRunningError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Orchestration failed: {e}")
+    finally:
+        watcher.cancel()
+
+@router.post("/", response_model=OrchestrationResponse)
+async def run_orchestration(req: OrchestrationRequest, request: Request):
+    return await run_until_disconnect(req, request)
+
+@router.post("/{workflow_id}/resume", response_model=OrchestrationResponse)
+async def resume_orchestration(workflow_id: str, request: Request):
+    """
+    Re-runs a stored workflow. Steps whose input is unchanged reuse their
+    checkpointed result, so only failed or unfinished steps do work again.
+    A workflow that is still running, here or in another process, is refused
+    with 409.
+    """
+    stored = await state_manager.load_request(workflow_id)
+    if stored is None:
+        raise HTTPException(status_code=404, detail=f"Unknown workflow: {workflow_id}")
+    return await run_until_disconnect(OrchestrationRequest(**stored), request)
+
+@router.post("/jobs", response_model=JobSubmission, status_code=202)
+async def submit_orchestration(req: OrchestrationRequest):
+    """Starts the workflow in the background and returns its id immediately."""
+    await register_demo_agents()
+    try:
+        job = job_manager.submit(req)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return JobSubmission(workflow_id=job.workflow_id, status="submitted")
+
+@router.get("/jobs/{workflow_id}", response_model=JobStatus)
+async def get_orchestration_job(workflow_id: str):
+    job = job_manager.get(workflow_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown workflow: {workflow_id}")
+    status = job.result.status if job.result else "error" if job.done else "running"
+    return trusted_response(JobStatus(
+        workflow_id=workflow_id,
+        status=status,
+        tasks=state_manager.get_workflow_status(workflow_id),
+        result=job.result,
+        error=job.error,
+    ))
+
+@router.post("/batch")
+async def run_batch_orchestration(req: BatchOrchestrationRequest):
+    """
+    Runs the template once per input with bounded concurrency, sharing identical
+    sub-tasks across the batch, and streams each workflow's result as NDJSON
+    in completion order.
+    """
+    await register_demo_agents()
+
+    async def lines():
+        async for record in batch_runner.run(req):
+            yield dumps(record) + b"\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+def _sse(event: dict) -> str:
+    return f"event: {event['event']}\ndata: {dumps(event).decode()}\n\n"
+
+@router.get("/jobs/{workflow_id}/events")
+async def stream_orchestration_events(workflow_id: str):
+    """Server-Sent Events: a status snapshot, then every task transition until the workflow finishes."""
+    job = job_manager.get(workflow_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown workflow: {workflow_id}")
+    # Subscribe before taking the snapshot so no transition falls in between
+    queue = state_manager.subscribe(workflow_id)
+
+    async def events():
+        try:
+            yield _sse({"event": "snapshot", "workflow_id": workflow_id,
+                        "tasks": state_manager.get_workflow_status(workflow_id)})
+            if job.done:
+                status = job.result.status if job.result else "error"
+                yield _sse({"event": "finished", "workflow_id": workflow_id, "status": status, "error": job.error})
+                return
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), settings.sse_keepalive_interval)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _sse(event)
+                if event["event"] == "finished":
+                    return
+        finally:
+            state_manager.unsubscribe(workflow_id, queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
@@ -0,0 +1,13 @@
+from typing import Dict, List
+from fastapi import APIRouter
+from .orchestrate import state_manager
+
+router = APIRouter()
+
+@router.get("/", response_model=List[str])
+async def list_workflows(status: str = "running", limit: int = 100):
+    return await state_manager.list_workflows(status, limit)
+
+@router.get("/{workflow_id}", response_model=Dict[int, str])
+async def get_workflow_status(workflow_id: str):
+    return await state_manager.fetch_workflow_status(workflow_id)
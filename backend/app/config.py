@@ -1,8 +1,122 @@
+from typing import Any, Dict, List, Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
-    mongodb_url: str
-    mongodb_database: str
+    mongodb_url: str = "mongodb://localhost:27017"
+    mongodb_database: str = "interflow"
+    mongodb_max_pool_size: int = 100
+    mongodb_min_pool_size: int = 0
+    mongodb_max_idle_time_ms: Optional[int] = 60_000
+    mongodb_read_preference: str = "primary"
+    mongodb_server_selection_timeout_ms: int = 5_000
+    huggingface_api_token: Optional[str] = None
+    research_api_url: str = "https://api-inference.huggingface.co/models/microsoft/DialoGPT-large"
+    # Shared outbound HTTP connection pool
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry: float = 30.0
+    http_max_connections_per_host: Optional[int] = 20
+    http2_enabled: bool = False
+    # Per-agent upstream timeouts (seconds)
+    research_timeout: float = 20.0
+    research_connect_timeout: float = 5.0
+    # Upstream retries, rate limiting and circuit breaking
+    upstream_max_attempts: int = 3
+    upstream_backoff_base: float = 0.5
+    upstream_backoff_cap: float = 10.0
+    upstream_rate_limit: float = 5.0
+    upstream_rate_burst: float = 10.0
+    circuit_failure_threshold: int = 5
+    circuit_recovery_timeout: float = 30.0
+    # "remote" calls the hosted inference API, "local" runs local_model_path in-process
+    research_backend: str = "remote"
+    local_model_path: Optional[str] = None
+    local_model_batch_size: int = 8
+    local_model_batch_wait_ms: float = 10.0
+    local_model_max_new_tokens: int = 64
+    # ResearchAgent micro-batching; a batch size of 1 sends one request per query
+    research_batch_size: int = 1
+    research_batch_wait_ms: float = 10.0
+    # AnalysisAgent execution: "inline", "thread" or "process". analysis_timeout abandons a
+    # job but cannot stop one a pool worker already started; it runs on until it finishes
+    analysis_execution_mode: str = "inline"
+    analysis_max_workers: int = 2
+    analysis_timeout: float = 60.0
+    analysis_stream_chunksize: int = 100_000
+    # Initial row capacity of the streaming dedup Bloom filter; it grows as rows arrive
+    analysis_stream_dedup_capacity: int = 100_000
+    analysis_stream_spool_bytes: int = 8 * 1024 * 1024
+    # Response encoding: skip re-validating internal results, compress large bodies
+    trusted_responses: bool = True
+    compression_enabled: bool = True
+    compression_min_size: int = 64 * 1024
+    compression_gzip_level: int = 5
+    compression_zstd_level: int = 3
+    # Bodies at least this large are compressed off the event loop
+    compression_thread_min_size: int = 1024 * 1024
+    # Fast start: init_db and agent warmup run in the background instead of blocking startup
+    fast_start: bool = False
+    # Construct lazily registered agents at import time (e.g. gunicorn --preload, before fork)
+    preload_agents: bool = False
+    # Default workflow / per-step deadlines in seconds (None = unbounded)
+    workflow_timeout: Optional[float] = None
+    step_timeout: Optional[float] = None
+    disconnect_poll_interval: float = 0.5
+    # Checkpoint finished steps in the state store so resumed workflows skip them
+    workflow_checkpoints: bool = True
+    # Columnar hand-off: analysis frames of at least artifact_min_rows are kept in the
+    # artifact store and passed downstream by reference; big ones spill to mmap'd files
+    artifact_handoff: bool = True
+    artifact_min_rows: int = 10_000
+    artifact_spill_bytes: int = 64 * 1024 * 1024
+    artifact_dir: Optional[str] = None
+    artifact_ttl: float = 3600.0
+    # Task dispatch: "local" runs agents in this process; "queue" sends the types in
+    # task_queue_types (all when unset) to workers through the Mongo-backed task queue
+    task_dispatch: str = "local"
+    task_queue_types: Optional[List[str]] = None
+    task_lease_time: float = 30.0
+    task_max_attempts: int = 3
+    task_poll_interval: float = 0.2
+    worker_concurrency: int = 4
+    # Agent replica pools: "least_outstanding" or "ewma" selection
+    agent_lb_strategy: str = "least_outstanding"
+    agent_replica_max_concurrency: Optional[int] = None
+    # ResearchAgent replicas as a JSON list of {"api_url", "api_key", "max_concurrency"}
+    # objects (each key optional); one default replica when unset
+    research_replicas: Optional[List[Dict[str, Any]]] = None
+    agent_ejection_failures: int = 5
+    agent_ejection_time: float = 30.0
+    agent_probe_interval: float = 10.0
+    # Workflow state store: "memory" or "mongo"
+    state_backend: str = "memory"
+    state_ttl: float = 3600.0
+    state_max_workflows: int = 10_000
+    state_flush_interval: float = 0.5
+    state_flush_batch_size: int = 500
+    state_max_pending: int = 100_000
+    # Seconds a workflow run's claim survives without renewal (e.g. after its process died)
+    workflow_run_lease_time: float = 30.0
+    # Write-behind persistence of AgentTask/AgentResult documents
+    persist_results: bool = False
+    write_behind_batch_size: int = 500
+    write_behind_max_buffered: int = 10_000
+    write_behind_flush_interval: float = 0.2
+    write_behind_max_retries: int = 3
+    # Background orchestration jobs
+    job_max_retained: int = 10_000
+    job_result_ttl: float = 3600.0
+    sse_keepalive_interval: float = 15.0
+    batch_max_concurrency: int = 16
+    # ResearchAgent result cache; set research_cache_path to persist it in SQLite
+    research_cache_size: int = 1024
+    research_cache_ttl: float = 300.0
+    research_cache_path: Optional[str] = None
+    # Span tracing across WorkflowEngine -> TaskRouter -> agent, exported as JSON lines
+    tracing_enabled: bool = False
+    tracing_export_path: str = "traces.jsonl"
     # ...other settings...
     class Config:
         env_file = ".env"
+
+settings = Settings()
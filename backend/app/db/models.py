@@ -1,5 +1,6 @@
 from beanie import Document, Indexed
 from pydantic import BaseModel, Field
+from pymongo import ASCENDING, DESCENDING, IndexModel
 from typing import Optional, List, Dict, Any
 
 class AgentTask(Document):
@@ -21,8 +22,16 @@ class AgentStatus(Document):
     workflow_id: str = Indexed()
     agent_type: str
     status: str
+    task_index: Optional[int] = None
     updated_at: Optional[float] = None
 
+    class Settings:
+        indexes = [
+            IndexModel([("workflow_id", ASCENDING), ("task_index", ASCENDING)], unique=True),
+            IndexModel([("workflow_id", ASCENDING), ("agent_type", ASCENDING)]),
+            IndexModel([("status", ASCENDING), ("updated_at", DESCENDING)]),
+        ]
+
 class WorkflowExecution(Document):
     workflow_id: str = Indexed(unique=True)
     tasks: List[str]
@@ -31,3 +40,51 @@ class WorkflowExecution(Document):
     error: Optional[str] = None
     started_at: Optional[float] = None
     finished_at: Optional[float] = None
+    # Original OrchestrationRequest, kept so the workflow can be resumed
+    request: Optional[Dict[str, Any]] = None
+
+    class Settings:
+        indexes = [
+            IndexModel([("status", ASCENDING), ("started_at", DESCENDING)]),
+        ]
+
+class WorkflowCheckpoint(Document):
+    workflow_id: str
+    step: int
+    input_hash: str
+    result: Dict[str, Any]
+    created_at: Optional[float] = None
+
+    class Settings:
+        indexes = [
+            IndexModel([("workflow_id", ASCENDING), ("step", ASCENDING), ("input_hash", ASCENDING)], unique=True),
+        ]
+
+class QueuedTask(Document):
+    """One AgentTask in the durable task queue; `_id` is the task id."""
+    id: str
+    agent_type: str
+    task: Dict[str, Any]
+    priority: int = 0
+    # queued -> leased -> done | failed
+    status: str = "queued"
+    # Epoch seconds: when a queued task may be leased, or when a lease expires
+    visible_at: float
+    lease_owner: Optional[str] = None
+    attempts: int = 0
+    result: Optional[Dict[str, Any]] = None
+    enqueued_at: float
+    finished_at: Optional[float] = None
+    # Set when the submitter stops waiting; a late result is then discarded
+    cancelled: bool = False
+    # Epoch seconds: the submitter's deadline, after which the task is not worth running
+    deadline_at: Optional[float] = None
+
+    class Settings:
+        name = "task_queue"
+        indexes = [
+            IndexModel([
+                ("status", ASCENDING), ("agent_type", ASCENDING), ("priority", DESCENDING), ("enqueued_at", ASCENDING)
+            ]),
+            IndexModel([("status", ASCENDING), ("visible_at", ASCENDING)]),
+        ]
@@ -1,17 +1,70 @@
+import asyncio
+import logging
+from typing import Optional
 import motor.motor_asyncio
 from beanie import init_beanie
 from ..config import settings
 
-# Dependency for FastAPI
+logger = logging.getLogger(__name__)
+
+# One client (and so one connection pool + monitor threads) per process
+_client: Optional[motor.motor_asyncio.AsyncIOMotorClient] = None
+# Background init_db in fast-start mode; Mongo writers wait on it before their first write
+_init_task: Optional[asyncio.Task] = None
+
+def get_client() -> motor.motor_asyncio.AsyncIOMotorClient:
+    global _client
+    if _client is None:
+        options = dict(
+            maxPoolSize=settings.mongodb_max_pool_size,
+            minPoolSize=settings.mongodb_min_pool_size,
+            readPreference=settings.mongodb_read_preference,
+            serverSelectionTimeoutMS=settings.mongodb_server_selection_timeout_ms,
+        )
+        if settings.mongodb_max_idle_time_ms is not None:
+            options["maxIdleTimeMS"] = settings.mongodb_max_idle_time_ms
+        _client = motor.motor_asyncio.AsyncIOMotorClient(settings.mongodb_url, **options)
+    return _client
+
+# Dependencies for FastAPI
 async def get_motor_client():
-    client = motor.motor_asyncio.AsyncIOMotorClient(settings.mongodb_url)
-    return client
+    return get_client()
+
+async def get_database():
+    return get_client()[settings.mongodb_database]
 
 async def init_db():
-    from ..db.models import AgentTask, AgentResult, WorkflowExecution, AgentStatus
-    client = motor.motor_asyncio.AsyncIOMotorClient(settings.mongodb_url)
+    from ..db.models import AgentTask, AgentResult, WorkflowExecution, AgentStatus, WorkflowCheckpoint, QueuedTask
+    client = get_client()
     await init_beanie(
         database=client[settings.mongodb_database],
-        document_models=[AgentTask, AgentResult, WorkflowExecution, AgentStatus],
+        document_models=[AgentTask, AgentResult, WorkflowExecution, AgentStatus, WorkflowCheckpoint, QueuedTask],
     )
     return client
+
+def start_init_db() -> asyncio.Task:
+    """Runs init_db in the background so startup does not wait on Mongo."""
+    global _init_task
+    if _init_task is None or _init_task.get_loop() is not asyncio.get_running_loop():
+        _init_task = asyncio.get_running_loop().create_task(init_db())
+        _init_task.add_done_callback(_log_init_failure)
+    return _init_task
+
+def _log_init_failure(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Background init_db failed: %r", task.exception())
+
+async def wait_for_db():
+    """Waits for a background init_db, if one was started on this loop; no-op otherwise."""
+    task = _init_task
+    if task is not None and task.get_loop() is asyncio.get_running_loop():
+        await asyncio.shield(task)
+
+async def close_db():
+    global _client, _init_task
+    if _init_task is not None and not _init_task.done():
+        _init_task.cancel()
+    _init_task = None
+    if _client is not None:
+        _client.close()
+        _client = None
@@ -0,0 +1,153 @@
+import asyncio
+import json
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from pymongo import ReplaceOne
+from pymongo.errors import AutoReconnect, ConnectionFailure, NetworkTimeout
+from ..metrics import WRITE_BEHIND_DEPTH, WRITE_BEHIND_FLUSH_SECONDS
+
+TRANSIENT_ERRORS = (AutoReconnect, ConnectionFailure, NetworkTimeout)
+
+def _beanie_collection(name: str):
+    from . import models
+    return getattr(models, name).get_pymongo_collection()
+
+def _bson_safe(document: Dict[str, Any]) -> Dict[str, Any]:
+    # Agent outputs may carry numpy scalars or other non-BSON values
+    return json.loads(json.dumps(document, default=str))
+
+class WriteBehindBuffer:
+    """
+    Async write-behind buffer for Mongo documents. `add` only appends to memory;
+    a background flusher groups pending writes per collection into one
+    unordered bulk_write, every `flush_interval` seconds or as soon as
+    `batch_size` writes are waiting. Writes are keyed upserts, so a retried
+    batch that partially succeeded does not create duplicates.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 500,
+        max_buffered: int = 10_000,
+        flush_interval: float = 0.2,
+        max_retries: int = 3,
+        retry_backoff: float = 0.1,
+        resolver: Callable[[str], Any] = _beanie_collection,
+        ready: Optional[Callable[[], Awaitable[None]]] = None,
+    ):
+        self.batch_size = batch_size
+        self.max_buffered = max_buffered
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.resolver = resolver
+        # Awaited before writing, e.g. until a background init_db has finished
+        self.ready = ready
+        self._pending: List[Tuple[str, Dict[str, Any], Dict[str, Any]]] = []
+        self._flusher: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._space: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self.flushed = 0
+        self.failed = 0
+        self.retries = 0
+        self.flushes = 0
+        self.last_flush_latency = 0.0
+        self.max_flush_latency = 0.0
+
+    @property
+    def depth(self) -> int:
+        return len(self._pending)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "depth": self.depth,
+            "flushed": self.flushed,
+            "failed": self.failed,
+            "retries": self.retries,
+            "flushes": self.flushes,
+            "last_flush_latency": self.last_flush_latency,
+            "max_flush_latency": self.max_flush_latency,
+        }
+
+    def collect_metrics(self):
+        WRITE_BEHIND_DEPTH.set(self.depth)
+
+    async def add(self, collection: str, key: Dict[str, Any], document: Dict[str, Any]):
+        """Queues an upsert of `document` matched by `key`. Only waits when the buffer is full."""
+        self._ensure_flusher()
+        while len(self._pending) >= self.max_buffered:
+            self._wake.set()
+            self._space.clear()
+            await self._space.wait()
+        self._pending.append((collection, key, document))
+        if len(self._pending) >= self.batch_size:
+            self._wake.set()
+
+    async def flush(self):
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            while self._pending:
+                batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+                if self._space is not None:
+                    self._space.set()
+                await self._write(batch)
+
+    async def close(self):
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        # Wait out an in-progress flush so cancelling the flusher cannot drop its batch
+        async with self._flush_lock:
+            flusher, self._flusher = self._flusher, None
+            if flusher is not None:
+                flusher.cancel()
+        if flusher is not None:
+            await asyncio.gather(flusher, return_exceptions=True)
+        await self.flush()
+
+    async def _write(self, batch: List[Tuple[str, Dict[str, Any], Dict[str, Any]]]):
+        grouped: Dict[str, List[ReplaceOne]] = {}
+        for collection, key, document in batch:
+            grouped.setdefault(collection, []).append(ReplaceOne(key, _bson_safe(document), upsert=True))
+        start = time.perf_counter()
+        if self.ready is not None:
+            try:
+                await self.ready()
+            except Exception:
+                pass  # the writes below fail and are counted
+        for collection, ops in grouped.items():
+            for attempt in range(self.max_retries + 1):
+                try:
+                    await self.resolver(collection).bulk_write(ops, ordered=False)
+                    self.flushed += len(ops)
+                    break
+                except TRANSIENT_ERRORS:
+                    if attempt == self.max_retries:
+                        self.failed += len(ops)
+                        break
+                    self.retries += 1
+                    await asyncio.sleep(self.retry_backoff * 2 ** attempt)
+                except Exception:
+                    self.failed += len(ops)
+                    break
+        self.flushes += 1
+        self.last_flush_latency = time.perf_counter() - start
+        self.max_flush_latency = max(self.max_flush_latency, self.last_flush_latency)
+        WRITE_BEHIND_FLUSH_SECONDS.observe(self.last_flush_latency)
+
+    def _ensure_flusher(self):
+        loop = asyncio.get_running_loop()
+        if self._flusher is None or self._flusher.done() or self._flusher.get_loop() is not loop:
+            self._wake = asyncio.Event()
+            self._space = asyncio.Event()
+            self._flusher = loop.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
@@ -1,14 +1,18 @@
+import asyncio
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from starlette.status import HTTP_500_INTERNAL_SERVER_ERROR
-from .api.routes import agents, orchestrate, health
+from .api.routes import agents, orchestrate, health, workflows, metrics
+from .config import settings
+from .services.serialization import CompressionMiddleware, FastJSONResponse
 
 def create_app() -> FastAPI:
     app = FastAPI(
         title="Interflow Agent Orchestration API",
         description="Async backend coordinating specialized agents and workflows.",
-        version="0.1.0"
+        version="0.1.0",
+        default_response_class=FastJSONResponse,
     )
 
     # CORS Middleware
@@ -20,6 +24,15 @@ def create_app() -> FastAPI:
         allow_headers=["*"],
     )
 
+    if settings.compression_enabled:
+        app.add_middleware(
+            CompressionMiddleware,
+            minimum_size=settings.compression_min_size,
+            gzip_level=settings.compression_gzip_level,
+            zstd_level=settings.compression_zstd_level,
+            thread_min_size=settings.compression_thread_min_size,
+        )
+
     # Exception handling
     @app.exception_handler(Exception)
     async def generic_exception_handler(request: Request, exc: Exception):
@@ -31,15 +44,48 @@ def create_app() -> FastAPI:
     # Include routers
     app.include_router(agents.router, prefix="/api/agents", tags=["Agents"])
     app.include_router(orchestrate.router, prefix="/api/orchestrate", tags=["Orchestration"])
+    app.include_router(workflows.router, prefix="/api/workflows", tags=["Workflows"])
     app.include_router(health.router, prefix="/api/health", tags=["Health"])
+    app.include_router(metrics.router, prefix="/metrics", tags=["Metrics"])
 
     return app
 
 app = create_app()
 
 
-from .db.mongo import init_db
+from .db.mongo import init_db, start_init_db, close_db
+from .services.http_client import http_clients
+from .orchestration.agent_manager import release_agent_resources
+from . import tracing
+
+if settings.preload_agents:
+    # Runs in the server process before it forks workers, so loaded modules and models are shared
+    orchestrate.agent_manager.register_default_factories()
+    orchestrate.agent_manager.preload()
 
 @app.on_event("startup")
 async def on_startup():
-    await init_db()
+    tracing.configure_from_settings()
+    await http_clients.startup()
+    # Real agents as lazy factories: constructed by the warmup below or on first use
+    await orchestrate.agent_manager.initialize_agents()
+    if settings.fast_start:
+        start_init_db()
+        app.state.warmup = asyncio.get_running_loop().create_task(orchestrate.agent_manager.warmup())
+    else:
+        await init_db()
+        await orchestrate.agent_manager.warmup()
+    orchestrate.agent_manager.start_health_probes()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await orchestrate.job_manager.shutdown()
+    await orchestrate.task_router.shutdown()
+    await orchestrate.agent_manager.stop_health_probes()
+    await http_clients.aclose()
+    await orchestrate.state_manager.close()
+    if orchestrate.write_buffer is not None:
+        await orchestrate.write_buffer.close()
+    await close_db()
+    await asyncio.to_thread(tracing.shutdown)
+    await asyncio.to_thread(release_agent_resources)
@@ -1,6 +1,7 @@
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, model_validator, validator
 from typing import List, Dict, Optional, Any
 from enum import Enum
+from ..orchestration.dag_scheduler import DagScheduler
 
 class AgentType(str, Enum):
     research = "research"
@@ -11,6 +12,8 @@ class AgentTask(BaseModel):
     agent_type: AgentType
     input_data: Dict[str, Any]
     priority: Optional[int] = Field(1, ge=0, le=10)
+    # Per-step budget in seconds; overrides OrchestrationRequest.step_timeout
+    timeout: Optional[float] = Field(None, gt=0)
 
 class AgentResult(BaseModel):
     agent_type: AgentType
@@ -18,12 +21,73 @@ class AgentResult(BaseModel):
     success: bool
     error: Optional[str] = None
 
+def _check_dependencies(tasks: List[AgentTask], dependencies: Optional[Dict[int, List[int]]]):
+    # Unknown indices and cycles are client errors: rejected with 422 before anything runs
+    if dependencies is not None:
+        DagScheduler.validate(list(range(len(tasks))), dependencies)
+
 class OrchestrationRequest(BaseModel):
     workflow_id: Optional[str]
     tasks: List[AgentTask]
+    # task index -> indices of the tasks whose outputs it consumes.
+    # When omitted, tasks run as a linear chain in list order.
+    dependencies: Optional[Dict[int, List[int]]] = None
+    max_concurrency: Optional[int] = Field(None, ge=1)
+    # Deadline budgets in seconds. When the workflow deadline passes, the
+    # response holds only the steps that finished and status "timeout".
+    timeout: Optional[float] = Field(None, gt=0)
+    step_timeout: Optional[float] = Field(None, gt=0)
+
+    @model_validator(mode="after")
+    def check_dependencies(self):
+        _check_dependencies(self.tasks, self.dependencies)
+        return self
 
 class OrchestrationResponse(BaseModel):
     workflow_id: Optional[str]
     results: List[AgentResult]
     status: str
     error: Optional[str] = None
+
+class JobSubmission(BaseModel):
+    workflow_id: str
+    status: str
+
+class JobStatus(BaseModel):
+    workflow_id: str
+    status: str
+    tasks: Dict[int, str] = {}
+    result: Optional[OrchestrationResponse] = None
+    error: Optional[str] = None
+
+class WorkflowTemplate(BaseModel):
+    tasks: List[AgentTask]
+    dependencies: Optional[Dict[int, List[int]]] = None
+    max_concurrency: Optional[int] = Field(None, ge=1)
+
+    @model_validator(mode="after")
+    def check_dependencies(self):
+        _check_dependencies(self.tasks, self.dependencies)
+        return self
+
+class BatchOrchestrationRequest(BaseModel):
+    template: WorkflowTemplate
+    # One entry per workflow: task index -> input_data merged over the template's
+    inputs: List[Dict[int, Dict[str, Any]]]
+    max_concurrency: Optional[int] = Field(None, ge=1)
+    workflow_id_prefix: Optional[str] = None
+
+class DecisionInput(BaseModel):
+    research: Dict[str, Any] = {}
+    analysis: Dict[str, Any] = {}
+    tenant: Optional[str] = None
+
+class DecisionBatchRequest(BaseModel):
+    items: List[DecisionInput]
+    # tenant -> human_threshold, overriding the default for that tenant's items
+    tenant_thresholds: Dict[str, float] = {}
+    include_recommendations: bool = True
+
+class DecisionBatchResponse(BaseModel):
+    results: List[Dict[str, Any]]
+    summary: Dict[str, int]
@@ -1,32 +1,161 @@
-from typing import Dict, Any, Optional
+from typing import Callable, Dict, Any, List, Optional
 from ..models.api_models import AgentType
+from ..config import settings
+from .lazy_agent import LazyAgent
+from .replica_pool import ReplicaPool
 import asyncio
+import sys
 
 class BaseAgent:
     async def handle_task(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         raise NotImplementedError
 
 class AgentManager:
-    def __init__(self):
-        self.agents: Dict[AgentType, BaseAgent] = {}
+    def __init__(
+        self,
+        strategy: Optional[str] = None,
+        max_concurrency_per_replica: Optional[int] = None,
+        failure_threshold: Optional[int] = None,
+        ejection_time: Optional[float] = None,
+    ):
+        # Each agent type is served by a pool of one or more replicas
+        self.pools: Dict[AgentType, ReplicaPool] = {}
         self.agent_health: Dict[AgentType, bool] = {}
+        self.strategy = strategy or settings.agent_lb_strategy
+        self.max_concurrency_per_replica = (
+            max_concurrency_per_replica if max_concurrency_per_replica is not None
+            else settings.agent_replica_max_concurrency
+        )
+        self.failure_threshold = failure_threshold or settings.agent_ejection_failures
+        self.ejection_time = ejection_time if ejection_time is not None else settings.agent_ejection_time
+        self._prober: Optional[asyncio.Task] = None
+        self._defaults_registered = False
 
-    async def register_agent(self, agent_type: AgentType, agent: BaseAgent):
-        self.agents[agent_type] = agent
-        self.agent_health[agent_type] = True  # Assume healthy
+    @property
+    def agents(self) -> Dict[AgentType, BaseAgent]:
+        # Primary (first registered) replica per type
+        return {agent_type: pool.replicas[0].agent for agent_type, pool in self.pools.items() if pool.replicas}
+
+    async def register_agent(self, agent_type: AgentType, agent: BaseAgent, max_concurrency: Optional[int] = None):
+        """Adds `agent` as another replica for `agent_type`."""
+        self.add_replica(agent_type, agent, max_concurrency)
+
+    def add_replica(self, agent_type: AgentType, agent: BaseAgent, max_concurrency: Optional[int] = None):
+        # Synchronous core of register_agent, usable before an event loop exists (preload)
+        pool = self.pools.get(agent_type)
+        if pool is None:
+            pool = self.pools[agent_type] = ReplicaPool(
+                strategy=self.strategy,
+                max_concurrency=self.max_concurrency_per_replica,
+                failure_threshold=self.failure_threshold,
+                ejection_time=self.ejection_time,
+            )
+        pool.add(agent, max_concurrency)
+        self.agent_health[agent_type] = True  # Assume healthy until probed
+
+    async def register_factory(
+        self, agent_type: AgentType, factory: Callable[[], BaseAgent], max_concurrency: Optional[int] = None
+    ):
+        """Adds a replica that is only imported/constructed on first use, warmup or preload."""
+        await self.register_agent(agent_type, LazyAgent(factory), max_concurrency)
+
+    def lazy_agents(self) -> List[LazyAgent]:
+        return [
+            replica.agent for pool in self.pools.values() for replica in pool.replicas
+            if isinstance(replica.agent, LazyAgent)
+        ]
+
+    def preload(self):
+        """Constructs every lazy agent now, e.g. in the server process before it forks workers."""
+        for agent in self.lazy_agents():
+            agent.preload()
+
+    async def warmup(self):
+        """Loads lazy agents concurrently; failures are left for the first task to surface."""
+        await asyncio.gather(*(agent.warmup() for agent in self.lazy_agents()), return_exceptions=True)
 
     async def get_agent(self, agent_type: AgentType) -> Optional[BaseAgent]:
-        return self.agents.get(agent_type, None)
+        pool = self.pools.get(agent_type)
+        return pool.replicas[0].agent if pool and pool.replicas else None
 
-    async def health_check(self) -> Dict[AgentType, bool]:
-        # Optionally do async health checks here
+    def get_pool(self, agent_type: AgentType) -> Optional[ReplicaPool]:
+        return self.pools.get(agent_type)
+
+    async def health_check(self, timeout: float = 2.0) -> Dict[AgentType, bool]:
+        # Probe replicas that expose get_health(); a type is healthy while any replica is
+        pools = list(self.pools.items())
+        await asyncio.gather(*(pool.probe(timeout) for _, pool in pools))
+        self.agent_health.update({agent_type: pool.healthy for agent_type, pool in pools})
         return self.agent_health
 
+    def replica_status(self) -> Dict[AgentType, List[dict]]:
+        return {agent_type: pool.status() for agent_type, pool in self.pools.items()}
+
     async def load_balance(self, agent_type: AgentType) -> Optional[BaseAgent]:
-        # For demo: just return the agent, extend for advanced LB
-        return await self.get_agent(agent_type)
+        # Current best replica; use the pool's call() to also track load and outcome
+        pool = self.pools.get(agent_type)
+        replica = pool.select() if pool else None
+        return replica.agent if replica else None
+
+    def start_health_probes(self, interval: Optional[float] = None):
+        interval = interval if interval is not None else settings.agent_probe_interval
+        if self._prober is None or self._prober.done():
+            self._prober = asyncio.get_running_loop().create_task(self._probe_loop(interval))
+
+    async def stop_health_probes(self):
+        prober, self._prober = self._prober, None
+        if prober is not None:
+            prober.cancel()
+            await asyncio.gather(prober, return_exceptions=True)
+
+    async def _probe_loop(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.health_check()
+            except Exception:
+                pass
 
     async def initialize_agents(self):
-        from ..agents.research_agent import ResearchAgent
-        await self.register_agent(AgentType.research, ResearchAgent())
+        self.register_default_factories()
+
+    def register_default_factories(self):
+        """Registers the concrete agents as lazy factories; later calls are no-ops."""
+        if self._defaults_registered:
+            return
+        self._defaults_registered = True
+
+        def research_agent(api_url: Optional[str] = None, api_key: Optional[str] = None):
+            def factory():
+                from ..agents.research_agent import ResearchAgent
+                return ResearchAgent(api_key=api_key, api_url=api_url)
+            factory.__name__ = "research_agent"
+            return factory
+
+        def analysis_agent():
+            from ..agents.analysis_agent import AnalysisAgent
+            return AnalysisAgent()
+
+        # One replica per configured endpoint/token, each with its own load and health tracking
+        for replica in settings.research_replicas or [{}]:
+            self.add_replica(
+                AgentType.research,
+                LazyAgent(research_agent(replica.get("api_url"), replica.get("api_key"))),
+                replica.get("max_concurrency"),
+            )
+        self.add_replica(AgentType.analysis, LazyAgent(analysis_agent))
         # Register other agents here as needed.
+
+def release_agent_resources():
+    """
+    Stops the process-wide resources of agent modules that were loaded: the
+    analysis thread/process pools and the research result cache's store.
+    Modules never imported (agents are loaded lazily) are left alone.
+    """
+    agents = __package__.rpartition(".")[0] + ".agents"
+    analysis_agent = sys.modules.get(f"{agents}.analysis_agent")
+    if analysis_agent is not None:
+        analysis_agent.shutdown_executors()
+    research_agent = sys.modules.get(f"{agents}.research_agent")
+    if research_agent is not None:
+        research_agent.research_cache.close()
@@ -0,0 +1,62 @@
+import asyncio
+import uuid
+from typing import Any, AsyncIterator, Dict
+from ..models.api_models import BatchOrchestrationRequest, OrchestrationRequest
+from .dedup import TaskDeduplicator, current_deduplicator
+from .workflow_engine import WorkflowEngine
+from ..config import settings
+from ..services.artifacts import artifact_store, current_artifact_scope
+
+class BatchRunner:
+    """Runs one workflow template over many inputs with bounded concurrency."""
+
+    def __init__(self, workflow_engine: WorkflowEngine, max_concurrency: int = 16):
+        self.workflow_engine = workflow_engine
+        self.max_concurrency = max_concurrency
+
+    def build_request(self, batch: BatchOrchestrationRequest, index: int, prefix: str) -> OrchestrationRequest:
+        overrides = batch.inputs[index]
+        tasks = [
+            task.model_copy(update={"input_data": {**task.input_data, **overrides.get(i, {})}})
+            for i, task in enumerate(batch.template.tasks)
+        ]
+        return OrchestrationRequest(
+            workflow_id=f"{prefix}-{index}",
+            tasks=tasks,
+            dependencies=batch.template.dependencies,
+            max_concurrency=batch.template.max_concurrency,
+        )
+
+    async def run(self, batch: BatchOrchestrationRequest) -> AsyncIterator[Dict[str, Any]]:
+        """Yields one result record per input, in completion order."""
+        prefix = batch.workflow_id_prefix or f"batch-{uuid.uuid4().hex[:12]}"
+        semaphore = asyncio.Semaphore(batch.max_concurrency or self.max_concurrency)
+        deduplicator = TaskDeduplicator()
+        token = current_deduplicator.set(deduplicator)
+        # Deduplicated steps are shared between workflows, so their artifacts live as long as the batch
+        scope_token = current_artifact_scope.set(prefix) if settings.artifact_handoff else None
+
+        async def run_one(index: int) -> Dict[str, Any]:
+            async with semaphore:
+                try:
+                    request = self.build_request(batch, index, prefix)
+                    response = await self.workflow_engine.run_workflow(request)
+                    return {"index": index, **response.model_dump()}
+                except Exception as e:
+                    return {"index": index, "workflow_id": f"{prefix}-{index}", "status": "error", "error": str(e)}
+
+        try:
+            pending = [asyncio.ensure_future(run_one(i)) for i in range(len(batch.inputs))]
+        finally:
+            current_deduplicator.reset(token)
+            if scope_token is not None:
+                current_artifact_scope.reset(scope_token)
+        try:
+            for finished in asyncio.as_completed(pending):
+                yield await finished
+        finally:
+            for task in pending:
+                task.cancel()
+            if scope_token is not None:
+                await asyncio.gather(*pending, return_exceptions=True)
+                artifact_store.release(prefix)
@@ -0,0 +1,95 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional, Any
+
+class CyclicDependencyError(ValueError):
+    pass
+
+class DagScheduler:
+    """
+    Runs a dependency graph of nodes with asyncio, starting every node as soon
+    as all of its upstream nodes have finished. `max_concurrency` caps how many
+    nodes run at the same time.
+    """
+
+    def __init__(self, max_concurrency: int = 8):
+        self.max_concurrency = max_concurrency
+
+    @staticmethod
+    def validate(nodes: List[int], dependencies: Dict[int, List[int]]) -> List[int]:
+        """Checks the graph and returns the nodes in topological order."""
+        node_set = set(nodes)
+        for node, upstream in dependencies.items():
+            if node not in node_set:
+                raise ValueError(f"Unknown task index in dependencies: {node}")
+            for dep in upstream:
+                if dep not in node_set:
+                    raise ValueError(f"Task {node} depends on unknown task {dep}")
+                if dep == node:
+                    raise CyclicDependencyError(f"Task {node} depends on itself")
+
+        indegree = {n: len(set(dependencies.get(n, []))) for n in nodes}
+        downstream: Dict[int, List[int]] = {n: [] for n in nodes}
+        for node in nodes:
+            for dep in set(dependencies.get(node, [])):
+                downstream[dep].append(node)
+        ready = [n for n in nodes if indegree[n] == 0]
+        order = []
+        while ready:
+            node = ready.pop(0)
+            order.append(node)
+            for child in downstream[node]:
+                indegree[child] -= 1
+                if indegree[child] == 0:
+                    ready.append(child)
+        if len(order) != len(nodes):
+            raise CyclicDependencyError("Task dependencies contain a cycle")
+        return order
+
+    async def run(
+        self,
+        nodes: List[int],
+        dependencies: Dict[int, List[int]],
+        run_node: Callable[[int, Dict[int, Any]], Awaitable[Any]],
+        max_concurrency: Optional[int] = None,
+    ) -> Dict[int, Any]:
+        """
+        Executes `run_node(node, upstream_results)` for every node, where
+        `upstream_results` maps each dependency to its result.
+        Returns node -> result.
+        """
+        self.validate(nodes, dependencies)
+        semaphore = asyncio.Semaphore(max_concurrency or self.max_concurrency)
+        deps = {n: sorted(set(dependencies.get(n, []))) for n in nodes}
+        remaining = {n: len(deps[n]) for n in nodes}
+        downstream: Dict[int, List[int]] = {n: [] for n in nodes}
+        for node in nodes:
+            for dep in deps[node]:
+                downstream[dep].append(node)
+
+        results: Dict[int, Any] = {}
+        running: Dict[asyncio.Task, int] = {}
+
+        async def guarded(node: int):
+            async with semaphore:
+                return await run_node(node, {dep: results[dep] for dep in deps[node]})
+
+        def start(node: int):
+            running[asyncio.ensure_future(guarded(node))] = node
+
+        for node in nodes:
+            if remaining[node] == 0:
+                start(node)
+        try:
+            while running:
+                done, _ = await asyncio.wait(running.keys(), return_when=asyncio.FIRST_COMPLETED)
+                for fut in done:
+                    node = running.pop(fut)
+                    results[node] = fut.result()
+                    for child in downstream[node]:
+                        remaining[child] -= 1
+                        if remaining[child] == 0:
+                            start(child)
+        finally:
+            for fut in running:
+                fut.cancel()
+        return results
@@ -0,0 +1,31 @@
+import asyncio
+import json
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Dict, Optional
+from ..models.api_models import AgentTask, AgentResult
+
+class TaskDeduplicator:
+    """
+    Batch-scoped memo of routed sub-tasks: identical (agent type, input) pairs
+    across a batch run once and share the result. Lives only as long as the batch.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+
+    @staticmethod
+    def key(task: AgentTask) -> str:
+        return f"{task.agent_type.value}|{json.dumps(task.input_data, sort_keys=True, default=str)}"
+
+    async def run(self, task: AgentTask, execute: Callable[[AgentTask], Awaitable[AgentResult]]) -> AgentResult:
+        key = self.key(task)
+        shared = self._tasks.get(key)
+        if shared is None:
+            shared = self._tasks[key] = asyncio.ensure_future(execute(task))
+        else:
+            self.hits += 1
+        return await asyncio.shield(shared)
+
+# Set for the duration of a batch; TaskRouter consults it when routing
+current_deduplicator: ContextVar[Optional[TaskDeduplicator]] = ContextVar("current_deduplicator", default=None)
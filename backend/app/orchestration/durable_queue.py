@@ -0,0 +1,241 @@
+import asyncio
+import logging
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+from pymongo import ReturnDocument
+from ..models.api_models import AgentTask, AgentResult
+from ..services.deadlines import remaining
+
+logger = logging.getLogger(__name__)
+
+class LeasedTask:
+    """A task a worker holds until `ack`, `nack` or its lease runs out."""
+    __slots__ = ("task_id", "task", "attempts", "deadline_at")
+
+    def __init__(self, task_id: str, task: AgentTask, attempts: int, deadline_at: Optional[float] = None):
+        self.task_id = task_id
+        self.task = task
+        self.attempts = attempts
+        # Wall-clock end of the submitter's step/workflow budget, if it had one
+        self.deadline_at = deadline_at
+
+class DurableTaskQueue:
+    """
+    At-least-once AgentTask queue shared by API nodes and workers through the
+    QueuedTask collection.
+
+    Producers `submit` a task and await its result. Workers `lease` the
+    highest-priority visible task of the types they serve, which hides it for
+    `lease_time` seconds. They `extend` the lease while they work and `ack`
+    it with the result. A task whose lease expires (e.g. its worker died)
+    becomes visible again and is retried. Once it has been leased
+    `max_attempts` times it fails. Acks from a worker that lost its lease are
+    ignored, so handlers should be idempotent. The submitter's remaining
+    deadline (workflow or step budget) travels with the task as a wall-clock
+    `deadline_at`; a task leased after it has passed fails without running.
+
+    Results are picked up by one poller per process, which checks every
+    pending id in a single query every `poll_interval` seconds. Polling
+    keeps this working on standalone servers, where change streams are not
+    available.
+    """
+
+    def __init__(
+        self,
+        collection: Any = None,
+        lease_time: float = 30.0,
+        max_attempts: int = 3,
+        poll_interval: float = 0.2,
+        ready: Optional[Callable[[], Awaitable[None]]] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self._collection = collection
+        self.lease_time = lease_time
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        # Awaited before touching the collection (background init_db in fast-start mode)
+        self.ready = ready
+        # Wall clock: leases are compared across processes and hosts
+        self._clock = clock
+        self._waiters: Dict[str, asyncio.Future] = {}
+        self._poller: Optional[asyncio.Task] = None
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            from ..db.models import QueuedTask
+            self._collection = QueuedTask.get_pymongo_collection()
+        return self._collection
+
+    async def enqueue(self, task: AgentTask, task_id: Optional[str] = None) -> str:
+        await self._ready()
+        task_id = task_id or uuid.uuid4().hex
+        now = self._clock()
+        budget = remaining()
+        await self.collection.insert_one({
+            "_id": task_id,
+            "agent_type": task.agent_type.value,
+            "task": task.model_dump(mode="json"),
+            "priority": task.priority if task.priority is not None else 0,
+            "status": "queued",
+            "visible_at": now,
+            "lease_owner": None,
+            "attempts": 0,
+            "result": None,
+            "enqueued_at": now,
+            "finished_at": None,
+            "cancelled": False,
+            "deadline_at": None if budget is None else now + budget,
+        })
+        return task_id
+
+    async def submit(self, task: AgentTask) -> AgentResult:
+        """Enqueues `task` and waits for a worker's result; cancelling withdraws the task."""
+        task_id = await self.enqueue(task)
+        try:
+            return await self.wait_result(task_id)
+        except asyncio.CancelledError:
+            await asyncio.shield(self.cancel(task_id))
+            raise
+
+    async def wait_result(self, task_id: str) -> AgentResult:
+        future = self._waiters.get(task_id)
+        if future is None:
+            future = self._waiters[task_id] = asyncio.get_running_loop().create_future()
+        self._ensure_poller()
+        try:
+            return await future
+        finally:
+            self._waiters.pop(task_id, None)
+
+    async def cancel(self, task_id: str):
+        """
+        Withdraws a task nobody will wait for. A queued or finished task is
+        deleted; a running one is flagged so its result is dropped on ack.
+        """
+        await self.collection.update_one({"_id": task_id}, {"$set": {"cancelled": True}})
+        await self.collection.delete_one({"_id": task_id, "status": {"$in": ["queued", "done", "failed"]}})
+
+    async def lease(self, agent_types: Iterable[str], worker_id: str) -> Optional[LeasedTask]:
+        """Takes the next visible task of `agent_types`, or None if there is none."""
+        await self._ready()
+        agent_types = [getattr(t, "value", t) for t in agent_types]
+        while True:
+            now = self._clock()
+            doc = await self.collection.find_one_and_update(
+                # Queued tasks, and leased ones whose worker stopped extending the lease
+                {
+                    "status": {"$in": ["queued", "leased"]},
+                    "agent_type": {"$in": agent_types},
+                    "visible_at": {"$lte": now},
+                },
+                {
+                    "$set": {"status": "leased", "lease_owner": worker_id, "visible_at": now + self.lease_time},
+                    "$inc": {"attempts": 1},
+                },
+                sort=[("priority", -1), ("enqueued_at", 1)],
+                return_document=ReturnDocument.AFTER,
+            )
+            if doc is None:
+                return None
+            if doc.get("cancelled"):
+                # Its submitter gave up and its previous worker never acked
+                await self.collection.delete_one({"_id": doc["_id"]})
+                continue
+            task = AgentTask(**doc["task"])
+            deadline_at = doc.get("deadline_at")
+            if deadline_at is not None and deadline_at <= now:
+                error = "Deadline exceeded before the task ran"
+            elif doc["attempts"] > self.max_attempts:
+                error = f"Task abandoned after {self.max_attempts} attempts"
+            else:
+                return LeasedTask(doc["_id"], task, doc["attempts"], deadline_at)
+            await self._finish(doc["_id"], worker_id, "failed", AgentResult(
+                agent_type=task.agent_type, output_data={}, success=False, error=error,
+            ))
+
+    def time_left(self, leased: LeasedTask) -> Optional[float]:
+        """Seconds until the task's deadline, or None when it has none."""
+        return None if leased.deadline_at is None else leased.deadline_at - self._clock()
+
+    async def extend(self, leased: LeasedTask, worker_id: str) -> bool:
+        """
+        Pushes the lease out by another `lease_time`. False if the worker no
+        longer holds it or the submitter withdrew the task.
+        """
+        result = await self.collection.update_one(
+            {"_id": leased.task_id, "status": "leased", "lease_owner": worker_id, "cancelled": {"$ne": True}},
+            {"$set": {"visible_at": self._clock() + self.lease_time}},
+        )
+        return result.modified_count == 1
+
+    async def ack(self, leased: LeasedTask, worker_id: str, result: AgentResult) -> bool:
+        return await self._finish(leased.task_id, worker_id, "done", result)
+
+    async def nack(self, leased: LeasedTask, worker_id: str, delay: float = 0.0) -> bool:
+        """Hands the task back for another worker, visible again after `delay` seconds."""
+        result = await self.collection.update_one(
+            {"_id": leased.task_id, "status": "leased", "lease_owner": worker_id},
+            {"$set": {"status": "queued", "lease_owner": None, "visible_at": self._clock() + delay}},
+        )
+        return result.modified_count == 1
+
+    async def close(self):
+        if self._poller is not None:
+            self._poller.cancel()
+            try:
+                await self._poller
+            except asyncio.CancelledError:
+                pass
+            self._poller = None
+        for future in self._waiters.values():
+            future.cancel()
+        self._waiters.clear()
+
+    async def _finish(self, task_id: str, worker_id: str, status: str, result: AgentResult) -> bool:
+        doc = await self.collection.find_one_and_update(
+            {"_id": task_id, "status": "leased", "lease_owner": worker_id},
+            {"$set": {"status": status, "result": result.model_dump(mode="json"), "finished_at": self._clock()}},
+            projection={"cancelled": 1},
+        )
+        if doc is None:
+            return False
+        if doc.get("cancelled"):
+            # The submitter gave up while this ran; nobody will collect the result
+            await self.collection.delete_one({"_id": task_id})
+        return True
+
+    async def _ready(self):
+        if self.ready is not None:
+            await self.ready()
+
+    def _ensure_poller(self):
+        if self._poller is None or self._poller.done() or self._poller.get_loop() is not asyncio.get_running_loop():
+            self._poller = asyncio.get_running_loop().create_task(self._poll())
+
+    async def _poll(self):
+        while self._waiters:
+            await asyncio.sleep(self.poll_interval)
+            pending = list(self._waiters)
+            if not pending:
+                continue
+            try:
+                finished = await self._fetch_finished(pending)
+                if finished:
+                    # Results are delivered once; the queue documents are no longer needed
+                    await self.collection.delete_many({"_id": {"$in": [doc["_id"] for doc in finished]}})
+            except Exception as e:
+                # Transient database errors: keep waiting, the next round retries
+                logger.warning("Polling task results failed: %r", e)
+                continue
+            for doc in finished:
+                future = self._waiters.get(doc["_id"])
+                if future is not None and not future.done():
+                    future.set_result(AgentResult(**doc["result"]))
+
+    async def _fetch_finished(self, task_ids: List[str]) -> List[Dict[str, Any]]:
+        cursor = self.collection.find(
+            {"_id": {"$in": task_ids}, "status": {"$in": ["done", "failed"]}}, {"result": 1}
+        )
+        return await cursor.to_list(length=None)
@@ -0,0 +1,80 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from ..models.api_models import OrchestrationRequest, OrchestrationResponse
+from .workflow_engine import WorkflowEngine
+from .state_manager import WorkflowRunningError
+
+class WorkflowJob:
+    def __init__(self, workflow_id: str, task: asyncio.Task):
+        self.workflow_id = workflow_id
+        self.task = task
+        self.submitted_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.result: Optional[OrchestrationResponse] = None
+        self.error: Optional[str] = None
+
+    @property
+    def done(self) -> bool:
+        return self.task.done()
+
+class JobManager:
+    """
+    Runs workflows in the background for submit-and-poll clients. Finished jobs
+    are kept for `result_ttl` seconds (at most `max_jobs`) so results can be fetched.
+    """
+
+    def __init__(self, workflow_engine: WorkflowEngine, max_jobs: int = 10_000, result_ttl: float = 3600.0):
+        self.workflow_engine = workflow_engine
+        self.max_jobs = max_jobs
+        self.result_ttl = result_ttl
+        self.jobs: "OrderedDict[str, WorkflowJob]" = OrderedDict()
+
+    def submit(self, request: OrchestrationRequest) -> WorkflowJob:
+        self._evict()
+        workflow_id = request.workflow_id or f"wf-{uuid.uuid4().hex}"
+        existing = self.jobs.get(workflow_id)
+        if existing is not None and not existing.done:
+            raise ValueError(f"Workflow {workflow_id} is already running")
+        request = request.model_copy(update={"workflow_id": workflow_id})
+        job = WorkflowJob(workflow_id, asyncio.ensure_future(self.workflow_engine.run_workflow(request)))
+        job.task.add_done_callback(lambda task: self._on_done(job, task))
+        self.jobs[workflow_id] = job
+        return job
+
+    def get(self, workflow_id: str) -> Optional[WorkflowJob]:
+        return self.jobs.get(workflow_id)
+
+    async def shutdown(self):
+        running = [job.task for job in self.jobs.values() if not job.done]
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+
+    def _on_done(self, job: WorkflowJob, task: asyncio.Task):
+        job.finished_at = time.time()
+        if task.cancelled():
+            job.error = "Workflow cancelled."
+            self.workflow_engine.state_manager.finish_workflow(job.workflow_id, "cancelled", job.error)
+        elif isinstance(task.exception(), WorkflowRunningError):
+            # Another process is running it; its status is not ours to overwrite
+            job.error = str(task.exception())
+        elif task.exception() is not None:
+            job.error = str(task.exception())
+            self.workflow_engine.state_manager.finish_workflow(job.workflow_id, "error", job.error)
+        else:
+            job.result = task.result()
+
+    def _evict(self):
+        cutoff = time.time() - self.result_ttl
+        for workflow_id in list(self.jobs):
+            job = self.jobs[workflow_id]
+            if job.done and (job.finished_at or 0) < cutoff:
+                del self.jobs[workflow_id]
+        while len(self.jobs) >= self.max_jobs:
+            oldest = next((wid for wid, job in self.jobs.items() if job.done), None)
+            if oldest is None:
+                break
+            del self.jobs[oldest]
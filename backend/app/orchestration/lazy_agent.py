@@ -0,0 +1,51 @@
+import asyncio
+import threading
+from typing import Any, Callable, Dict, Optional
+
+class LazyAgent:
+    """
+    Stand-in registered in AgentManager for an agent that is expensive to
+    import or construct. `factory` runs on first use (in a worker thread, so
+    heavy imports do not stall the event loop), on `warmup()`, or
+    synchronously on `preload()` before the server forks its workers.
+    """
+
+    def __init__(self, factory: Callable[[], Any], name: Optional[str] = None):
+        self.factory = factory
+        self.name = name or getattr(factory, "__name__", "agent")
+        self._agent: Any = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._agent is not None
+
+    def preload(self) -> Any:
+        with self._lock:
+            if self._agent is None:
+                self._agent = self.factory()
+        return self._agent
+
+    async def load(self) -> Any:
+        if self._agent is not None:
+            return self._agent
+        return await asyncio.get_running_loop().run_in_executor(None, self.preload)
+
+    async def warmup(self):
+        agent = await self.load()
+        warmup = getattr(agent, "warmup", None)
+        if warmup is not None:
+            await warmup()
+
+    async def handle_task(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        agent = await self.load()
+        # BaseAgent implementations take handle_task; the concrete agents expose execute
+        handle = getattr(agent, "handle_task", None) or agent.execute
+        return await handle(input_data)
+
+    async def get_health(self) -> bool:
+        # Not constructed yet is not a failure; the first task (or warmup) will load it
+        if self._agent is None:
+            return True
+        get_health = getattr(self._agent, "get_health", None)
+        return bool(await get_health()) if get_health is not None else True
@@ -0,0 +1,193 @@
+import asyncio
+import itertools
+import time
+from typing import Any, Awaitable, Callable, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+LB_STRATEGIES = ("least_outstanding", "ewma")
+
+def is_error_output(output: Any) -> bool:
+    """True for an agent output that reports a failure instead of raising it."""
+    return isinstance(output, dict) and (output.get("error") is not None or output.get("success") is False)
+
+class Replica:
+    """One agent instance in a pool, with its load and health bookkeeping."""
+
+    def __init__(self, agent: Any, max_concurrency: Optional[int] = None):
+        self.agent = agent
+        self.max_concurrency = max_concurrency
+        self.outstanding = 0
+        self.ewma_latency = 0.0
+        self.healthy = True
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.failures = 0
+
+    def available(self, now: float) -> bool:
+        return self.healthy and now >= self.ejected_until
+
+    @property
+    def saturated(self) -> bool:
+        return self.max_concurrency is not None and self.outstanding >= self.max_concurrency
+
+    def status(self, now: float) -> dict:
+        return {
+            "agent": getattr(self.agent, "name", type(self.agent).__name__),
+            "healthy": self.healthy,
+            "ejected": now < self.ejected_until,
+            "outstanding": self.outstanding,
+            "ewma_latency": self.ewma_latency,
+            "requests": self.requests,
+            "failures": self.failures,
+        }
+
+class ReplicaPool:
+    """
+    Load balancer over the replicas of one agent type.
+
+    Selection is least-outstanding-requests or peak-EWMA (latency estimate
+    weighted by in-flight requests), among replicas that are healthy, not
+    ejected and under their concurrency limit; callers wait when every
+    eligible replica is at its limit. `failure_threshold` consecutive errors
+    eject a replica for `ejection_time` seconds, doubling on repeat
+    ejections; it is reinstated when the window passes or a health probe
+    succeeds. If no replica is eligible the pool falls back to all of them
+    rather than failing every request.
+    """
+
+    def __init__(
+        self,
+        strategy: str = "least_outstanding",
+        max_concurrency: Optional[int] = None,
+        failure_threshold: int = 5,
+        ejection_time: float = 30.0,
+        max_ejection_time: float = 300.0,
+        ewma_alpha: float = 0.3,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if strategy not in LB_STRATEGIES:
+            raise ValueError(f"Unknown load balancing strategy: {strategy}")
+        self.strategy = strategy
+        self.max_concurrency = max_concurrency
+        self.failure_threshold = failure_threshold
+        self.ejection_time = ejection_time
+        self.max_ejection_time = max_ejection_time
+        self.ewma_alpha = ewma_alpha
+        self._clock = clock
+        self.replicas: List[Replica] = []
+        self._rotation = itertools.count()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._released: Optional[asyncio.Event] = None
+
+    def add(self, agent: Any, max_concurrency: Optional[int] = None) -> Replica:
+        replica = Replica(agent, max_concurrency if max_concurrency is not None else self.max_concurrency)
+        self.replicas.append(replica)
+        return replica
+
+    def select(self) -> Optional[Replica]:
+        """Best replica right now, or None if every candidate is at its concurrency limit."""
+        if not self.replicas:
+            return None
+        now = self._clock()
+        candidates = [r for r in self.replicas if r.available(now)] or self.replicas
+        candidates = [r for r in candidates if not r.saturated]
+        if not candidates:
+            return None
+        # Rotate so ties are spread round-robin instead of always hitting the first replica
+        start = next(self._rotation) % len(candidates)
+        candidates = candidates[start:] + candidates[:start]
+        if self.strategy == "ewma":
+            return min(candidates, key=lambda r: r.ewma_latency * (r.outstanding + 1))
+        return min(candidates, key=lambda r: r.outstanding)
+
+    async def call(self, fn: Callable[[Any], Awaitable[T]]) -> T:
+        """
+        Runs `fn(agent)` on a selected replica and records its latency and
+        outcome. The agents report most errors as an output carrying an
+        `error` key (or `success: False`) rather than raising, so such an
+        output counts as a failure too; it is still returned to the caller.
+        """
+        replica = await self._acquire()
+        start = self._clock()
+        try:
+            result = await fn(replica.agent)
+        except Exception:
+            self._record(replica, self._clock() - start, success=False)
+            raise
+        else:
+            self._record(replica, self._clock() - start, success=not is_error_output(result))
+            return result
+        finally:
+            replica.outstanding -= 1
+            self._released.set()
+
+    async def probe(self, timeout: float = 2.0):
+        """Active health check through each replica's get_health()."""
+        async def check(replica: Replica):
+            get_health = getattr(replica.agent, "get_health", None)
+            if get_health is None:
+                return
+            try:
+                healthy = bool(await asyncio.wait_for(get_health(), timeout))
+            except Exception:
+                healthy = False
+            replica.healthy = healthy
+            if healthy and replica.ejected_until:
+                # Probe says it recovered: reinstate without waiting out the ejection
+                replica.ejected_until = 0.0
+                replica.consecutive_failures = 0
+
+        await asyncio.gather(*(check(r) for r in self.replicas))
+        self._released_set()
+
+    @property
+    def healthy(self) -> bool:
+        now = self._clock()
+        return any(r.available(now) for r in self.replicas)
+
+    def status(self) -> List[dict]:
+        now = self._clock()
+        return [r.status(now) for r in self.replicas]
+
+    async def _acquire(self) -> Replica:
+        self._ensure_loop()
+        while True:
+            replica = self.select()
+            if replica is not None:
+                replica.outstanding += 1
+                replica.requests += 1
+                return replica
+            if not self.replicas:
+                raise LookupError("Replica pool is empty")
+            self._released.clear()
+            await self._released.wait()
+
+    def _record(self, replica: Replica, latency: float, success: bool):
+        if replica.ewma_latency == 0.0:
+            replica.ewma_latency = latency
+        else:
+            replica.ewma_latency += self.ewma_alpha * (latency - replica.ewma_latency)
+        if success:
+            replica.consecutive_failures = 0
+            replica.ejections = 0
+            return
+        replica.failures += 1
+        replica.consecutive_failures += 1
+        if replica.consecutive_failures >= self.failure_threshold:
+            window = min(self.ejection_time * 2 ** replica.ejections, self.max_ejection_time)
+            replica.ejected_until = self._clock() + window
+            replica.ejections += 1
+            replica.consecutive_failures = 0
+
+    def _released_set(self):
+        if self._released is not None:
+            self._released.set()
+
+    def _ensure_loop(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._released = asyncio.Event()
@@ -0,0 +1,461 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+class StateBackend:
+    """Storage interface behind StateManager. Writes are synchronous and cheap;
+    durable backends persist them in the background."""
+
+    def start_workflow(self, workflow_id: str):
+        raise NotImplementedError
+
+    async def claim_workflow(self, workflow_id: str) -> bool:
+        """Marks the workflow as being run by this caller; False if a run is already in progress."""
+        raise NotImplementedError
+
+    async def release_workflow(self, workflow_id: str):
+        raise NotImplementedError
+
+    def update_task_status(self, workflow_id: str, task_index: int, status: str, agent_type: Optional[str] = None):
+        raise NotImplementedError
+
+    def finish_workflow(self, workflow_id: str, status: str, error: Optional[str] = None):
+        raise NotImplementedError
+
+    def get_workflow_status(self, workflow_id: str) -> Dict[int, str]:
+        raise NotImplementedError
+
+    async def fetch_workflow_status(self, workflow_id: str) -> Dict[int, str]:
+        """Status as stored, including workflows run by other processes."""
+        return self.get_workflow_status(workflow_id)
+
+    async def list_workflows(self, status: str = "running", limit: int = 100) -> List[str]:
+        raise NotImplementedError
+
+    def save_request(self, workflow_id: str, request: Dict[str, Any]):
+        """Stores the submitted request so the workflow can be resumed later."""
+        raise NotImplementedError
+
+    async def load_request(self, workflow_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def save_checkpoint(self, workflow_id: str, step: int, input_hash: str, result: Dict[str, Any]):
+        """Records a finished step's result, keyed by the exact input it ran on."""
+        raise NotImplementedError
+
+    async def load_checkpoint(self, workflow_id: str, step: int, input_hash: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def flush(self):
+        pass
+
+    async def close(self):
+        await self.flush()
+
+class InMemoryStateBackend(StateBackend):
+    """Process-local store with TTL expiry and an LRU cap on tracked workflows."""
+
+    def __init__(self, ttl: float = 3600.0, max_workflows: int = 10_000):
+        self.ttl = ttl
+        self.max_workflows = max_workflows
+        # workflow_id -> (task statuses, workflow status, last update time)
+        self._workflows: "OrderedDict[str, Tuple[Dict[int, str], str, float]]" = OrderedDict()
+        # Resume data, dropped together with the workflow entry
+        self._requests: Dict[str, Dict[str, Any]] = {}
+        self._checkpoints: Dict[str, Dict[Tuple[int, str], Dict[str, Any]]] = {}
+        # Workflows with a run in progress; not subject to TTL eviction
+        self._claimed: Set[str] = set()
+
+    def start_workflow(self, workflow_id: str):
+        self._put(workflow_id, {}, "running")
+
+    async def claim_workflow(self, workflow_id: str) -> bool:
+        if workflow_id in self._claimed:
+            return False
+        self._claimed.add(workflow_id)
+        return True
+
+    async def release_workflow(self, workflow_id: str):
+        self._claimed.discard(workflow_id)
+
+    def update_task_status(self, workflow_id: str, task_index: int, status: str, agent_type: Optional[str] = None):
+        tasks, workflow_status, _ = self._workflows.get(workflow_id) or ({}, "running", 0.0)
+        tasks[task_index] = status
+        self._put(workflow_id, tasks, workflow_status)
+
+    def finish_workflow(self, workflow_id: str, status: str, error: Optional[str] = None):
+        tasks = self._workflows[workflow_id][0] if workflow_id in self._workflows else {}
+        self._put(workflow_id, tasks, status)
+
+    def get_workflow_status(self, workflow_id: str) -> Dict[int, str]:
+        entry = self._workflows.get(workflow_id)
+        if entry is None:
+            return {}
+        if time.time() - entry[2] > self.ttl:
+            self._drop(workflow_id)
+            return {}
+        return entry[0]
+
+    async def list_workflows(self, status: str = "running", limit: int = 100) -> List[str]:
+        self._evict()
+        return [wid for wid, (_, wf_status, _) in self._workflows.items() if wf_status == status][:limit]
+
+    def save_request(self, workflow_id: str, request: Dict[str, Any]):
+        if workflow_id in self._workflows:
+            self._requests[workflow_id] = request
+
+    async def load_request(self, workflow_id: str) -> Optional[Dict[str, Any]]:
+        self.get_workflow_status(workflow_id)  # drops the entry if it has expired
+        return self._requests.get(workflow_id)
+
+    def save_checkpoint(self, workflow_id: str, step: int, input_hash: str, result: Dict[str, Any]):
+        if workflow_id in self._workflows:
+            self._checkpoints.setdefault(workflow_id, {})[(step, input_hash)] = result
+
+    async def load_checkpoint(self, workflow_id: str, step: int, input_hash: str) -> Optional[Dict[str, Any]]:
+        return self._checkpoints.get(workflow_id, {}).get((step, input_hash))
+
+    def _put(self, workflow_id: str, tasks: Dict[int, str], status: str):
+        self._workflows[workflow_id] = (tasks, status, time.time())
+        self._workflows.move_to_end(workflow_id)
+        self._evict()
+
+    def _evict(self):
+        cutoff = time.time() - self.ttl
+        # Entries are kept in last-update order, so expired ones sit at the front
+        while self._workflows and next(iter(self._workflows.values()))[2] < cutoff:
+            self._drop(next(iter(self._workflows)))
+        while len(self._workflows) > self.max_workflows:
+            self._drop(next(iter(self._workflows)))
+
+    def _drop(self, workflow_id: str):
+        self._workflows.pop(workflow_id, None)
+        self._requests.pop(workflow_id, None)
+        self._checkpoints.pop(workflow_id, None)
+
+class MongoStateBackend(StateBackend):
+    """
+    Persists task and workflow status to the AgentStatus / WorkflowExecution
+    collections and step checkpoints to WorkflowCheckpoint. Updates are
+    coalesced per (workflow, task) and written with unordered bulk upserts,
+    either every `flush_interval` seconds or as soon as `batch_size` updates
+    are pending. Reads in this process are served from an in-memory TTL
+    cache; other workers use `fetch_workflow_status`, and checkpoint/request
+    lookups fall back to the collections. While Mongo is unreachable failed
+    batches are kept for the next flush, up to `max_pending` updates; beyond
+    that the oldest task updates, then checkpoints, are dropped.
+
+    A run claims its workflow with a lease on the WorkflowExecution document
+    (`run_owner`, `run_lease_until`), renewed every third of
+    `run_lease_time`, so a second run in any process is refused until the
+    first releases it or its process dies and the lease lapses.
+    """
+
+    def __init__(
+        self,
+        status_collection: Any = None,
+        workflow_collection: Any = None,
+        flush_interval: float = 0.5,
+        batch_size: int = 500,
+        cache: Optional[InMemoryStateBackend] = None,
+        checkpoint_collection: Any = None,
+        ready: Optional[Callable[[], Awaitable[None]]] = None,
+        max_pending: int = 100_000,
+        run_lease_time: float = 30.0,
+    ):
+        self._status_collection = status_collection
+        self._workflow_collection = workflow_collection
+        self._checkpoint_collection = checkpoint_collection
+        # Awaited before touching the collections (background init_db in fast-start mode)
+        self.ready = ready
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.run_lease_time = run_lease_time
+        self.dropped = 0
+        # workflow_id -> (lease owner, renewal task) for runs claimed by this process
+        self._leases: Dict[str, Tuple[str, Optional[asyncio.Task]]] = {}
+        self.cache = cache or InMemoryStateBackend()
+        self._pending_tasks: Dict[Tuple[str, int], Dict[str, Any]] = {}
+        self._pending_workflows: Dict[str, Dict[str, Any]] = {}
+        self._pending_checkpoints: Dict[Tuple[str, int, str], Dict[str, Any]] = {}
+        self._flusher: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+
+    @property
+    def status_collection(self):
+        if self._status_collection is None:
+            from ..db.models import AgentStatus
+            self._status_collection = AgentStatus.get_pymongo_collection()
+        return self._status_collection
+
+    @property
+    def workflow_collection(self):
+        if self._workflow_collection is None:
+            from ..db.models import WorkflowExecution
+            self._workflow_collection = WorkflowExecution.get_pymongo_collection()
+        return self._workflow_collection
+
+    @property
+    def checkpoint_collection(self):
+        if self._checkpoint_collection is None:
+            from ..db.models import WorkflowCheckpoint
+            self._checkpoint_collection = WorkflowCheckpoint.get_pymongo_collection()
+        return self._checkpoint_collection
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending_tasks) + len(self._pending_workflows) + len(self._pending_checkpoints)
+
+    def start_workflow(self, workflow_id: str):
+        self.cache.start_workflow(workflow_id)
+        now = time.time()
+        self._pending_workflows[workflow_id] = {"status": "running", "started_at": now, "error": None}
+        self._schedule_flush()
+
+    async def claim_workflow(self, workflow_id: str) -> bool:
+        if not await self.cache.claim_workflow(workflow_id):
+            return False
+        owner = uuid.uuid4().hex
+        try:
+            if self.ready is not None:
+                await self.ready()
+            now = time.time()
+            lease = {"$set": {"run_owner": owner, "run_lease_until": now + self.run_lease_time}}
+            result = await self.workflow_collection.update_one(
+                {"workflow_id": workflow_id, "run_lease_until": {"$lte": now}}, lease
+            )
+            if result.modified_count == 0:
+                # Never claimed before; the unique workflow_id index lets only one insert win
+                await self.workflow_collection.update_one(
+                    {"workflow_id": workflow_id, "run_lease_until": {"$exists": False}},
+                    {**lease, "$setOnInsert": {"tasks": [], "results": [], "status": "running"}},
+                    upsert=True,
+                )
+        except DuplicateKeyError:
+            await self.cache.release_workflow(workflow_id)
+            return False
+        except Exception:
+            # Mongo unreachable: runs in this process are still exclusive
+            logger.warning("Could not record the run of workflow %s in Mongo", workflow_id, exc_info=True)
+            self._leases[workflow_id] = (owner, None)
+            return True
+        self._leases[workflow_id] = (owner, asyncio.ensure_future(self._renew_lease(workflow_id, owner)))
+        return True
+
+    async def release_workflow(self, workflow_id: str):
+        owner, renewal = self._leases.pop(workflow_id, (None, None))
+        await self.cache.release_workflow(workflow_id)
+        if renewal is None:
+            return
+        renewal.cancel()
+        try:
+            await self.workflow_collection.update_one(
+                {"workflow_id": workflow_id, "run_owner": owner},
+                {"$set": {"run_owner": None, "run_lease_until": 0.0}},
+            )
+        except Exception:
+            logger.warning("Could not release workflow %s; its lease will lapse", workflow_id, exc_info=True)
+
+    async def _renew_lease(self, workflow_id: str, owner: str):
+        while True:
+            await asyncio.sleep(self.run_lease_time / 3)
+            try:
+                await self.workflow_collection.update_one(
+                    {"workflow_id": workflow_id, "run_owner": owner},
+                    {"$set": {"run_lease_until": time.time() + self.run_lease_time}},
+                )
+            except Exception:
+                # Retried on the next round; the lease outlives one missed renewal
+                pass
+
+    def update_task_status(self, workflow_id: str, task_index: int, status: str, agent_type: Optional[str] = None):
+        self.cache.update_task_status(workflow_id, task_index, status, agent_type)
+        update = self._pending_tasks.setdefault((workflow_id, task_index), {})
+        update["status"] = status
+        update["updated_at"] = time.time()
+        if agent_type is not None:
+            update["agent_type"] = str(getattr(agent_type, "value", agent_type))
+        self._schedule_flush()
+
+    def finish_workflow(self, workflow_id: str, status: str, error: Optional[str] = None):
+        self.cache.finish_workflow(workflow_id, status, error)
+        update = self._pending_workflows.setdefault(workflow_id, {})
+        update.update({"status": status, "error": error, "finished_at": time.time()})
+        self._schedule_flush()
+
+    def get_workflow_status(self, workflow_id: str) -> Dict[int, str]:
+        return self.cache.get_workflow_status(workflow_id)
+
+    async def fetch_workflow_status(self, workflow_id: str) -> Dict[int, str]:
+        local = dict(self.cache.get_workflow_status(workflow_id))
+        try:
+            await self.flush()
+            cursor = self.status_collection.find(
+                {"workflow_id": workflow_id}, {"task_index": 1, "status": 1, "_id": 0}
+            )
+            stored = {doc["task_index"]: doc["status"] for doc in await cursor.to_list(length=None)}
+        except Exception:
+            # Mongo unreachable: a workflow run here is still answerable from the cache
+            if local:
+                return local
+            raise
+        # This process runs the workflow, so its cached updates are the newest
+        return {**stored, **local}
+
+    async def list_workflows(self, status: str = "running", limit: int = 100) -> List[str]:
+        await self.flush()
+        cursor = self.workflow_collection.find({"status": status}, {"workflow_id": 1, "_id": 0}).limit(limit)
+        return [doc["workflow_id"] for doc in await cursor.to_list(length=limit)]
+
+    def save_request(self, workflow_id: str, request: Dict[str, Any]):
+        self.cache.save_request(workflow_id, request)
+        self._pending_workflows.setdefault(workflow_id, {})["request"] = request
+        self._schedule_flush()
+
+    async def load_request(self, workflow_id: str) -> Optional[Dict[str, Any]]:
+        request = await self.cache.load_request(workflow_id)
+        if request is not None:
+            return request
+        # Resuming a workflow this process has not seen: pull its request and checkpoints into the cache
+        await self.flush()
+        doc = await self.workflow_collection.find_one({"workflow_id": workflow_id}, {"request": 1, "_id": 0})
+        request = (doc or {}).get("request")
+        if request is None:
+            return None
+        self.cache.start_workflow(workflow_id)
+        self.cache.save_request(workflow_id, request)
+        cursor = self.checkpoint_collection.find(
+            {"workflow_id": workflow_id}, {"step": 1, "input_hash": 1, "result": 1, "_id": 0}
+        )
+        for checkpoint in await cursor.to_list(length=None):
+            self.cache.save_checkpoint(workflow_id, checkpoint["step"], checkpoint["input_hash"], checkpoint["result"])
+        return request
+
+    def save_checkpoint(self, workflow_id: str, step: int, input_hash: str, result: Dict[str, Any]):
+        self.cache.save_checkpoint(workflow_id, step, input_hash, result)
+        self._pending_checkpoints[(workflow_id, step, input_hash)] = {"result": result, "created_at": time.time()}
+        self._schedule_flush()
+
+    async def load_checkpoint(self, workflow_id: str, step: int, input_hash: str) -> Optional[Dict[str, Any]]:
+        # Served from the cache only, so running steps never wait on Mongo; load_request hydrates it on resume
+        return await self.cache.load_checkpoint(workflow_id, step, input_hash)
+
+    async def flush(self):
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            tasks, self._pending_tasks = self._pending_tasks, {}
+            workflows, self._pending_workflows = self._pending_workflows, {}
+            checkpoints, self._pending_checkpoints = self._pending_checkpoints, {}
+            try:
+                if self.ready is not None and (tasks or workflows or checkpoints):
+                    await self.ready()
+                if workflows:
+                    await self.workflow_collection.bulk_write([
+                        UpdateOne(
+                            {"workflow_id": wid},
+                            {"$set": fields, "$setOnInsert": {"tasks": [], "results": []}},
+                            upsert=True,
+                        )
+                        for wid, fields in workflows.items()
+                    ], ordered=False)
+                if tasks:
+                    await self.status_collection.bulk_write([
+                        UpdateOne({"workflow_id": wid, "task_index": index}, self._task_update(fields), upsert=True)
+                        for (wid, index), fields in tasks.items()
+                    ], ordered=False)
+                if checkpoints:
+                    await self.checkpoint_collection.bulk_write([
+                        UpdateOne({"workflow_id": wid, "step": step, "input_hash": h}, {"$set": fields}, upsert=True)
+                        for (wid, step, h), fields in checkpoints.items()
+                    ], ordered=False)
+            except BaseException:
+                # Put the batch back (newer updates win) so the next flush retries it
+                for key, fields in tasks.items():
+                    self._pending_tasks[key] = {**fields, **self._pending_tasks.get(key, {})}
+                for key, fields in workflows.items():
+                    self._pending_workflows[key] = {**fields, **self._pending_workflows.get(key, {})}
+                for key, fields in checkpoints.items():
+                    self._pending_checkpoints.setdefault(key, fields)
+                self._trim_pending()
+                raise
+
+    async def close(self):
+        flusher, self._flusher = self._flusher, None
+        if flusher is not None:
+            flusher.cancel()
+            await asyncio.gather(flusher, return_exceptions=True)
+        await self.flush()
+
+    @staticmethod
+    def _task_update(fields: Dict[str, Any]) -> Dict[str, Any]:
+        update: Dict[str, Any] = {"$set": fields}
+        if "agent_type" not in fields:
+            update["$setOnInsert"] = {"agent_type": "unknown"}
+        return update
+
+    def _schedule_flush(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._flusher is None or self._flusher.done() or self._flusher.get_loop() is not loop:
+            self._wake = asyncio.Event()
+            self._flusher = loop.create_task(self._flush_loop())
+        if self.pending >= self.batch_size:
+            self._wake.set()
+        if self.pending > self.max_pending:
+            self._trim_pending()
+
+    def _trim_pending(self):
+        # Keeps memory bounded while Mongo is down. Workflow records (status,
+        # resume request) go last; the cache still serves this process.
+        excess = self.pending - self.max_pending
+        if excess <= 0:
+            return
+        for pending in (self._pending_tasks, self._pending_checkpoints, self._pending_workflows):
+            while excess > 0 and pending:
+                del pending[next(iter(pending))]
+                excess -= 1
+                self.dropped += 1
+        logger.warning("State store backlog over %d updates; dropped the oldest (%d so far)", self.max_pending, self.dropped)
+
+    async def _flush_loop(self):
+        # Flush every interval, or early once a full batch is pending; exit when idle
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception:
+                # Batch was re-queued by flush(); retry on the next round
+                pass
+            if not self.pending:
+                self._flusher = None
+                return
+
+def create_state_backend() -> StateBackend:
+    if settings.state_backend == "mongo":
+        from ..db.mongo import wait_for_db
+        return MongoStateBackend(
+            ready=wait_for_db,
+            flush_interval=settings.state_flush_interval,
+            batch_size=settings.state_flush_batch_size,
+            max_pending=settings.state_max_pending,
+            run_lease_time=settings.workflow_run_lease_time,
+            cache=InMemoryStateBackend(ttl=settings.state_ttl, max_workflows=settings.state_max_workflows),
+        )
+    return InMemoryStateBackend(ttl=settings.state_ttl, max_workflows=settings.state_max_workflows)
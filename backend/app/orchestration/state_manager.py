@@ -1,20 +1,97 @@
-from typing import Dict, Any, Optional
+import asyncio
+from typing import Dict, Any, List, Optional, Set
+from .state_backends import StateBackend, create_state_backend
+
+class WorkflowRunningError(Exception):
+    """Raised when a workflow is started while another run of it is still in progress."""
 
 class StateManager:
-    def __init__(self):
-        # workflow_id -> {task_index: status}
-        self.workflow_states: Dict[str, Dict[int, str]] = {}
+    def __init__(self, backend: Optional[StateBackend] = None, subscriber_queue_size: int = 256):
+        # Pluggable storage: in-memory with TTL eviction, or persisted to Mongo
+        self.backend = backend or create_state_backend()
+        self.subscriber_queue_size = subscriber_queue_size
+        # workflow_id -> queues of live progress listeners (SSE/WebSocket streams)
+        self.subscribers: Dict[str, Set[asyncio.Queue]] = {}
 
     def start_workflow(self, workflow_id: Optional[str]):
         if workflow_id:
-            self.workflow_states[workflow_id] = {}
+            self.backend.start_workflow(workflow_id)
+
+    async def claim_workflow(self, workflow_id: str) -> bool:
+        return await self.backend.claim_workflow(workflow_id)
+
+    async def release_workflow(self, workflow_id: str):
+        await self.backend.release_workflow(workflow_id)
+
+    def update_task_status(self, workflow_id: Optional[str], task_index: int, status: str, agent_type: Optional[str] = None):
+        if workflow_id:
+            self.backend.update_task_status(workflow_id, task_index, status, agent_type)
+            self._publish(workflow_id, {
+                "event": "task",
+                "workflow_id": workflow_id,
+                "task_index": task_index,
+                "agent_type": getattr(agent_type, "value", agent_type),
+                "status": status,
+            })
 
-    def update_task_status(self, workflow_id: Optional[str], task_index: int, status: str):
+    def finish_workflow(self, workflow_id: Optional[str], status: str, error: Optional[str] = None):
         if workflow_id:
-            self.workflow_states.setdefault(workflow_id, {})[task_index] = status
+            self.backend.finish_workflow(workflow_id, status, error)
+            self._publish(workflow_id, {
+                "event": "finished", "workflow_id": workflow_id, "status": status, "error": error,
+            })
 
     def get_task_status(self, workflow_id: Optional[str], task_index: int) -> Optional[str]:
-        return self.workflow_states.get(workflow_id, {}).get(task_index, None)
+        return self.get_workflow_status(workflow_id).get(task_index, None)
 
     def get_workflow_status(self, workflow_id: Optional[str]) -> Dict[int, str]:
-        return self.workflow_states.get(workflow_id, {})
+        if not workflow_id:
+            return {}
+        return self.backend.get_workflow_status(workflow_id)
+
+    async def fetch_workflow_status(self, workflow_id: Optional[str]) -> Dict[int, str]:
+        """Like `get_workflow_status`, but reads the durable store when there is one."""
+        if not workflow_id:
+            return {}
+        return await self.backend.fetch_workflow_status(workflow_id)
+
+    async def list_workflows(self, status: str = "running", limit: int = 100) -> List[str]:
+        return await self.backend.list_workflows(status, limit)
+
+    def save_request(self, workflow_id: Optional[str], request: Dict[str, Any]):
+        if workflow_id:
+            self.backend.save_request(workflow_id, request)
+
+    async def load_request(self, workflow_id: str) -> Optional[Dict[str, Any]]:
+        return await self.backend.load_request(workflow_id)
+
+    def save_checkpoint(self, workflow_id: Optional[str], step: int, input_hash: str, result: Dict[str, Any]):
+        if workflow_id:
+            self.backend.save_checkpoint(workflow_id, step, input_hash, result)
+
+    async def load_checkpoint(self, workflow_id: Optional[str], step: int, input_hash: str) -> Optional[Dict[str, Any]]:
+        if not workflow_id:
+            return None
+        return await self.backend.load_checkpoint(workflow_id, step, input_hash)
+
+    def subscribe(self, workflow_id: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.subscriber_queue_size)
+        self.subscribers.setdefault(workflow_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, workflow_id: str, queue: asyncio.Queue):
+        queues = self.subscribers.get(workflow_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self.subscribers[workflow_id]
+
+    async def close(self):
+        await self.backend.close()
+
+    def _publish(self, workflow_id: str, event: Dict[str, Any]):
+        for queue in self.subscribers.get(workflow_id, ()):
+            if queue.full():
+                # Slow consumer: drop its oldest event rather than block the workflow
+                queue.get_nowait()
+            queue.put_nowait(event)
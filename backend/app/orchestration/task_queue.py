@@ -0,0 +1,147 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+from collections import deque
+from typing import Awaitable, Callable, Deque, List, Optional, Tuple
+from ..models.api_models import AgentTask, AgentResult
+
+class QueueFullError(Exception):
+    """Raised when a task is submitted to a queue that is already at capacity."""
+
+class _Entry:
+    __slots__ = ("task", "future", "taken", "context")
+
+    def __init__(self, task: AgentTask, future: asyncio.Future):
+        self.task = task
+        self.future = future
+        self.taken = False
+        # Run the handler in the submitter's context so tracing spans carry across the queue
+        self.context = contextvars.copy_context()
+
+class PriorityTaskQueue:
+    """
+    Bounded priority queue drained by a fixed pool of worker coroutines.
+    Higher `AgentTask.priority` runs first, but every `fairness_interval`-th
+    dispatch takes the oldest waiting task instead so low-priority work
+    cannot starve under sustained high-priority load.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[AgentTask], Awaitable[AgentResult]],
+        workers: int = 4,
+        max_size: int = 100,
+        fairness_interval: int = 5,
+    ):
+        self.handler = handler
+        self.workers = workers
+        self.max_size = max_size
+        self.fairness_interval = fairness_interval
+        self._heap: List[Tuple[int, int, _Entry]] = []
+        self._fifo: Deque[_Entry] = deque()
+        self._seq = itertools.count()
+        self._size = 0
+        self._dispatched = 0
+        self._running = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._available: Optional[asyncio.Event] = None
+        self._worker_tasks: List[asyncio.Task] = []
+
+    @property
+    def depth(self) -> int:
+        return self._size
+
+    async def submit(self, task: AgentTask) -> AgentResult:
+        self._ensure_workers()
+        if self._size >= self.max_size:
+            raise QueueFullError(f"{task.agent_type} queue is full ({self.max_size} pending tasks)")
+        entry = _Entry(task, self._loop.create_future())
+        priority = task.priority if task.priority is not None else 0
+        heapq.heappush(self._heap, (-priority, next(self._seq), entry))
+        self._fifo.append(entry)
+        self._size += 1
+        self._available.set()
+        return await entry.future
+
+    async def shutdown(self):
+        for worker in self._worker_tasks:
+            worker.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        # Tasks still queued will never be dispatched; fail them rather than leave submitters hanging
+        for entry in self._fifo:
+            if not entry.taken and not entry.future.done():
+                entry.future.set_exception(RuntimeError("Task queue shut down before the task ran"))
+        self._heap.clear()
+        self._fifo.clear()
+        self._size = 0
+        self._loop = None
+
+    def _ensure_workers(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        old = self._loop
+        if old is not None and not old.is_closed():
+            # Futures of the other loop can only be resolved there; refuse rather than orphan them
+            if self._size or self._running:
+                raise RuntimeError("Task queue is still serving tasks on another event loop")
+            for worker in self._worker_tasks:
+                old.call_soon_threadsafe(worker.cancel)
+        # First use, or the previous loop is closed (nothing can await its futures any more)
+        self._heap.clear()
+        self._fifo.clear()
+        self._size = 0
+        self._loop = loop
+        self._available = asyncio.Event()
+        self._worker_tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+
+    def _pop(self) -> _Entry:
+        self._dispatched += 1
+        if self._dispatched % self.fairness_interval == 0:
+            self._discard_taken()
+            entry = self._fifo.popleft()
+        else:
+            self._discard_taken()
+            entry = heapq.heappop(self._heap)[2]
+        entry.taken = True
+        self._size -= 1
+        self._discard_taken()
+        return entry
+
+    def _discard_taken(self):
+        # Entries live in both the heap and the FIFO; drop ones already dispatched via the other
+        while self._heap and self._heap[0][2].taken:
+            heapq.heappop(self._heap)
+        while self._fifo and self._fifo[0].taken:
+            self._fifo.popleft()
+
+    async def _worker(self):
+        while True:
+            while self._size == 0:
+                self._available.clear()
+                await self._available.wait()
+            entry = self._pop()
+            if entry.future.done():
+                # Submitter gave up while the task was queued
+                continue
+            self._running += 1
+            job = self._loop.create_task(self.handler(entry.task), context=entry.context)
+            # A submitter that stops waiting (deadline, disconnect) cancels the running job too
+            entry.future.add_done_callback(lambda future, job=job: job.cancel() if future.cancelled() else None)
+            try:
+                result = await job
+            except asyncio.CancelledError:
+                if asyncio.current_task().cancelling():
+                    job.cancel()
+                    entry.future.cancel()
+                    raise
+            except Exception as e:
+                if not entry.future.done():
+                    entry.future.set_exception(e)
+            else:
+                if not entry.future.done():
+                    entry.future.set_result(result)
+            finally:
+                self._running -= 1
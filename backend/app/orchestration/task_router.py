@@ -1,19 +1,117 @@
-from typing import Type, Dict, Any, Optional
+import time
+from typing import Type, Dict, Any, Iterable, Optional
 from ..models.api_models import AgentTask, AgentType, AgentResult
 from .agent_manager import AgentManager
+from .task_queue import PriorityTaskQueue
+from .durable_queue import DurableTaskQueue
+from .dedup import current_deduplicator
+from .replica_pool import is_error_output
+from ..config import settings
+from ..metrics import AGENT_IN_FLIGHT, AGENT_TASK_SECONDS, TASK_QUEUE_DEPTH
+from .. import tracing
 
 class TaskRouter:
-    def __init__(self, agent_manager: AgentManager):
+    def __init__(
+        self,
+        agent_manager: AgentManager,
+        workers_per_type: int = 4,
+        max_queue_size: int = 100,
+        fairness_interval: int = 5,
+        remote_queue: Optional[DurableTaskQueue] = None,
+        remote_types: Optional[Iterable[str]] = None,
+    ):
         self.agent_manager = agent_manager
+        self.workers_per_type = workers_per_type
+        self.max_queue_size = max_queue_size
+        self.fairness_interval = fairness_interval
+        self.queues: Dict[AgentType, PriorityTaskQueue] = {}
+        # Enqueue mode: these agent types (all when None) run on workers behind remote_queue
+        self.remote_queue = remote_queue
+        self.remote_types = None if remote_types is None else {AgentType(t) for t in remote_types}
 
     async def route_task(self, task: AgentTask) -> AgentResult:
+        deduplicator = current_deduplicator.get()
+        if deduplicator is not None:
+            # Inside a batch: identical sub-tasks share one execution
+            return await deduplicator.run(task, self._submit)
+        return await self._submit(task)
+
+    async def _submit(self, task: AgentTask) -> AgentResult:
+        if self.is_remote(task.agent_type):
+            with tracing.span("agent.remote", agent_type=task.agent_type.value):
+                return await self.remote_queue.submit(task)
+        # Queue behind the agent type's worker pool; raises QueueFullError under backpressure
+        return await self._queue_for(task.agent_type).submit(task)
+
+    def is_remote(self, agent_type: AgentType) -> bool:
+        return self.remote_queue is not None and (self.remote_types is None or agent_type in self.remote_types)
+
+    def queue_depths(self) -> Dict[AgentType, int]:
+        return {agent_type: queue.depth for agent_type, queue in self.queues.items()}
+
+    def collect_metrics(self):
+        for agent_type, depth in self.queue_depths().items():
+            TASK_QUEUE_DEPTH.set(depth, agent_type=agent_type)
+
+    async def shutdown(self):
+        for queue in self.queues.values():
+            await queue.shutdown()
+        if self.remote_queue is not None:
+            await self.remote_queue.close()
+
+    def _queue_for(self, agent_type: AgentType) -> PriorityTaskQueue:
+        queue = self.queues.get(agent_type)
+        if queue is None:
+            queue = PriorityTaskQueue(
+                self._execute,
+                workers=self.workers_per_type,
+                max_size=self.max_queue_size,
+                fairness_interval=self.fairness_interval,
+            )
+            self.queues[agent_type] = queue
+        return queue
+
+    async def _execute(self, task: AgentTask) -> AgentResult:
         # Analyze input_data for routing intelligence (extend as needed)
-        agent = await self.agent_manager.get_agent(task.agent_type)
-        if not agent:
+        pool = self.agent_manager.get_pool(task.agent_type)
+        if pool is None or not pool.replicas:
             return AgentResult(agent_type=task.agent_type, output_data={}, success=False, error="Agent not available")
-        # Delegate to agent: in production, this is an async API call/class method
+
+        async def handle(agent) -> Dict[str, Any]:
+            with tracing.span("agent", agent_type=task.agent_type.value, agent=type(agent).__name__):
+                return await agent.handle_task(task.input_data)
+
+        # Delegate to the replica the pool picks; it tracks per-replica load, latency and failures
+        start = time.perf_counter()
+        success = False
         try:
-            result = await agent.handle_task(task.input_data)
+            with AGENT_IN_FLIGHT.track_inprogress(agent_type=task.agent_type):
+                result = await pool.call(handle)
+            if is_error_output(result):
+                # Agents catch their own exceptions and return the error in the output
+                return AgentResult(
+                    agent_type=task.agent_type, output_data=result, success=False, error=str(result.get("error"))
+                )
+            success = True
             return AgentResult(agent_type=task.agent_type, output_data=result, success=True)
         except Exception as e:
             return AgentResult(agent_type=task.agent_type, output_data={}, success=False, error=str(e))
+        finally:
+            AGENT_TASK_SECONDS.observe(time.perf_counter() - start, agent_type=task.agent_type, success=success)
+
+def create_task_router(agent_manager: AgentManager) -> TaskRouter:
+    if settings.task_dispatch == "queue":
+        from ..db.mongo import wait_for_db
+        return TaskRouter(
+            agent_manager,
+            remote_queue=DurableTaskQueue(
+                lease_time=settings.task_lease_time,
+                max_attempts=settings.task_max_attempts,
+                poll_interval=settings.task_poll_interval,
+                ready=wait_for_db,
+            ),
+            remote_types=settings.task_queue_types,
+        )
+    if settings.task_dispatch != "local":
+        raise ValueError(f"Unknown task dispatch mode: {settings.task_dispatch}")
+    return TaskRouter(agent_manager)
@@ -1,47 +1,148 @@
-from ..models.api_models import OrchestrationRequest, OrchestrationResponse, AgentResult
+import asyncio
+import hashlib
+import json
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+from ..models.api_models import OrchestrationRequest, OrchestrationResponse, AgentResult, AgentTask, AgentType
 from .task_router import TaskRouter
-from .state_manager import StateManager
+from .state_manager import StateManager, WorkflowRunningError
+from .dag_scheduler import DagScheduler
 from ..agents.decision_agent import DecisionAgent
+from ..db.write_behind import WriteBehindBuffer
+from ..metrics import WORKFLOW_SECONDS, WORKFLOW_STEP_SECONDS
+from ..config import settings
+from ..services.deadlines import deadline_scope
+from ..services.artifacts import artifact_store, current_artifact_scope, is_artifact_ref
+from .. import tracing
 
 class WorkflowEngine:
-    def __init__(self, task_router: TaskRouter, state_manager: StateManager):
+    def __init__(
+        self,
+        task_router: TaskRouter,
+        state_manager: StateManager,
+        max_concurrency: int = 8,
+        persistence: Optional[WriteBehindBuffer] = None,
+    ):
         self.task_router = task_router
         self.state_manager = state_manager
+        # Tasks/results are persisted write-behind so the request path never waits on Mongo
+        self.persistence = persistence
         self.decision_agent = DecisionAgent()
+        self.scheduler = DagScheduler(max_concurrency=max_concurrency)
 
-    async def run_workflow(self, request: OrchestrationRequest) -> OrchestrationResponse:
-        workflow_id = request.workflow_id or "wf-{:.0f}".format(StateManager.__hash__(self))
+    async def run_workflow(
+        self, request: OrchestrationRequest, cancel_event: Optional[asyncio.Event] = None
+    ) -> OrchestrationResponse:
+        """
+        Runs the task graph and the final decision. If the workflow deadline
+        passes or `cancel_event` is set (e.g. the client disconnected), running
+        steps are cancelled and a partial response with the finished steps is
+        returned.
+        """
+        workflow_id = request.workflow_id or f"wf-{uuid.uuid4().hex}"
+        # Caller-chosen ids can be run again (resume, retries); only one run at a time
+        claimed = request.workflow_id is not None
+        if claimed and not await self.state_manager.claim_workflow(workflow_id):
+            raise WorkflowRunningError(f"Workflow {workflow_id} is already running")
+        start = time.perf_counter()
+        status = "exception"
+        # Analysis outputs are published under this workflow unless an enclosing batch owns them
+        scope_token = None
+        if settings.artifact_handoff and current_artifact_scope.get() is None:
+            scope_token = current_artifact_scope.set(workflow_id)
+        try:
+            with tracing.span("workflow", workflow_id=workflow_id, tasks=len(request.tasks)) as span:
+                response = await self._run(workflow_id, request, cancel_event)
+                status = response.status
+                if span is not None:
+                    span.set_attribute("status", status)
+            return response
+        finally:
+            if scope_token is not None:
+                # Step outputs handed off by reference live only as long as the run
+                current_artifact_scope.reset(scope_token)
+                artifact_store.release(workflow_id)
+            WORKFLOW_SECONDS.observe(time.perf_counter() - start, status=status)
+            if claimed:
+                await self.state_manager.release_workflow(workflow_id)
+
+    async def _run(
+        self, workflow_id: str, request: OrchestrationRequest, cancel_event: Optional[asyncio.Event]
+    ) -> OrchestrationResponse:
         self.state_manager.start_workflow(workflow_id)
-        results = []
-
-        # 1. ResearchAgent
-        self.state_manager.update_task_status(workflow_id, 0, "in_progress")
-        research_result = await self.task_router.route_task(request.tasks[0])
-        results.append(research_result)
-        self.state_manager.update_task_status(
-            workflow_id, 0, "finished" if research_result.success else "error"
-        )
+        checkpoints = settings.workflow_checkpoints
+        if checkpoints:
+            self.state_manager.save_request(
+                workflow_id, self._json_safe(request.model_copy(update={"workflow_id": workflow_id}).model_dump())
+            )
 
-        # 2. AnalysisAgent
-        self.state_manager.update_task_status(workflow_id, 1, "in_progress")
-        analysis_input = {
-            "data": research_result.output_data.get("results") if research_result.success else []
-        }
-        analysis_task = request.tasks[1]
-        analysis_task.input_data = analysis_input
-        analysis_result = await self.task_router.route_task(analysis_task)
-        results.append(analysis_result)
-        self.state_manager.update_task_status(
-            workflow_id, 1, "finished" if analysis_result.success else "error"
-        )
+        nodes = list(range(len(request.tasks)))
+        dependencies = self._dependency_graph(request)
+        completed: Dict[int, AgentResult] = {}
+        workflow_timeout = request.timeout or settings.workflow_timeout
+
+        async def run_node(index: int, upstream: Dict[int, AgentResult]) -> AgentResult:
+            task = request.tasks[index]
+            self.state_manager.update_task_status(workflow_id, index, "in_progress", task.agent_type)
+            routed = task.model_copy(update={"input_data": self._build_input(task, upstream)})
+            input_hash = self._input_hash(routed) if checkpoints else None
+            if input_hash is not None:
+                # Idempotent steps: an identical input already ran to completion in this workflow
+                stored = await self.state_manager.load_checkpoint(workflow_id, index, input_hash)
+                if stored is not None and self._artifacts_live(stored.get("output_data")):
+                    result = AgentResult(**stored)
+                    self.state_manager.update_task_status(workflow_id, index, "finished", task.agent_type)
+                    completed[index] = result
+                    return result
+            step_timeout = task.timeout or request.step_timeout or settings.step_timeout
+            start = time.perf_counter()
+            # The step budget travels with the task's context into the agent (HTTP and executor timeouts)
+            with tracing.span("workflow.step", workflow_id=workflow_id, index=index, agent_type=task.agent_type.value), \
+                    deadline_scope(step_timeout):
+                try:
+                    result = await asyncio.wait_for(self.task_router.route_task(routed), step_timeout)
+                except asyncio.TimeoutError:
+                    result = AgentResult(
+                        agent_type=task.agent_type, output_data={}, success=False,
+                        error=f"Step timed out after {step_timeout}s",
+                    )
+            WORKFLOW_STEP_SECONDS.observe(
+                time.perf_counter() - start, agent_type=task.agent_type, status="success" if result.success else "error"
+            )
+            self.state_manager.update_task_status(
+                workflow_id, index, "finished" if result.success else "error", task.agent_type
+            )
+            completed[index] = result
+            if input_hash is not None and result.success:
+                self.state_manager.save_checkpoint(workflow_id, index, input_hash, self._json_safe(result.model_dump()))
+            await self._persist(workflow_id, index, routed, result)
+            return result
+
+        with deadline_scope(workflow_timeout):
+            graph = asyncio.ensure_future(
+                self.scheduler.run(nodes, dependencies, run_node, max_concurrency=request.max_concurrency)
+            )
+            interrupted = await self._wait_graph(graph, workflow_timeout, cancel_event)
+        if interrupted is not None:
+            return self._partial_response(workflow_id, request, nodes, completed, interrupted, workflow_timeout)
+        task_results = graph.result()
+        results = [task_results[i] for i in nodes]
 
-        # 3. DecisionAgent
-        self.state_manager.update_task_status(workflow_id, 2, "in_progress")
+        # Final DecisionAgent over everything the graph produced
+        decision_index = len(nodes)
+        self.state_manager.update_task_status(workflow_id, decision_index, "in_progress", AgentType.decision)
         decision_input = {
-            "research": research_result.output_data,
-            "analysis": analysis_result.output_data,
+            "research": self._merge_outputs(
+                [r.output_data for r in results if r.agent_type == AgentType.research]
+            ),
+            "analysis": self._merge_outputs(
+                [r.output_data for r in results if r.agent_type == AgentType.analysis]
+            ),
         }
-        decision_result_data = await self.decision_agent.execute(decision_input)
+        start = time.perf_counter()
+        with tracing.span("workflow.step", workflow_id=workflow_id, index=decision_index, agent_type="decision"):
+            decision_result_data = await self.decision_agent.execute(decision_input)
         decision_result = AgentResult(
             agent_type="decision",
             output_data=decision_result_data,
@@ -49,13 +150,19 @@ class WorkflowEngine:
             error=decision_result_data.get("error"),
         )
         results.append(decision_result)
+        WORKFLOW_STEP_SECONDS.observe(
+            time.perf_counter() - start, agent_type="decision", status="success" if decision_result.success else "error"
+        )
         decision_status = decision_result.output_data.get("status")
         new_state = (
             "finished" if decision_result.success and decision_status == "auto_approved"
             else "awaiting_human" if decision_status == "human_verification_required"
             else "error"
         )
-        self.state_manager.update_task_status(workflow_id, 2, new_state)
+        self.state_manager.update_task_status(workflow_id, decision_index, new_state, AgentType.decision)
+        await self._persist(
+            workflow_id, decision_index, AgentTask(agent_type=AgentType.decision, input_data=decision_input), decision_result
+        )
 
         # Determine overall status
         if decision_status == "auto_approved" and all(r.success for r in results):
@@ -67,6 +174,7 @@ class WorkflowEngine:
         else:
             overall_status = "error"
             error = "Workflow failed."
+        self.state_manager.finish_workflow(workflow_id, overall_status, error)
 
         return OrchestrationResponse(
             workflow_id=workflow_id,
@@ -74,3 +182,133 @@ class WorkflowEngine:
             status=overall_status,
             error=error,
         )
+
+    @staticmethod
+    async def _wait_graph(
+        graph: asyncio.Future, timeout: Optional[float], cancel_event: Optional[asyncio.Event]
+    ) -> Optional[str]:
+        """Waits for the task graph; returns "timeout"/"cancelled" if it had to be cut short."""
+        waiters = {graph}
+        cancelled = asyncio.ensure_future(cancel_event.wait()) if cancel_event is not None else None
+        if cancelled is not None:
+            waiters.add(cancelled)
+        try:
+            await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            if cancelled is not None:
+                cancelled.cancel()
+            if not graph.done():
+                # Cancels every running step, down to the in-flight upstream requests
+                graph.cancel()
+                await asyncio.gather(graph, return_exceptions=True)
+        if graph.cancelled():
+            return "cancelled" if cancel_event is not None and cancel_event.is_set() else "timeout"
+        return None
+
+    def _partial_response(
+        self,
+        workflow_id: str,
+        request: OrchestrationRequest,
+        nodes: List[int],
+        completed: Dict[int, AgentResult],
+        reason: str,
+        timeout: Optional[float],
+    ) -> OrchestrationResponse:
+        for index in nodes:
+            if index not in completed:
+                self.state_manager.update_task_status(workflow_id, index, "cancelled", request.tasks[index].agent_type)
+        error = (
+            f"Workflow deadline of {timeout}s exceeded" if reason == "timeout" else "Workflow cancelled"
+        ) + f"; {len(completed)}/{len(nodes)} steps finished."
+        self.state_manager.finish_workflow(workflow_id, reason, error)
+        return OrchestrationResponse(
+            workflow_id=workflow_id,
+            results=[completed[i] for i in nodes if i in completed],
+            status=reason,
+            error=error,
+        )
+
+    async def _persist(self, workflow_id: str, index: int, task: AgentTask, result: AgentResult):
+        if self.persistence is None:
+            return
+        record_id = f"{workflow_id}:{index}"
+        now = time.time()
+        await self.persistence.add("AgentTask", {"task_id": record_id}, {
+            "task_id": record_id,
+            "agent_type": task.agent_type.value,
+            "input_data": task.input_data,
+            "status": "finished" if result.success else "error",
+            "created_at": now,
+        })
+        await self.persistence.add("AgentResult", {"result_id": record_id}, {
+            "result_id": record_id,
+            "agent_type": result.agent_type.value,
+            "output_data": result.output_data,
+            "success": result.success,
+            "error": result.error,
+            "created_at": now,
+        })
+
+    @staticmethod
+    def _json_safe(document: Dict[str, Any]) -> Dict[str, Any]:
+        return json.loads(json.dumps(document, default=str))
+
+    @staticmethod
+    def _input_hash(task: AgentTask) -> str:
+        payload = json.dumps(
+            {"agent_type": task.agent_type.value, "input_data": task.input_data}, sort_keys=True, default=str
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    @staticmethod
+    def _artifacts_live(output: Optional[Dict[str, Any]]) -> bool:
+        # A checkpointed output pointing at a released artifact has to be recomputed
+        ref = (output or {}).get("artifact")
+        return not is_artifact_ref(ref) or artifact_store.exists(ref)
+
+    @staticmethod
+    def _dependency_graph(request: OrchestrationRequest) -> Dict[int, List[int]]:
+        if request.dependencies is not None:
+            return {int(k): list(v) for k, v in request.dependencies.items()}
+        # Legacy behaviour: each task consumes the output of the one before it
+        return {i: [i - 1] for i in range(1, len(request.tasks))}
+
+    def _build_input(self, task: AgentTask, upstream: Dict[int, AgentResult]) -> Dict[str, Any]:
+        """
+        Feeds upstream outputs into a task's input along the graph edges. Analysis
+        steps downstream of analysis steps get artifact references rather than
+        copies of the data.
+        """
+        input_data = dict(task.input_data)
+        if not upstream:
+            return input_data
+        if task.agent_type == AgentType.analysis:
+            succeeded = [r.output_data for _, r in sorted(upstream.items()) if r.success]
+            artifacts = [o["artifact"] for o in succeeded if is_artifact_ref(o.get("artifact"))]
+            if artifacts and len(artifacts) == len(succeeded):
+                input_data["data"] = artifacts[0] if len(artifacts) == 1 else artifacts
+            else:
+                input_data["data"] = self._merge_outputs(succeeded).get("results") if succeeded else []
+        else:
+            input_data["upstream"] = {i: r.output_data for i, r in upstream.items()}
+        return input_data
+
+    @staticmethod
+    def _merge_outputs(outputs: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Combines fan-in outputs of the same agent type into one output."""
+        if not outputs:
+            return {}
+        if len(outputs) == 1:
+            return outputs[0]
+        merged: Dict[str, Any] = {"results": [], "citations": [], "sources": [], "insights": []}
+        for output in outputs:
+            for key in merged:
+                value = output.get(key)
+                if isinstance(value, list):
+                    merged[key].extend(value)
+                elif value is not None:
+                    merged[key].append(value)
+        confidences = [o["confidence"] for o in outputs if isinstance(o.get("confidence"), (int, float))]
+        if confidences:
+            merged["confidence"] = sum(confidences) / len(confidences)
+        return merged
@@ -0,0 +1,126 @@
+"""
+Intermediate store for columnar step outputs. Producers put a frame once and
+hand downstream steps a small reference dict instead of the data; consumers
+read back only the columns they need as NumPy arrays. Large numeric columns
+are spilled to .npy files and memory-mapped, so readers share the OS page
+cache instead of holding private copies. Arrow tables are accepted as input
+when pyarrow is installed.
+"""
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+from ..config import settings
+
+ARTIFACT_KEY = "__artifact__"
+
+# Scope (workflow or batch id) outputs are published under while it runs; it
+# travels with the task context rather than the input so dedup keys stay stable
+current_artifact_scope: ContextVar[Optional[str]] = ContextVar("current_artifact_scope", default=None)
+
+def is_artifact_ref(value: Any) -> bool:
+    return isinstance(value, dict) and ARTIFACT_KEY in value
+
+class _Artifact:
+    __slots__ = ("columns", "rows", "scope", "created_at", "spill_dir")
+
+    def __init__(self, columns: Dict[str, Any], rows: int, scope: Optional[str], spill_dir: Optional[str]):
+        self.columns = columns
+        self.rows = rows
+        self.scope = scope
+        self.created_at = time.time()
+        self.spill_dir = spill_dir
+
+class ArtifactStore:
+    def __init__(self, spill_bytes: int = 64 * 1024 * 1024, spill_dir: Optional[str] = None, ttl: float = 3600.0):
+        self.spill_bytes = spill_bytes
+        self.spill_dir = spill_dir
+        self.ttl = ttl
+        self._artifacts: Dict[str, _Artifact] = {}
+        self._lock = threading.Lock()
+
+    def put(self, data: Any, scope: Optional[str] = None) -> Dict[str, Any]:
+        """Stores a DataFrame, Arrow table or dict of columns; returns its reference."""
+        columns = self._to_columns(data)
+        rows = len(next(iter(columns.values()))) if columns else 0
+        artifact_id = uuid.uuid4().hex
+        spill_dir = None
+        if sum(a.nbytes for a in columns.values()) >= self.spill_bytes:
+            spill_dir, columns = self._spill(artifact_id, columns)
+        with self._lock:
+            self._evict()
+            self._artifacts[artifact_id] = _Artifact(columns, rows, scope, spill_dir)
+        return {ARTIFACT_KEY: artifact_id, "columns": list(columns), "rows": rows}
+
+    def exists(self, ref: Dict[str, Any]) -> bool:
+        return ref.get(ARTIFACT_KEY) in self._artifacts
+
+    def get(self, ref: Dict[str, Any], columns: Optional[List[str]] = None) -> Dict[str, Any]:
+        """The requested columns (all by default) as arrays; no data is copied."""
+        artifact = self._artifacts.get(ref.get(ARTIFACT_KEY))
+        if artifact is None:
+            raise KeyError(f"Unknown or expired artifact: {ref.get(ARTIFACT_KEY)}")
+        if columns is None:
+            return dict(artifact.columns)
+        missing = [c for c in columns if c not in artifact.columns]
+        if missing:
+            raise KeyError(f"Artifact has no columns: {', '.join(missing)}")
+        return {c: artifact.columns[c] for c in columns}
+
+    def frame(self, ref: Dict[str, Any], columns: Optional[List[str]] = None):
+        import pandas as pd
+        return pd.DataFrame(self.get(ref, columns), copy=False)
+
+    def release(self, scope: str):
+        """Drops every artifact produced under `scope` (a workflow id) and its spill files."""
+        with self._lock:
+            doomed = [aid for aid, a in self._artifacts.items() if a.scope == scope]
+            for artifact_id in doomed:
+                self._drop(artifact_id)
+
+    def _evict(self):
+        cutoff = time.time() - self.ttl
+        for artifact_id in [aid for aid, a in self._artifacts.items() if a.created_at < cutoff]:
+            self._drop(artifact_id)
+
+    def _drop(self, artifact_id: str):
+        artifact = self._artifacts.pop(artifact_id, None)
+        if artifact is not None and artifact.spill_dir:
+            # Open memmaps keep their pages valid after unlink on POSIX
+            shutil.rmtree(artifact.spill_dir, ignore_errors=True)
+
+    def _spill(self, artifact_id: str, columns: Dict[str, Any]):
+        import numpy as np
+        directory = os.path.join(self.spill_dir or tempfile.gettempdir(), f"interflow-artifact-{artifact_id}")
+        os.makedirs(directory, exist_ok=True)
+        spilled = {}
+        for i, (name, values) in enumerate(columns.items()):
+            if values.dtype.hasobject:
+                # Object columns cannot be memory-mapped; keep them in memory
+                spilled[name] = values
+                continue
+            path = os.path.join(directory, f"{i}.npy")
+            np.save(path, values)
+            spilled[name] = np.load(path, mmap_mode="r")
+        return directory, spilled
+
+    @staticmethod
+    def _to_columns(data: Any) -> Dict[str, Any]:
+        import numpy as np
+        if hasattr(data, "column_names") and hasattr(data, "column"):  # pyarrow.Table
+            return {name: data.column(name).to_numpy() for name in data.column_names}
+        if hasattr(data, "columns") and hasattr(data, "to_numpy"):  # pandas.DataFrame
+            return {str(col): data[col].to_numpy() for col in data.columns}
+        if isinstance(data, dict):
+            return {str(k): np.asarray(v) for k, v in data.items()}
+        raise TypeError(f"Cannot store {type(data).__name__} as an artifact")
+
+artifact_store = ArtifactStore(
+    spill_bytes=settings.artifact_spill_bytes,
+    spill_dir=settings.artifact_dir,
+    ttl=settings.artifact_ttl,
+)
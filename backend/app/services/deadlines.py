@@ -0,0 +1,39 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+class DeadlineExceeded(Exception):
+    """Raised when the time budget carried by the current context has run out."""
+
+# Absolute time.monotonic() deadline for the work running in this context
+current_deadline: ContextVar[Optional[float]] = ContextVar("current_deadline", default=None)
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current budget, or None when there is no deadline."""
+    deadline = current_deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+def clamp(timeout: Optional[float]) -> Optional[float]:
+    """`timeout` shortened to fit the current budget (None means unbounded)."""
+    budget = remaining()
+    if budget is None:
+        return timeout
+    budget = max(budget, 0.0)
+    return budget if timeout is None else min(timeout, budget)
+
+@contextmanager
+def deadline_scope(timeout: Optional[float]) -> Iterator[Optional[float]]:
+    """Narrows the deadline to `timeout` seconds from now; an outer, earlier deadline still wins."""
+    if timeout is None:
+        yield current_deadline.get()
+        return
+    deadline = time.monotonic() + timeout
+    outer = current_deadline.get()
+    if outer is not None:
+        deadline = min(deadline, outer)
+    token = current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        current_deadline.reset(token)
@@ -0,0 +1,145 @@
+import asyncio
+import importlib.util
+import logging
+from typing import Callable, Dict, Optional
+import httpx
+from pydantic import BaseModel
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+class HttpClientConfig(BaseModel):
+    timeout: float = 20.0
+    connect_timeout: float = 5.0
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    max_connections_per_host: Optional[int] = None
+    http2: bool = False
+
+    @classmethod
+    def from_settings(cls, **overrides) -> "HttpClientConfig":
+        values = dict(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+            keepalive_expiry=settings.http_keepalive_expiry,
+            max_connections_per_host=settings.http_max_connections_per_host,
+            http2=settings.http2_enabled,
+        )
+        values.update(overrides)
+        return cls(**values)
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    """Response body wrapper that frees a per-host slot once the body is closed."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, release: Callable[[], None]):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release()
+
+class HostLimitedTransport(httpx.AsyncBaseTransport):
+    """Caps concurrent requests per host on top of the pool-wide httpx limits."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, max_per_host: int):
+        self._transport = transport
+        self._max_per_host = max_per_host
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        semaphore = self._semaphores.get(request.url.host)
+        if semaphore is None:
+            semaphore = self._semaphores[request.url.host] = asyncio.Semaphore(self._max_per_host)
+        await semaphore.acquire()
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                semaphore.release()
+
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            release()
+            raise
+        if response.is_closed:
+            # Body was fully buffered by the transport, nothing left to hold the slot for
+            release()
+        else:
+            response.stream = _ReleasingStream(response.stream, release)
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+def _http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+def build_client(config: HttpClientConfig) -> httpx.AsyncClient:
+    http2 = config.http2
+    if http2 and not _http2_available():
+        logger.warning("HTTP/2 requested but the 'h2' package is not installed; using HTTP/1.1")
+        http2 = False
+    limits = httpx.Limits(
+        max_connections=config.max_connections,
+        max_keepalive_connections=config.max_keepalive_connections,
+        keepalive_expiry=config.keepalive_expiry,
+    )
+    transport: httpx.AsyncBaseTransport = httpx.AsyncHTTPTransport(limits=limits, http2=http2)
+    if config.max_connections_per_host:
+        transport = HostLimitedTransport(transport, config.max_connections_per_host)
+    return httpx.AsyncClient(
+        transport=transport,
+        timeout=httpx.Timeout(config.timeout, connect=config.connect_timeout),
+    )
+
+class HttpClientRegistry:
+    """
+    App-wide registry of pooled `httpx.AsyncClient`s, one per named consumer
+    (usually an agent type) so each can carry its own timeouts while reusing
+    keep-alive connections across agent instances.
+    """
+
+    def __init__(self):
+        self.configs: Dict[str, HttpClientConfig] = {
+            "default": HttpClientConfig.from_settings(),
+            "research": HttpClientConfig.from_settings(
+                timeout=settings.research_timeout,
+                connect_timeout=settings.research_connect_timeout,
+            ),
+        }
+        self.clients: Dict[str, httpx.AsyncClient] = {}
+
+    def configure(self, name: str, config: HttpClientConfig):
+        self.configs[name] = config
+
+    def get(self, name: str = "default") -> httpx.AsyncClient:
+        client = self.clients.get(name)
+        if client is None or client.is_closed:
+            config = self.configs.get(name) or self.configs["default"]
+            client = self.clients[name] = build_client(config)
+        return client
+
+    async def startup(self):
+        for name in self.configs:
+            self.get(name)
+
+    async def aclose(self):
+        clients, self.clients = self.clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+http_clients = HttpClientRegistry()
+
+def get_http_client(name: str = "default") -> httpx.AsyncClient:
+    return http_clients.get(name)
@@ -0,0 +1,79 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+from ..config import settings
+from .batching import MicroBatcher
+
+def _default_pipeline_factory(task: str, model_path: str):
+    # Imported lazily: transformers/torch take seconds to import
+    from transformers import pipeline
+    return pipeline(task, model=model_path)
+
+class LocalModelBackend:
+    """
+    In-process transformers backend. The model is loaded from a local path once,
+    concurrent requests are micro-batched, and generation runs on a dedicated
+    thread pool so the event loop is never blocked. Results use the same shape
+    as the hosted inference API: a list of `{"generated_text": ...}` dicts.
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        task: str = "text-generation",
+        max_batch_size: int = 8,
+        max_wait_ms: float = 10.0,
+        max_workers: int = 1,
+        generate_kwargs: Optional[Dict[str, Any]] = None,
+        pipeline_factory: Callable[[str, str], Any] = _default_pipeline_factory,
+    ):
+        self.model_path = model_path
+        self.task = task
+        self.generate_kwargs = generate_kwargs or {}
+        self.pipeline_factory = pipeline_factory
+        self._pipeline = None
+        self._load_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="local-model")
+        self.batcher = MicroBatcher(self._generate_batch, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+
+    @property
+    def loaded(self) -> bool:
+        return self._pipeline is not None
+
+    async def generate(self, query: str) -> List[Dict[str, Any]]:
+        return await self.batcher.submit(query)
+
+    async def warmup(self):
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._load)
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _generate_batch(self, queries: List[str]) -> List[List[Dict[str, Any]]]:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._run, queries)
+
+    def _load(self):
+        with self._load_lock:
+            if self._pipeline is None:
+                self._pipeline = self.pipeline_factory(self.task, self.model_path)
+        return self._pipeline
+
+    def _run(self, queries: List[str]) -> List[List[Dict[str, Any]]]:
+        outputs = self._load()(queries, batch_size=len(queries), **self.generate_kwargs)
+        return [out if isinstance(out, list) else [out] for out in outputs]
+
+# One backend per model path so each model is loaded only once per process
+_backends: Dict[str, LocalModelBackend] = {}
+
+def get_local_backend(model_path: str, **kwargs) -> LocalModelBackend:
+    backend = _backends.get(model_path)
+    if backend is None:
+        backend = _backends[model_path] = LocalModelBackend(
+            model_path,
+            max_batch_size=settings.local_model_batch_size,
+            max_wait_ms=settings.local_model_batch_wait_ms,
+            generate_kwargs={"max_new_tokens": settings.local_model_max_new_tokens},
+            **kwargs,
+        )
+    return backend
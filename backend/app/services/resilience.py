@@ -0,0 +1,147 @@
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Optional
+from ..config import settings
+
+class CircuitOpenError(Exception):
+    """Raised when a call is short-circuited because the upstream is failing."""
+
+class TokenBucket:
+    """
+    Async token-bucket rate limiter with AIMD adaptation: the refill rate is
+    halved whenever the upstream throttles us and creeps back up on success.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float,
+        min_rate: Optional[float] = None,
+        increase: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self.min_rate = min_rate if min_rate is not None else rate / 16
+        self.increase = increase if increase is not None else rate / 20
+        self._clock = clock
+        self._tokens = capacity
+        self._updated = clock()
+        self._blocked_until = 0.0
+
+    async def acquire(self, tokens: float = 1.0):
+        while True:
+            now = self._clock()
+            if now < self._blocked_until:
+                await asyncio.sleep(self._blocked_until - now)
+                continue
+            self._refill(now)
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return
+            await asyncio.sleep((tokens - self._tokens) / self.rate)
+
+    def on_throttle(self, retry_after: Optional[float] = None):
+        self.rate = max(self.min_rate, self.rate / 2)
+        self._tokens = 0.0
+        if retry_after:
+            # Every caller sharing this bucket waits out the upstream's Retry-After
+            self._blocked_until = max(self._blocked_until, self._clock() + retry_after)
+
+    def on_success(self):
+        self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+
+    def before_call(self):
+        if self.state == self.OPEN:
+            if self._clock() - self._opened_at < self.recovery_timeout:
+                raise CircuitOpenError("Circuit open: upstream is failing, call short-circuited")
+            self.state = self.HALF_OPEN
+            self._half_open_calls = 0
+        if self.state == self.HALF_OPEN:
+            if self._half_open_calls >= self.half_open_max_calls:
+                raise CircuitOpenError("Circuit half-open: trial call already in progress")
+            self._half_open_calls += 1
+
+    def release(self):
+        """Returns a half-open trial slot taken by `before_call` when the call recorded no outcome."""
+        if self.state == self.HALF_OPEN and self._half_open_calls > 0:
+            self._half_open_calls -= 1
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self._opened_at = self._clock()
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parses a Retry-After header given either as seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(attempt: int, base: float, cap: float, retry_after: Optional[float] = None) -> float:
+    """Exponential backoff with full jitter, never shorter than the upstream's Retry-After."""
+    delay = random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+# Shared per-upstream state so every agent instance backs off together
+_rate_limiters: Dict[str, TokenBucket] = {}
+_circuit_breakers: Dict[str, CircuitBreaker] = {}
+
+def get_rate_limiter(upstream: str) -> TokenBucket:
+    limiter = _rate_limiters.get(upstream)
+    if limiter is None:
+        limiter = _rate_limiters[upstream] = TokenBucket(
+            rate=settings.upstream_rate_limit, capacity=settings.upstream_rate_burst
+        )
+    return limiter
+
+def get_circuit_breaker(upstream: str) -> CircuitBreaker:
+    breaker = _circuit_breakers.get(upstream)
+    if breaker is None:
+        breaker = _circuit_breakers[upstream] = CircuitBreaker(
+            failure_threshold=settings.circuit_failure_threshold,
+            recovery_timeout=settings.circuit_recovery_timeout,
+        )
+    return breaker
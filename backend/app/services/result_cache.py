@@ -0,0 +1,249 @@
+import asyncio
+import contextvars
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from .deadlines import current_deadline
+
+class SqliteCacheStore:
+    """
+    On-disk backing store so cached results survive restarts. All sqlite work
+    runs on one dedicated thread: writes are queued and committed in batches,
+    and `aget` awaits reads there, so the event loop never blocks on disk.
+    The thread and the database are opened on first use, not at construction.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        # key -> (value, expires_at) not yet committed; newest write wins
+        self._pending: Dict[str, Tuple[Any, float]] = {}
+        self._pending_lock = threading.Lock()
+        self._flush_scheduled = False
+
+    def _submit(self, fn: Callable[..., Any], *args: Any) -> Future:
+        with self._pending_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-store")
+            return self._executor.submit(fn, *args)
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        """Blocking read, for callers outside the event loop."""
+        return self._pending_get(key) or self._submit(self._get, key).result()
+
+    async def aget(self, key: str) -> Optional[Tuple[Any, float]]:
+        pending = self._pending_get(key)
+        if pending is not None:
+            return pending
+        return await asyncio.wrap_future(self._submit(self._get, key))
+
+    def set(self, key: str, value: Any, expires_at: float):
+        """Queues the write; it is committed with others on the store thread."""
+        with self._pending_lock:
+            self._pending[key] = (value, expires_at)
+            if self._flush_scheduled:
+                return
+            self._flush_scheduled = True
+        self._submit(self._flush)
+
+    def delete(self, key: str):
+        with self._pending_lock:
+            self._pending.pop(key, None)
+        self._submit(self._delete, key)
+
+    def flush(self):
+        """Waits until every queued write is committed."""
+        self._submit(self._flush).result()
+
+    def purge_expired(self):
+        self._submit(self._purge_expired).result()
+
+    def close(self):
+        """Commits queued writes and closes the database; the next use reopens it."""
+        with self._pending_lock:
+            executor, self._executor = self._executor, None
+        if executor is None:
+            return
+        executor.submit(self._flush).result()
+        executor.submit(self._close_connection).result()
+        executor.shutdown(wait=True)
+
+    def _pending_get(self, key: str) -> Optional[Tuple[Any, float]]:
+        with self._pending_lock:
+            pending = self._pending.get(key)
+        if pending is not None and pending[1] > time.time():
+            return pending
+        return None
+
+    # The methods below run on the store thread only
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _close_connection(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _get(self, key: str) -> Optional[Tuple[Any, float]]:
+        row = self._db().execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at <= time.time():
+            self._delete(key)
+            return None
+        return json.loads(value), expires_at
+
+    def _flush(self):
+        with self._pending_lock:
+            batch, self._pending = self._pending, {}
+            self._flush_scheduled = False
+        if not batch:
+            return
+        conn = self._db()
+        conn.executemany(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+            [(key, json.dumps(value, default=str), expires_at) for key, (value, expires_at) in batch.items()],
+        )
+        conn.commit()
+
+    def _delete(self, key: str):
+        conn = self._db()
+        conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+        conn.commit()
+
+    def _purge_expired(self):
+        conn = self._db()
+        conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+        conn.commit()
+
+class TTLCache:
+    """Bounded in-memory cache with per-entry TTL and LRU eviction."""
+
+    def __init__(self, max_size: int = 1024, ttl: float = 300.0, store: Optional[SqliteCacheStore] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.store = store
+        self._entries: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._get_memory(key)
+        if entry is not None:
+            return entry[0]
+        return self._from_store(key, self.store.get(key) if self.store is not None else None)
+
+    async def aget(self, key: str) -> Optional[Any]:
+        """Like `get`, but a backing-store lookup is awaited off the event loop."""
+        entry = self._get_memory(key)
+        if entry is not None:
+            return entry[0]
+        return self._from_store(key, await self.store.aget(key) if self.store is not None else None)
+
+    def _get_memory(self, key: str) -> Optional[Tuple[Any, float]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] > time.time():
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+        del self._entries[key]
+        return None
+
+    def _from_store(self, key: str, stored: Optional[Tuple[Any, float]]) -> Optional[Any]:
+        if stored is not None:
+            self._put(key, *stored)
+            self.hits += 1
+            return stored[0]
+        self.misses += 1
+        return None
+
+    def set(self, key: str, value: Any):
+        expires_at = time.time() + self.ttl
+        self._put(key, value, expires_at)
+        if self.store is not None:
+            self.store.set(key, value, expires_at)
+
+    def clear(self):
+        self._entries.clear()
+
+    def close(self):
+        """Commits pending writes to the backing store, if any, and closes it."""
+        if self.store is not None:
+            self.store.close()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _put(self, key: str, value: Any, expires_at: float):
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into one underlying call.
+    Callers that arrive while a call is in flight await the same result. A
+    cancelled caller leaves the others waiting, but once the last caller has
+    gone the shared call is cancelled too. The call itself runs without the
+    first caller's deadline, so that caller's budget does not cut it short
+    for the others; each caller's own deadline still bounds its wait.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, _Flight] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        flight = self._inflight.get(key)
+        if flight is None:
+            context = contextvars.copy_context()
+            context.run(current_deadline.set, None)
+            flight = self._inflight[key] = _Flight(asyncio.get_running_loop().create_task(fn(), context=context))
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done():
+                # Nobody is left to use the result; later callers start a fresh call
+                flight.task.cancel()
+                self._forget(key, flight)
+
+    def _forget(self, key: str, flight: _Flight):
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+
+    def __len__(self) -> int:
+        return len(self._inflight)
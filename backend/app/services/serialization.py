@@ -0,0 +1,160 @@
+"""
+Fast JSON encoding for agent payloads. Uses orjson when it is installed
+(numpy arrays and scalars are encoded natively) and falls back to the
+standard library otherwise; both paths accept the same inputs.
+"""
+import asyncio
+import datetime
+import gzip
+import json
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+from ..config import settings
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+def _zstd_compressor() -> Optional[Callable[[bytes, int], bytes]]:
+    try:
+        import zstandard
+        return lambda data, level: zstandard.ZstdCompressor(level=level).compress(data)
+    except ImportError:
+        pass
+    try:
+        from compression import zstd  # Python 3.14+
+        return lambda data, level: zstd.compress(data, level=level)
+    except ImportError:
+        return None
+
+zstd_compress = _zstd_compressor()
+
+def _default(obj: Any) -> Any:
+    """Encodes the non-JSON types agents return: numpy/pandas values, models, sets."""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    if hasattr(obj, "tolist"):  # numpy arrays and scalars, pandas arrays
+        return obj.tolist()
+    if hasattr(obj, "item"):
+        return obj.item()
+    if isinstance(obj, (datetime.datetime, datetime.date)):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if hasattr(obj, "value"):  # enums
+        return obj.value
+    return str(obj)
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, separators=(",", ":")).encode()
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with `dumps`. Returning one from an endpoint also skips
+    FastAPI's response_model validation and jsonable_encoder pass."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+def trusted_response(model: BaseModel, status_code: int = 200):
+    """
+    Internal results are already typed, so by default they are encoded straight
+    from `model_dump()` instead of being re-validated; with
+    `trusted_responses=False` the model goes back through FastAPI's checks.
+    """
+    if not settings.trusted_responses:
+        return model
+    return FastJSONResponse(model.model_dump(), status_code=status_code)
+
+def _accepted_encodings(header: str) -> List[str]:
+    accepted = []
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        params = params.replace(" ", "")
+        if params.startswith("q="):
+            try:
+                if float(params[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.append(name.strip().lower())
+    return accepted
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing large single-body responses with zstd (when
+    available) or gzip, per the client's Accept-Encoding. Streaming responses
+    (SSE, NDJSON) and small bodies are passed through untouched. Bodies of
+    `thread_min_size` bytes or more are compressed in a worker thread so the
+    event loop keeps serving other requests meanwhile.
+    """
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = 64 * 1024,
+        gzip_level: int = 5,
+        zstd_level: int = 3,
+        thread_min_size: int = 1024 * 1024,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.zstd_level = zstd_level
+        self.thread_min_size = thread_min_size
+
+    def _choose(self, scope) -> Optional[str]:
+        headers = dict(scope.get("headers") or [])
+        accepted = _accepted_encodings(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if zstd_compress is not None and "zstd" in accepted:
+            return "zstd"
+        if "gzip" in accepted:
+            return "gzip"
+        return None
+
+    def _compress(self, encoding: str, body: bytes) -> bytes:
+        if encoding == "zstd":
+            return zstd_compress(body, self.zstd_level)
+        return gzip.compress(body, compresslevel=self.gzip_level)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        encoding = self._choose(scope)
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        start: Dict[str, Any] = {}
+        passthrough = False
+
+        async def wrapped_send(message):
+            nonlocal passthrough
+            if message["type"] == "http.response.start":
+                start.update(message)
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                return await send(message)
+            body = message.get("body", b"")
+            headers: List[Tuple[bytes, bytes]] = list(start.get("headers", []))
+            names = {k.lower() for k, _ in headers}
+            if message.get("more_body") or len(body) < self.minimum_size or b"content-encoding" in names:
+                passthrough = True
+                await send(start)
+                return await send(message)
+            if len(body) >= self.thread_min_size:
+                body = await asyncio.to_thread(self._compress, encoding, body)
+            else:
+                body = self._compress(encoding, body)
+            headers = [(k, v) for k, v in headers if k.lower() != b"content-length"]
+            headers += [
+                (b"content-encoding", encoding.encode()),
+                (b"content-length", str(len(body)).encode()),
+                (b"vary", b"Accept-Encoding"),
+            ]
+            await send({**start, "headers": headers})
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, wrapped_send)
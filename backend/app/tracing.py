@@ -0,0 +1,152 @@
+"""
+Lightweight span tracing across WorkflowEngine -> TaskRouter -> agent.
+Spans propagate through a context variable and, when tracing is enabled,
+finished spans are appended as JSON lines to a local exporter file by a
+background thread.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+from .config import settings
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "attributes", "start", "end", "status")
+
+    def __init__(self, name: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = attributes
+        self.start = time.time()
+        self.end: Optional[float] = None
+        self.status = "ok"
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "duration_ms": round(((self.end or time.time()) - self.start) * 1000, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+class FileSpanExporter:
+    """
+    Appends finished spans as JSON lines to a local file. `export` only
+    queues the span; a background thread serializes and writes queued spans
+    in batches, every `flush_interval` seconds or once `batch_size` are
+    waiting, so request handlers never block on disk.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 1.0, batch_size: int = 512, max_queued: int = 100_000):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_queued = max_queued
+        self.dropped = 0
+        self._queue: List[Span] = []
+        self._cond = threading.Condition()
+        # The writer thread and flush() may both write
+        self._file_lock = threading.Lock()
+        self._closed = False
+        self._writer = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._writer.start()
+
+    def export(self, span: Span):
+        with self._cond:
+            if len(self._queue) >= self.max_queued:
+                # Disk cannot keep up; tracing must not grow memory without bound
+                self.dropped += 1
+                return
+            self._queue.append(span)
+            if len(self._queue) >= self.batch_size:
+                self._cond.notify()
+
+    def flush(self):
+        """Writes every queued span before returning."""
+        with self._cond:
+            batch, self._queue = self._queue, []
+        self._write(batch)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._writer.join()
+        self.flush()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._closed and len(self._queue) < self.batch_size:
+                    self._cond.wait(self.flush_interval)
+                if self._closed:
+                    return
+                batch, self._queue = self._queue, []
+            self._write(batch)
+
+    def _write(self, batch: List[Span]):
+        if not batch:
+            return
+        lines = "".join(json.dumps(span.to_dict(), default=str) + "\n" for span in batch)
+        with self._file_lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+class InMemorySpanExporter:
+    def __init__(self):
+        self.spans: List[Span] = []
+
+    def export(self, span: Span):
+        self.spans.append(span)
+
+current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+_exporter: Optional[Any] = None
+
+def configure(exporter: Optional[Any]):
+    """Installs the exporter spans are sent to; None disables tracing."""
+    global _exporter
+    _exporter = exporter
+
+def shutdown():
+    """Writes out queued spans and stops the exporter."""
+    exporter = _exporter
+    configure(None)
+    if exporter is not None and hasattr(exporter, "close"):
+        exporter.close()
+
+def configure_from_settings():
+    if settings.tracing_enabled:
+        directory = os.path.dirname(settings.tracing_export_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        configure(FileSpanExporter(settings.tracing_export_path))
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Optional[Span]]:
+    if _exporter is None:
+        yield None
+        return
+    current = Span(name, current_span.get(), attributes)
+    token = current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.status = "error"
+        current.attributes["error"] = repr(e)
+        raise
+    finally:
+        current.end = time.time()
+        current_span.reset(token)
+        _exporter.export(current)
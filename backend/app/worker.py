@@ -0,0 +1,194 @@
+"""
+Queue worker: runs AgentTasks leased from the durable task queue, so agent
+capacity scales apart from the API nodes (which enqueue with
+TASK_DISPATCH=queue). Point every process at the same MongoDB.
+
+    python -m backend.app.worker --agent-types analysis --concurrency 2
+    python -m backend.app.worker --agent-types research --concurrency 32 --processes 4
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import uuid
+from typing import Iterable, List, Optional, Set
+from .config import settings
+from .models.api_models import AgentResult, AgentType
+from .orchestration.agent_manager import AgentManager, release_agent_resources
+from .orchestration.durable_queue import DurableTaskQueue, LeasedTask
+from .orchestration.task_queue import QueueFullError
+from .orchestration.task_router import TaskRouter
+from .services.deadlines import deadline_scope
+
+logger = logging.getLogger(__name__)
+
+class QueueWorker:
+    """
+    Leases up to `concurrency` tasks of `agent_types` at a time and runs each
+    through a local TaskRouter, extending its lease every third of
+    `lease_time` until the result is acked. When stopped it leases nothing
+    new and lets the in-flight tasks finish.
+    """
+
+    def __init__(
+        self,
+        queue: DurableTaskQueue,
+        router: TaskRouter,
+        agent_types: Iterable[str],
+        concurrency: int = 4,
+        worker_id: Optional[str] = None,
+        idle_interval: Optional[float] = None,
+    ):
+        self.queue = queue
+        self.router = router
+        self.agent_types = [AgentType(t).value for t in agent_types]
+        self.concurrency = concurrency
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.idle_interval = idle_interval if idle_interval is not None else queue.poll_interval
+        self.processed = 0
+
+    async def run(self, stop: Optional[asyncio.Event] = None):
+        stop = stop or asyncio.Event()
+        slots = asyncio.Semaphore(self.concurrency)
+        running: Set[asyncio.Task] = set()
+        try:
+            while not stop.is_set():
+                await slots.acquire()
+                try:
+                    leased = await self.queue.lease(self.agent_types, self.worker_id)
+                except Exception as e:
+                    logger.warning("Leasing a task failed: %r", e)
+                    leased = None
+                if leased is None:
+                    slots.release()
+                    await self._idle(stop)
+                    continue
+                job = asyncio.create_task(self._process(leased))
+                running.add(job)
+                job.add_done_callback(running.discard)
+                job.add_done_callback(lambda _: slots.release())
+        finally:
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+
+    async def _idle(self, stop: asyncio.Event):
+        try:
+            await asyncio.wait_for(stop.wait(), self.idle_interval)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _process(self, leased: LeasedTask):
+        task = leased.task
+        # The submitter's deadline bounds the agent's own timeouts here as it would in-process
+        with deadline_scope(task.timeout), deadline_scope(self.queue.time_left(leased)):
+            job = asyncio.create_task(self.router.route_task(task))
+        try:
+            while True:
+                interval = self.queue.lease_time / 3
+                time_left = self.queue.time_left(leased)
+                if time_left is not None:
+                    interval = min(interval, max(time_left, 0.0))
+                done, _ = await asyncio.wait({job}, timeout=interval)
+                if done:
+                    break
+                time_left = self.queue.time_left(leased)
+                if time_left is not None and time_left <= 0:
+                    # Nobody is waiting for a late result
+                    job.cancel()
+                    result = AgentResult(
+                        agent_type=task.agent_type, output_data={}, success=False, error="Deadline exceeded",
+                    )
+                    await self.queue.ack(leased, self.worker_id, result)
+                    return
+                if not await self.queue.extend(leased, self.worker_id):
+                    # Withdrawn by its submitter, or the lease lapsed and another worker has it
+                    job.cancel()
+                    result = AgentResult(agent_type=task.agent_type, output_data={}, success=False, error="Cancelled")
+                    await self.queue.ack(leased, self.worker_id, result)
+                    return
+            result = job.result()
+        except QueueFullError:
+            # Local backpressure: hand it back rather than fail it
+            await self.queue.nack(leased, self.worker_id, delay=self.idle_interval)
+            return
+        except Exception as e:
+            result = AgentResult(agent_type=task.agent_type, output_data={}, success=False, error=str(e))
+        await self.queue.ack(leased, self.worker_id, result)
+        self.processed += 1
+
+async def serve(agent_types: List[str], concurrency: int):
+    from .db.mongo import init_db, close_db
+    from .services.http_client import http_clients
+    from . import tracing
+
+    tracing.configure_from_settings()
+    await init_db()
+    await http_clients.startup()
+    manager = AgentManager()
+    await manager.initialize_agents()
+    await manager.warmup()
+    router = TaskRouter(manager, workers_per_type=concurrency, max_queue_size=concurrency)
+    queue = DurableTaskQueue(
+        lease_time=settings.task_lease_time,
+        max_attempts=settings.task_max_attempts,
+        poll_interval=settings.task_poll_interval,
+    )
+    worker = QueueWorker(queue, router, agent_types, concurrency=concurrency)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+    logger.info("Worker %s serving %s", worker.worker_id, ", ".join(worker.agent_types))
+    try:
+        await worker.run(stop)
+    finally:
+        await router.shutdown()
+        await queue.close()
+        await http_clients.aclose()
+        await close_db()
+        await asyncio.to_thread(tracing.shutdown)
+        await asyncio.to_thread(release_agent_resources)
+
+def _serve_process(agent_types: List[str], concurrency: int):
+    # Module-level so it can be the target of a spawned process
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(serve(agent_types, concurrency))
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--agent-types", type=lambda s: s.split(","), default=[AgentType.research.value, AgentType.analysis.value]
+    )
+    parser.add_argument("--concurrency", type=int, default=settings.worker_concurrency)
+    parser.add_argument("--processes", type=int, default=1, help="run this many worker processes")
+    args = parser.parse_args(argv)
+    unknown = set(args.agent_types) - {t.value for t in AgentType}
+    if unknown:
+        parser.error(f"unknown agent types: {', '.join(sorted(unknown))}")
+
+    if args.processes == 1:
+        _serve_process(args.agent_types, args.concurrency)
+        return 0
+    # Spawned, not forked: each worker builds its own Mongo client and event loop
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=_serve_process, args=(args.agent_types, args.concurrency), daemon=False)
+        for _ in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        # Children got the same SIGINT and are draining; wait for them
+        for process in processes:
+            process.join()
+    return max(process.exitcode or 0 for process in processes)
+
+if __name__ == "__main__":
+    sys.exit(main())
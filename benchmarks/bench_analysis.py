@@ -0,0 +1,84 @@
+"""
+Compares AnalysisAgent's vectorized statistics/trend engine against the
+previous column-by-column implementation on wide and long frames.
+
+    python -m benchmarks.bench_analysis                 # 1000 cols x 2000 rows, 10M rows x 4 cols
+    python -m benchmarks.bench_analysis --long-rows 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from backend.app.agents.analysis_agent import AnalysisAgent
+
+
+def legacy_statistics(df):
+    return {col: {"mean": df[col].mean(), "std": df[col].std(), "min": df[col].min(), "max": df[col].max()}
+            for col in df.select_dtypes(include=[np.number]).columns}
+
+
+def legacy_trends(df):
+    trends, patterns = [], []
+    for col in df.select_dtypes(include=[np.number]).columns:
+        series = df[col].values
+        if len(series) > 1 and np.polyfit(np.arange(len(series)), series, 1)[0] > 0:
+            trends.append(col)
+        if df[col].nunique() < len(df) * 0.2:
+            patterns.append(col)
+    return trends, patterns
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run_case(name, df, repeat):
+    agent = AnalysisAgent()
+
+    def vectorized():
+        summary = agent._numeric_summary(df)
+        agent._basic_statistics(df, summary)
+        agent._trend_and_pattern_analysis(df, summary)
+
+    def legacy():
+        legacy_statistics(df)
+        legacy_trends(df)
+
+    new = best_of(vectorized, repeat)
+    old = best_of(legacy, repeat)
+    print(f"{name:<28} legacy {old:9.3f}s  vectorized {new:9.3f}s  speedup {old / new:6.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--wide-cols", type=int, default=1000)
+    parser.add_argument("--wide-rows", type=int, default=2000)
+    parser.add_argument("--long-rows", type=int, default=10_000_000)
+    parser.add_argument("--long-cols", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    wide = pd.DataFrame(
+        rng.normal(size=(args.wide_rows, args.wide_cols)),
+        columns=[f"c{i}" for i in range(args.wide_cols)],
+    )
+    run_case(f"wide {args.wide_rows}x{args.wide_cols}", wide, args.repeat)
+    del wide
+
+    long = pd.DataFrame(
+        rng.integers(0, 1000, size=(args.long_rows, args.long_cols)).astype(np.float64),
+        columns=[f"c{i}" for i in range(args.long_cols)],
+    )
+    run_case(f"long {args.long_rows}x{args.long_cols}", long, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Cold-start benchmark: time to import `backend.app.main` and to run the app's
+startup hooks, each measured in a fresh interpreter, plus the slowest
+imports reported by `python -X importtime`.
+
+    python -m benchmarks.bench_cold_start                      # fast-start mode, 5 runs
+    python -m benchmarks.bench_cold_start --full-start         # block on init_db/warmup (needs Mongo)
+    python -m benchmarks.bench_cold_start --save-baseline
+    python -m benchmarks.bench_cold_start --check              # exit 1 if p50 regressed past --tolerance
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List
+
+from .harness import load_baseline, percentile, save_baseline
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "cold_start_baseline.json")
+
+PROBE = """
+import asyncio, json, time
+start = time.perf_counter()
+from backend.app.main import app
+imported = time.perf_counter()
+asyncio.run(app.router.startup())
+started = time.perf_counter()
+print(json.dumps({"import_s": imported - start, "startup_s": started - imported}))
+"""
+
+
+def measure_once(fast_start: bool) -> Dict[str, float]:
+    env = dict(os.environ, FAST_START="true" if fast_start else "false")
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE], env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def slowest_imports(limit: int) -> List[str]:
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import backend.app.main"], capture_output=True, text=True
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            rows.append((int(parts[1]), parts[2].rstrip()))
+    # Top-level packages only (no nesting indentation beyond one level) give the clearest picture
+    top = sorted((r for r in rows if len(r[1]) - len(r[1].lstrip()) <= 3), reverse=True)[:limit]
+    return [f"{us / 1000:9.1f}ms  {name.strip()}" for us, name in top]
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--full-start", action="store_true")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--check", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    samples = [measure_once(fast_start=not args.full_start) for _ in range(args.runs)]
+    results = {}
+    for key in ("import_s", "startup_s"):
+        values = sorted(s[key] for s in samples)
+        results[key] = {"p50": percentile(values, 50), "max": values[-1]}
+        print(f"{key:<10} p50 {results[key]['p50'] * 1000:8.1f}ms  max {results[key]['max'] * 1000:8.1f}ms")
+    print("slowest imports (cumulative):")
+    for line in slowest_imports(args.top):
+        print(f"  {line}")
+
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+        print(f"baseline written to {args.baseline}")
+    if args.check:
+        baseline = load_baseline(args.baseline)
+        if not baseline:
+            print(f"no baseline at {args.baseline}; run with --save-baseline first")
+            return 1
+        regressed = [
+            f"{key}: p50 {baseline[key]['p50'] * 1000:.1f}ms -> {stats['p50'] * 1000:.1f}ms"
+            for key, stats in results.items()
+            if key in baseline and stats["p50"] > baseline[key]["p50"] * (1 + args.tolerance)
+        ]
+        for line in regressed:
+            print(f"REGRESSION {line}")
+        return 1 if regressed else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,197 @@
+"""
+Load test for the orchestration pipeline against local stubs: TaskRouter,
+WorkflowEngine, ResearchAgent over a stub upstream, the FastAPI app through
+an in-process ASGI transport, plus AnalysisAgent/DecisionAgent
+microbenchmarks across payload sizes. Reports throughput and p50/p95/p99.
+
+    python -m benchmarks.bench_pipeline                          # run and print
+    python -m benchmarks.bench_pipeline --save-baseline          # record benchmarks/baseline.json
+    python -m benchmarks.bench_pipeline --check                  # exit 1 on regression vs the baseline
+    python -m benchmarks.bench_pipeline --latency-ms 50 --error-rate 0.05 --only engine,api
+
+Baselines are machine-specific; record one on the machine that runs --check.
+"""
+import argparse
+import asyncio
+import os
+import sys
+from typing import Dict, List
+
+import httpx
+import numpy as np
+
+from backend.app.agents.analysis_agent import AnalysisAgent
+from backend.app.agents.decision_agent import DecisionAgent
+from backend.app.agents.research_agent import ResearchAgent
+from backend.app.config import settings
+from backend.app.models.api_models import AgentTask, OrchestrationRequest
+from backend.app.orchestration.agent_manager import AgentManager
+from backend.app.orchestration.state_manager import StateManager
+from backend.app.orchestration.task_router import TaskRouter
+from backend.app.orchestration.workflow_engine import WorkflowEngine
+from backend.app.services.result_cache import TTLCache
+
+from .harness import find_regressions, format_row, load_baseline, run_load, save_baseline
+from .stubs import StubAgent, StubUpstream
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+SCENARIOS = ("router", "engine", "research", "api", "analysis", "decision")
+
+
+async def stub_manager(args) -> AgentManager:
+    manager = AgentManager()
+    for agent_type in ("research", "analysis"):
+        await manager.register_agent(agent_type, StubAgent(args.latency_ms, args.jitter_ms, args.error_rate))
+    return manager
+
+
+async def bench_router(args) -> Dict[str, Dict[str, float]]:
+    router = TaskRouter(await stub_manager(args), workers_per_type=args.concurrency, max_queue_size=args.requests)
+
+    async def call(i):
+        result = await router.route_task(AgentTask(agent_type="research", input_data={"query": f"q{i}"}))
+        if not result.success:
+            raise RuntimeError(result.error)
+
+    stats = await run_load(call, args.requests, args.concurrency)
+    await router.shutdown()
+    return {"router": stats}
+
+
+async def bench_engine(args) -> Dict[str, Dict[str, float]]:
+    router = TaskRouter(await stub_manager(args), workers_per_type=args.concurrency, max_queue_size=args.requests * 5)
+    engine = WorkflowEngine(router, StateManager())
+
+    async def call(i):
+        # Four research tasks fanning into one analysis task
+        response = await engine.run_workflow(OrchestrationRequest(
+            workflow_id=f"bench-{i}",
+            tasks=[AgentTask(agent_type="research", input_data={"query": f"q{i}-{j}"}) for j in range(4)]
+            + [AgentTask(agent_type="analysis", input_data={})],
+            dependencies={4: [0, 1, 2, 3]},
+        ))
+        if response.status == "error":
+            raise RuntimeError(response.error)
+
+    stats = await run_load(call, args.requests, args.concurrency)
+    await router.shutdown()
+    return {"engine fan-out 4->1": stats}
+
+
+async def bench_research(args) -> Dict[str, Dict[str, float]]:
+    # Keep the shared limiter/backoff out of the way so the stub's latency dominates
+    settings.upstream_rate_limit = settings.upstream_rate_burst = 1_000_000
+    settings.upstream_backoff_base = 0.001
+    upstream = StubUpstream(args.latency_ms, args.jitter_ms, args.error_rate)
+    async with upstream.client() as client:
+        agent = ResearchAgent(api_key="bench", client=client, cache=TTLCache(max_size=1))
+        agent.api_url = "http://bench-upstream.local/model"
+        stats = await run_load(lambda i: agent.execute({"query": f"q{i}"}), args.requests, args.concurrency)
+    return {"research stub upstream": stats}
+
+
+async def bench_api(args) -> Dict[str, Dict[str, float]]:
+    from backend.app.main import create_app
+    from backend.app.api.routes import orchestrate
+    for agent_type in ("research", "analysis", "decision"):
+        if await orchestrate.agent_manager.get_agent(agent_type) is None:
+            await orchestrate.agent_manager.register_agent(
+                agent_type, StubAgent(args.latency_ms, args.jitter_ms, args.error_rate)
+            )
+    transport = httpx.ASGITransport(app=create_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def call(i):
+            response = await client.post("/api/orchestrate/", json={
+                "workflow_id": f"bench-api-{i}",
+                "tasks": [
+                    {"agent_type": "research", "input_data": {"query": f"q{i}"}},
+                    {"agent_type": "analysis", "input_data": {}},
+                ],
+            })
+            response.raise_for_status()
+
+        stats = await run_load(call, args.requests, args.concurrency)
+    return {"api POST /api/orchestrate": stats}
+
+
+async def bench_analysis(args) -> Dict[str, Dict[str, float]]:
+    agent = AnalysisAgent(execution_mode="inline")
+    rng = np.random.default_rng(42)
+    results = {}
+    for rows in args.payload_sizes:
+        payload = {"data": {f"c{j}": rng.normal(size=rows).tolist() for j in range(8)}}
+        results[f"analysis {rows}x8"] = await run_load(lambda i: agent.execute(payload), args.micro_repeat, 1)
+    return results
+
+
+async def bench_decision(args) -> Dict[str, Dict[str, float]]:
+    agent = DecisionAgent()
+    results = {}
+    for size in args.payload_sizes:
+        payload = {
+            "research": {"results": [f"r{j}" for j in range(size)], "confidence": 0.9},
+            "analysis": {"insights": [f"i{j}" for j in range(size)], "confidence": 0.8},
+        }
+        results[f"decision {size} items"] = await run_load(lambda i: agent.execute(payload), args.micro_repeat, 1)
+        batch = [payload] * size
+        # execute_many is only partly array-based: this includes its Python pass over the input dicts
+        results[f"decision batch of {size}"] = await run_load(
+            lambda i: agent.execute_many(batch), args.micro_repeat, 1
+        )
+    return results
+
+
+async def run(args) -> Dict[str, Dict[str, float]]:
+    benches = {
+        "router": bench_router, "engine": bench_engine, "research": bench_research,
+        "api": bench_api, "analysis": bench_analysis, "decision": bench_decision,
+    }
+    results: Dict[str, Dict[str, float]] = {}
+    for name in args.only:
+        for case, stats in (await benches[name](args)).items():
+            print(format_row(case, stats))
+            results[case] = stats
+    return results
+
+
+def parse_args(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency-ms", type=float, default=10.0)
+    parser.add_argument("--jitter-ms", type=float, default=2.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--payload-sizes", type=lambda s: [int(x) for x in s.split(",")], default=[100, 10_000, 100_000])
+    parser.add_argument("--micro-repeat", type=int, default=20)
+    parser.add_argument("--only", type=lambda s: s.split(","), default=list(SCENARIOS))
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--check", action="store_true", help="fail if any scenario regressed past --tolerance")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+    unknown = set(args.only) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    return args
+
+
+def main(argv: List[str] = None) -> int:
+    args = parse_args(argv)
+    results = asyncio.run(run(args))
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+        print(f"baseline written to {args.baseline}")
+    if args.check:
+        baseline = load_baseline(args.baseline)
+        if not baseline:
+            print(f"no baseline at {args.baseline}; run with --save-baseline first")
+            return 1
+        regressions = find_regressions(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""
+Shared load-generation, percentile and baseline helpers for the benchmarks.
+"""
+import asyncio
+import json
+import math
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict[str, float]:
+    ordered = sorted(latencies)
+    total = len(latencies) + errors
+    return {
+        "requests": total,
+        "errors": errors,
+        "throughput": total / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(ordered, 50) * 1000,
+        "p95_ms": percentile(ordered, 95) * 1000,
+        "p99_ms": percentile(ordered, 99) * 1000,
+    }
+
+
+async def run_load(fn: Callable[[int], Awaitable[Any]], requests: int, concurrency: int) -> Dict[str, float]:
+    """Calls `fn(i)` `requests` times with at most `concurrency` in flight; failures count as errors."""
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                await fn(i)
+            except Exception:
+                errors += 1
+            else:
+                latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, requests))))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+def format_row(name: str, stats: Dict[str, float]) -> str:
+    return (
+        f"{name:<32} {stats['requests']:>6} req  {stats['errors']:>4} err  "
+        f"{stats['throughput']:>9.1f}/s  p50 {stats['p50_ms']:8.2f}ms  "
+        f"p95 {stats['p95_ms']:8.2f}ms  p99 {stats['p99_ms']:8.2f}ms"
+    )
+
+
+def load_baseline(path: str) -> Dict[str, Dict[str, float]]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(path: str, results: Dict[str, Dict[str, float]]):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def find_regressions(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    tolerance: float = 0.2,
+    min_delta_ms: float = 1.0,
+) -> List[str]:
+    """
+    Scenarios whose p95 grew, or throughput dropped, by more than `tolerance`
+    relative to the baseline. Latency changes under `min_delta_ms` are ignored
+    as timer noise. Scenarios missing from the baseline are skipped.
+    """
+    regressions = []
+    for name, stats in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        p95, base_p95 = stats["p95_ms"], base["p95_ms"]
+        if p95 > base_p95 * (1 + tolerance) and p95 - base_p95 > min_delta_ms:
+            regressions.append(f"{name}: p95 {base_p95:.2f}ms -> {p95:.2f}ms")
+        if stats["throughput"] < base["throughput"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {base['throughput']:.1f}/s -> {stats['throughput']:.1f}/s")
+    return regressions
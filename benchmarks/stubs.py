@@ -0,0 +1,56 @@
+"""
+Local stand-ins for the HuggingFace upstream and for routed agents, with
+seeded, configurable latency and error rates so runs are reproducible.
+"""
+import asyncio
+import random
+from typing import Any, Dict, Optional
+
+import httpx
+
+from backend.app.orchestration.agent_manager import BaseAgent
+
+
+class StubUpstream:
+    """httpx MockTransport handler imitating the inference API."""
+
+    def __init__(self, latency_ms: float = 20.0, jitter_ms: float = 5.0, error_rate: float = 0.0, seed: int = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.calls = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        await asyncio.sleep(max(0.0, self.rng.gauss(self.latency_ms, self.jitter_ms)) / 1000)
+        if self.rng.random() < self.error_rate:
+            return httpx.Response(503)
+        return httpx.Response(200, json=[{"generated_text": f"stub answer {self.calls}"}])
+
+    def client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(transport=httpx.MockTransport(self))
+
+
+class StubAgent(BaseAgent):
+    """Routable agent that sleeps for a jittered latency and fails at `error_rate`."""
+
+    def __init__(
+        self,
+        latency_ms: float = 10.0,
+        jitter_ms: float = 2.0,
+        error_rate: float = 0.0,
+        confidence: float = 0.9,
+        seed: Optional[int] = 0,
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.confidence = confidence
+        self.rng = random.Random(seed)
+
+    async def handle_task(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        await asyncio.sleep(max(0.0, self.rng.gauss(self.latency_ms, self.jitter_ms)) / 1000)
+        if self.rng.random() < self.error_rate:
+            raise RuntimeError("stub agent failure")
+        return {"results": [input_data.get("query")], "insights": [], "confidence": self.confidence}
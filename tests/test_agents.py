@@ -0,0 +1,192 @@
+import pandas as pd
+import pytest
+from backend.app.agents import analysis_agent
+from backend.app.agents.analysis_agent import AnalysisAgent
+
+
+RECORDS = [{"sales": float(i), "region": "north" if i % 2 else "south", "units": i % 3} for i in range(20)]
+
+
+@pytest.mark.asyncio
+async def test_analysis_agent_inline():
+    result = await AnalysisAgent(execution_mode="inline").execute({"data": RECORDS})
+    assert "error" not in result
+    assert set(result["statistics"]) == {"sales", "units"}
+    assert "sales shows an increasing trend." in result["trends"]
+    assert "units has many repeated values (potential pattern/cluster)." in result["patterns"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("mode", ["thread", "process"])
+async def test_analysis_agent_executor_modes_match_inline(mode):
+    inline = await AnalysisAgent(execution_mode="inline").execute({"data": RECORDS})
+    assert "error" not in inline
+    offloaded = await AnalysisAgent(execution_mode=mode, max_workers=1).execute({"data": pd.DataFrame(RECORDS)})
+    assert offloaded == inline
+
+
+@pytest.mark.asyncio
+async def test_process_mode_ships_records_as_column_arrays():
+    import numpy as np
+    records = RECORDS + [{"sales": None, "region": "east"}]
+    payload = AnalysisAgent._columnar_payload({"data": records})
+    assert set(payload["data"]) == {"sales", "region", "units"}
+    assert all(isinstance(v, np.ndarray) for v in payload["data"].values())
+    assert payload["data"]["sales"].dtype == np.float64
+    from_research = AnalysisAgent._columnar_payload({"results": records, "columns": ["sales"]})
+    assert set(from_research) == {"data", "columns"} and set(from_research["data"]) == {"sales", "region", "units"}
+
+    columns = {key: [r.get(key) for r in records] for key in ("sales", "region", "units")}
+    inline = await AnalysisAgent(execution_mode="inline").execute({"data": records})
+    for data in (records, columns):
+        assert await AnalysisAgent(execution_mode="process", max_workers=1).execute({"data": data}) == inline
+
+
+@pytest.mark.asyncio
+async def test_analysis_agent_timeout_returns_error(monkeypatch):
+    def slow_analysis(input_data, scope=None):
+        import time
+        time.sleep(0.3)
+        return {}
+
+    monkeypatch.setattr(analysis_agent, "_run_analysis", slow_analysis)
+    result = await AnalysisAgent(execution_mode="thread", timeout=0.05).execute({"data": RECORDS})
+    assert result["error"] == "Analysis timed out after 0.05s"
+    assert result["confidence"] == 0.0
+
+
+def test_vectorized_summary_matches_pandas():
+    import numpy as np
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.normal(size=(200, 6)), columns=[f"c{i}" for i in range(6)])
+    df["ints"] = rng.integers(0, 5, size=200)
+    df["ramp"] = np.arange(200) * 0.5
+    agent = AnalysisAgent()
+
+    stats = agent._basic_statistics(df)
+    trends, patterns = agent._trend_and_pattern_analysis(df)
+
+    for col in df.columns:
+        assert stats[col]["mean"] == pytest.approx(df[col].mean())
+        assert stats[col]["std"] == pytest.approx(df[col].std())
+        assert stats[col]["min"] == df[col].min() and stats[col]["max"] == df[col].max()
+        slope = np.polyfit(np.arange(len(df)), df[col].values, 1)[0]
+        assert (f"{col} shows an increasing trend." in trends) == (slope > 0)
+        repeated = df[col].nunique() < len(df) * 0.2
+        assert (f"{col} has many repeated values (potential pattern/cluster)." in patterns) == repeated
+    assert isinstance(stats["ints"]["min"], int)
+
+
+def test_streaming_analysis_matches_in_memory(tmp_path):
+    import numpy as np
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame({
+        "sales": np.arange(5000) * 0.1 + rng.normal(size=5000),
+        "units": rng.integers(0, 10, size=5000),
+        "region": rng.choice(["north", "south"], size=5000),
+    })
+    path = tmp_path / "data.csv"
+    pd.concat([df, df.head(100)]).to_csv(path, index=False)
+    agent = AnalysisAgent()
+
+    expected = agent._analyze({"data": df})
+    streamed = agent._analyze({"stream": str(path), "chunksize": 700})
+
+    assert streamed["trends"] == expected["trends"]
+    assert streamed["patterns"] == expected["patterns"]
+    for col in ("sales", "units"):
+        for key in ("mean", "std", "min", "max"):
+            assert streamed["statistics"][col][key] == pytest.approx(expected["statistics"][col][key])
+    assert streamed["confidence"] == expected["confidence"]
+
+
+def test_hyperloglog_estimate_is_close():
+    import numpy as np
+    from backend.app.agents.streaming_stats import HyperLogLog, hash_values
+    sketch = HyperLogLog(p=12)
+    sketch.add_hashes(hash_values(np.arange(50_000) % 20_000))
+    assert sketch.count() == pytest.approx(20_000, rel=0.05)
+
+
+def test_streaming_dedup_filter_starts_small_and_grows():
+    import numpy as np
+    from backend.app.agents.streaming_stats import ScalableBloomFilter, hash_values
+    dedup = ScalableBloomFilter(initial_capacity=1_000, error_rate=0.001)
+    assert dedup.nbytes == 0
+    first = dedup.add_new(hash_values(np.arange(800)))
+    assert first.all() and len(dedup.stages) == 1
+    small = dedup.nbytes
+    assert small < 4_096
+
+    # Past the initial capacity a larger stage is added; earlier rows are still recognised
+    new = dedup.add_new(hash_values(np.arange(400, 5_000)))
+    assert len(dedup.stages) > 1
+    assert not new[:400].any()
+    assert new[400:].mean() > 0.99
+    assert not dedup.add_new(hash_values(np.arange(5_000))).any()
+
+
+@pytest.mark.asyncio
+async def test_analysis_hands_off_artifacts_and_reads_selected_columns(monkeypatch, tmp_path):
+    from backend.app.services.artifacts import ArtifactStore, current_artifact_scope
+    store = ArtifactStore(spill_bytes=1, spill_dir=str(tmp_path))
+    monkeypatch.setattr(analysis_agent, "artifact_store", store)
+    monkeypatch.setattr(analysis_agent.settings, "artifact_min_rows", 10)
+    agent = AnalysisAgent(execution_mode="inline")
+
+    token = current_artifact_scope.set("wf-artifacts")
+    try:
+        first = await agent.execute({"data": RECORDS})
+    finally:
+        current_artifact_scope.reset(token)
+    ref = first["artifact"]
+    assert ref["rows"] == 20 and set(ref["columns"]) == {"sales", "region", "units"}
+    # Numeric columns were spilled and come back memory-mapped
+    assert type(store.get(ref, ["sales"])["sales"]).__name__ == "memmap"
+
+    second = await agent.execute({"data": ref, "columns": ["sales"]})
+    assert set(second["statistics"]) == {"sales"}
+    assert second["statistics"]["sales"] == first["statistics"]["sales"]
+    offloaded = await AnalysisAgent(execution_mode="process", max_workers=1).execute(
+        {"data": ref, "columns": ["sales"]}
+    )
+    assert offloaded == second
+
+    store.release("wf-artifacts")
+    assert not list(tmp_path.iterdir())
+    assert "Unknown or expired artifact" in (await agent.execute({"data": ref}))["error"]
+
+
+@pytest.mark.asyncio
+async def test_decision_execute_many_matches_execute_with_tenant_thresholds():
+    from backend.app.agents.decision_agent import DecisionAgent
+    agent = DecisionAgent()
+    # 0.025 sits on a rounding tie; the batch path must round it like round() does
+    pairs = [(0.9, 0.8), (0.05, 0.0125), (0.5, 0.5), (0.0, 1.0), (0.7, 0.7)]
+    inputs = [
+        {"research": {"confidence": r, "results": ["r"]}, "analysis": {"confidence": a, "insights": ["i"]}}
+        for r, a in pairs
+    ] + [{"research": {}, "analysis": {"confidence": 0.64}}]
+    batch = await agent.execute_many(inputs)
+    assert list(batch) == [await agent.execute(i) for i in inputs]
+    assert batch.summary() == {"total": 6, "auto_approved": 2, "human_verification_required": 4, "error": 0}
+
+    tenants = ["strict", "lenient", "lenient", "lenient", "other", None]
+    batch = await agent.execute_many(inputs, tenants=tenants, tenant_thresholds={"strict": 0.9, "lenient": 0.5})
+    assert [r["status"] == "auto_approved" for r in batch.results(include_recommendations=False)] == [
+        False, False, True, False, True, False
+    ]
+    assert "recommendations" not in batch.item(0, include_recommendations=False)
+
+
+@pytest.mark.asyncio
+async def test_decision_execute_many_rounds_like_execute():
+    import random
+    from backend.app.agents.decision_agent import DecisionAgent
+    agent = DecisionAgent()
+    rng = random.Random(7)
+    # Random scores plus every two-decimal pair near the .xx5 rounding boundaries
+    pairs = [(rng.random(), rng.random()) for _ in range(5_000)]
+    pairs += [(i / 200, 1.0) for i in range(201)] + [((i / 200) ** 2, 1.0) for i in range(201)]
+    batch = await agent.execute_many([{"research": {"confidence": r}, "analysis": {"confidence": a}} for r, a in pairs])
+    assert batch.confidence.tolist() == [agent.get_confidence([r, a]) for r, a in pairs]
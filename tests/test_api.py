@@ -0,0 +1,222 @@
+import pytest
+from fastapi.testclient import TestClient
+from backend.app.main import create_app
+
+
+@pytest.fixture
+def client():
+    # No context manager: skip startup hooks that need a live MongoDB
+    return TestClient(create_app())
+
+
+def test_health(client):
+    assert client.get("/api/health/").json()["status"] == "ok"
+
+
+def test_metrics_endpoint_exposes_agent_latency(client):
+    response = client.post("/api/orchestrate/", json={
+        "workflow_id": "wf-metrics",
+        "tasks": [{"agent_type": "research", "input_data": {"query": "metrics"}}],
+    })
+    assert response.status_code == 200
+    metrics = client.get("/metrics")
+    assert metrics.headers["content-type"].startswith("text/plain")
+    assert 'interflow_agent_task_seconds_count{agent_type="research",success="True"}' in metrics.text
+    assert "interflow_workflow_step_seconds_bucket" in metrics.text
+    assert 'interflow_task_queue_depth{agent_type="research"} 0' in metrics.text
+    assert "# TYPE interflow_research_cache_events_total counter" in metrics.text
+
+
+def test_metrics_render_while_other_threads_add_labels():
+    import threading
+    from backend.app.metrics import Counter, Histogram
+    counter, histogram = Counter("c_total", "c", ["n"]), Histogram("h_seconds", "h", ["n"])
+    stop = threading.Event()
+
+    def writer():
+        for n in range(1000):
+            if stop.is_set():
+                return
+            counter.inc(n=n)
+            histogram.observe(0.1, n=n)
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        for _ in range(20):
+            counter.render()
+            histogram.render()
+    finally:
+        stop.set()
+        thread.join()
+
+
+def test_stream_analysis_endpoint(client):
+    body = "a,b\n" + "".join(f"{i},{i % 3}\n" for i in range(1000))
+    response = client.post("/api/agents/analysis/stream?chunksize=128", content=body)
+    assert response.status_code == 200
+    result = response.json()
+    assert result["success"]
+    assert "a shows an increasing trend." in result["output_data"]["trends"]
+    assert result["output_data"]["statistics"]["b"]["max"] == 2
+
+
+@pytest.mark.asyncio
+async def test_motor_client_is_shared_and_tuned(monkeypatch):
+    from backend.app.config import settings
+    from backend.app.db import mongo
+    monkeypatch.setattr(settings, "mongodb_max_pool_size", 7)
+    monkeypatch.setattr(settings, "mongodb_read_preference", "secondaryPreferred")
+    await mongo.close_db()
+    try:
+        client = await mongo.get_motor_client()
+        assert await mongo.get_motor_client() is client
+        assert client.options.pool_options.max_pool_size == 7
+        assert client.read_preference.mongos_mode == "secondaryPreferred"
+        assert (await mongo.get_database()).name == settings.mongodb_database
+    finally:
+        await mongo.close_db()
+    assert mongo._client is None
+
+
+def test_job_submission_streams_progress_and_returns_result():
+    body = {
+        "workflow_id": None,
+        "tasks": [
+            {"agent_type": "research", "input_data": {"query": "q"}},
+            {"agent_type": "analysis", "input_data": {}},
+        ],
+    }
+    with TestClient(create_app()) as client:
+        submitted = client.post("/api/orchestrate/jobs", json=body)
+        assert submitted.status_code == 202
+        workflow_id = submitted.json()["workflow_id"]
+
+        with client.stream("GET", f"/api/orchestrate/jobs/{workflow_id}/events") as stream:
+            events = [line[len("event: "):] for line in stream.iter_lines() if line.startswith("event: ")]
+        assert events[0] == "snapshot"
+        assert events[-1] == "finished"
+
+        job = client.get(f"/api/orchestrate/jobs/{workflow_id}").json()
+        assert job["status"] == "pending_human"
+        assert job["tasks"] == {"0": "finished", "1": "finished", "2": "awaiting_human"}
+        assert len(job["result"]["results"]) == 3
+        assert client.get("/api/orchestrate/jobs/missing").status_code == 404
+
+
+def test_batch_endpoint_streams_ndjson(client):
+    import json
+    body = {
+        "template": {"tasks": [
+            {"agent_type": "research", "input_data": {}},
+            {"agent_type": "analysis", "input_data": {}},
+        ]},
+        "inputs": [{"0": {"query": f"q{i}"}} for i in range(5)],
+    }
+    response = client.post("/api/orchestrate/batch", json=body)
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(r["index"] for r in records) == list(range(5))
+    assert all(len(r["results"]) == 3 for r in records)
+
+
+def test_invalid_dependency_graphs_are_rejected(client):
+    tasks = [{"agent_type": "research", "input_data": {"query": "q"}}] * 2
+    for dependencies in ({0: [1], 1: [0]}, {1: [5]}, {7: [0]}):
+        body = {"workflow_id": None, "tasks": tasks, "dependencies": dependencies}
+        for path in ("/api/orchestrate/", "/api/orchestrate/jobs"):
+            assert client.post(path, json=body).status_code == 422
+    batch = {"template": {"tasks": tasks, "dependencies": {0: [0]}}, "inputs": [{}]}
+    assert client.post("/api/orchestrate/batch", json=batch).status_code == 422
+
+
+def test_resume_unknown_workflow_is_404(client):
+    assert client.post("/api/orchestrate/wf-never-ran/resume").status_code == 404
+
+
+def test_running_workflow_cannot_be_run_or_resumed_again(client):
+    import asyncio
+    from backend.app.api.routes.orchestrate import state_manager
+    body = {"workflow_id": "wf-busy", "tasks": [{"agent_type": "research", "input_data": {"query": "q"}}]}
+    assert client.post("/api/orchestrate/", json=body).status_code == 200
+
+    # As if another process were running it
+    assert asyncio.run(state_manager.claim_workflow("wf-busy"))
+    try:
+        assert client.post("/api/orchestrate/", json=body).status_code == 409
+        assert client.post("/api/orchestrate/wf-busy/resume").status_code == 409
+    finally:
+        asyncio.run(state_manager.release_workflow("wf-busy"))
+    assert client.post("/api/orchestrate/wf-busy/resume").status_code == 200
+
+
+def test_app_import_does_not_load_pandas():
+    import subprocess
+    import sys
+    probe = "import sys, backend.app.main; print('pandas' in sys.modules or 'numpy' in sys.modules)"
+    assert subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True).stdout.strip() == "False"
+
+
+def test_fast_json_encodes_numpy_payloads():
+    import json
+    import numpy as np
+    from backend.app.services.serialization import dumps
+    payload = {"statistics": {"a": {"mean": np.float64(1.5), "count": np.int64(3), "values": np.arange(3)}}, 1: "x"}
+    assert json.loads(dumps(payload)) == {"statistics": {"a": {"mean": 1.5, "count": 3, "values": [0, 1, 2]}}, "1": "x"}
+
+
+def test_large_responses_are_compressed(client):
+    body = {"workflow_id": "wf-big", "tasks": [{"agent_type": "research", "input_data": {"query": "x" * 200_000}}]}
+    response = client.post("/api/orchestrate/", json=body)
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.json()["results"][0]["output_data"]["input"]["query"] == "x" * 200_000
+
+    small = client.post("/api/orchestrate/", json={**body, "workflow_id": "wf-small", "tasks": [
+        {"agent_type": "research", "input_data": {"query": "x"}}
+    ]})
+    assert "content-encoding" not in small.headers
+
+
+@pytest.mark.asyncio
+async def test_large_bodies_are_compressed_off_the_event_loop(monkeypatch):
+    import gzip
+    import threading
+    from backend.app.services import serialization
+    monkeypatch.setattr(serialization, "zstd_compress", None)
+    body = b"x" * 300_000
+    threads, sent = [], []
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-length", b"300000")]})
+        await send({"type": "http.response.body", "body": body})
+
+    async def send(message):
+        sent.append(message)
+
+    middleware = serialization.CompressionMiddleware(app, minimum_size=1000, thread_min_size=200_000)
+    compress = middleware._compress
+    monkeypatch.setattr(middleware, "_compress", lambda *a: (threads.append(threading.current_thread()), compress(*a))[1])
+    scope = {"type": "http", "headers": [(b"accept-encoding", b"gzip")]}
+    await middleware(scope, None, send)
+    assert gzip.decompress(sent[1]["body"]) == body
+    assert threads[0] is not threading.main_thread()
+
+    middleware.thread_min_size = 10 * len(body)
+    await middleware(scope, None, send)
+    assert threads[1] is threading.main_thread()
+
+
+def test_decision_batch_endpoint(client):
+    response = client.post("/api/agents/decision/batch", json={
+        "items": [
+            {"research": {"confidence": 0.9}, "analysis": {"confidence": 0.8, "insights": ["up"]}, "tenant": "a"},
+            {"research": {"confidence": 0.9}, "analysis": {"confidence": 0.8}, "tenant": "b"},
+        ],
+        "tenant_thresholds": {"b": 0.95},
+    })
+    assert response.status_code == 200
+    body = response.json()
+    assert [r["status"] for r in body["results"]] == ["auto_approved", "human_verification_required"]
+    assert body["results"][0]["recommendations"] == ["Data insight: up"]
+    assert body["summary"]["auto_approved"] == 1
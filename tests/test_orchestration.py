@@ -0,0 +1,1095 @@
+import asyncio
+import pytest
+from backend.app.models.api_models import AgentResult, AgentTask, OrchestrationRequest
+from backend.app.orchestration.agent_manager import AgentManager, BaseAgent
+from backend.app.orchestration.dag_scheduler import DagScheduler, CyclicDependencyError
+from backend.app.orchestration.state_manager import StateManager
+from backend.app.orchestration.task_queue import PriorityTaskQueue, QueueFullError
+from backend.app.orchestration.task_router import TaskRouter
+from backend.app.orchestration.workflow_engine import WorkflowEngine
+
+
+class SleepyAgent(BaseAgent):
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+        self.inputs = []
+
+    async def handle_task(self, input_data):
+        self.inputs.append(input_data)
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(self.delay)
+        self.active -= 1
+        return {"results": [input_data.get("query")], "confidence": 0.9}
+
+
+async def make_engine(research=None, analysis=None, state_manager=None, **kwargs):
+    manager = AgentManager()
+    await manager.register_agent("research", research or SleepyAgent())
+    await manager.register_agent("analysis", analysis or SleepyAgent())
+    return WorkflowEngine(TaskRouter(manager), state_manager or StateManager(), **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_fan_out_research_runs_in_parallel():
+    research = SleepyAgent(delay=0.1)
+    analysis = SleepyAgent(delay=0.0)
+    engine = await make_engine(research, analysis)
+    request = OrchestrationRequest(
+        workflow_id="wf-fanout",
+        tasks=[AgentTask(agent_type="research", input_data={"query": f"q{i}"}) for i in range(4)]
+        + [AgentTask(agent_type="analysis", input_data={})],
+        dependencies={4: [0, 1, 2, 3]},
+    )
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    response = await engine.run_workflow(request)
+    elapsed = loop.time() - start
+
+    assert research.peak == 4
+    assert elapsed < 0.3
+    assert analysis.inputs[0]["data"] == ["q0", "q1", "q2", "q3"]
+    assert len(response.results) == 6
+    assert engine.state_manager.get_workflow_status("wf-fanout")[4] == "finished"
+
+
+@pytest.mark.asyncio
+async def test_concurrency_cap_is_respected():
+    research = SleepyAgent(delay=0.02)
+    engine = await make_engine(research)
+    request = OrchestrationRequest(
+        workflow_id="wf-cap",
+        tasks=[AgentTask(agent_type="research", input_data={"query": str(i)}) for i in range(6)],
+        dependencies={},
+        max_concurrency=2,
+    )
+    await engine.run_workflow(request)
+    assert research.peak == 2
+
+
+@pytest.mark.asyncio
+async def test_default_graph_is_linear_chain():
+    analysis = SleepyAgent(delay=0.0)
+    engine = await make_engine(analysis=analysis)
+    request = OrchestrationRequest(
+        workflow_id=None,
+        tasks=[
+            AgentTask(agent_type="research", input_data={"query": "x"}),
+            AgentTask(agent_type="analysis", input_data={}),
+        ],
+    )
+    response = await engine.run_workflow(request)
+    assert analysis.inputs[0]["data"] == ["x"]
+    assert [r.agent_type for r in response.results] == ["research", "analysis", "decision"]
+
+
+@pytest.mark.asyncio
+async def test_scheduler_rejects_cycles():
+    async def run_node(node, upstream):
+        return node
+
+    with pytest.raises(CyclicDependencyError):
+        await DagScheduler().run([0, 1], {0: [1], 1: [0]}, run_node)
+
+
+class RecordingAgent(BaseAgent):
+    def __init__(self):
+        self.order = []
+        self.gate = asyncio.Event()
+
+    async def handle_task(self, input_data):
+        await self.gate.wait()
+        self.order.append(input_data["name"])
+        return {}
+
+
+@pytest.mark.asyncio
+async def test_router_dispatches_by_priority_with_fairness():
+    agent = RecordingAgent()
+    manager = AgentManager()
+    await manager.register_agent("research", agent)
+    router = TaskRouter(manager, workers_per_type=1, fairness_interval=3)
+
+    def task(name, priority):
+        return AgentTask(agent_type="research", input_data={"name": name}, priority=priority)
+
+    # The first task occupies the single worker while the rest queue up
+    pending = [asyncio.ensure_future(router.route_task(task("first", 0)))]
+    await asyncio.sleep(0)
+    pending += [asyncio.ensure_future(router.route_task(task(f"low{i}", 1))) for i in range(2)]
+    pending += [asyncio.ensure_future(router.route_task(task(f"high{i}", 9))) for i in range(3)]
+    await asyncio.sleep(0)
+    agent.gate.set()
+    await asyncio.gather(*pending)
+    await router.shutdown()
+
+    assert agent.order == ["first", "high0", "low0", "high1", "high2", "low1"]
+
+
+@pytest.mark.asyncio
+async def test_router_rejects_when_queue_full():
+    agent = RecordingAgent()
+    manager = AgentManager()
+    await manager.register_agent("research", agent)
+    router = TaskRouter(manager, workers_per_type=1, max_queue_size=2)
+    task = AgentTask(agent_type="research", input_data={"name": "x"})
+
+    pending = [asyncio.ensure_future(router.route_task(task))]
+    await asyncio.sleep(0)
+    pending += [asyncio.ensure_future(router.route_task(task)) for _ in range(2)]
+    await asyncio.sleep(0)
+    with pytest.raises(QueueFullError):
+        await router.route_task(task)
+    assert router.queue_depths()["research"] == 2
+    agent.gate.set()
+    await asyncio.gather(*pending)
+    await router.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_queue_shutdown_fails_queued_and_running_tasks():
+    agent = RecordingAgent()
+    queue = PriorityTaskQueue(lambda task: agent.handle_task(task.input_data), workers=1)
+    task = AgentTask(agent_type="research", input_data={"name": "x"})
+    running = asyncio.ensure_future(queue.submit(task))
+    await asyncio.sleep(0)
+    queued = asyncio.ensure_future(queue.submit(task))
+    await asyncio.sleep(0)
+
+    await queue.shutdown()
+    with pytest.raises(RuntimeError):
+        await queued
+    with pytest.raises(asyncio.CancelledError):
+        await running
+    assert queue.depth == 0
+
+
+def test_queue_refuses_loop_switch_while_other_loop_has_work():
+    import threading
+    import time
+    gate = threading.Event()
+    other = asyncio.new_event_loop()
+    thread = threading.Thread(target=other.run_forever, daemon=True)
+    thread.start()
+
+    async def handler(task):
+        await asyncio.to_thread(gate.wait)
+        return AgentResult(agent_type=task.agent_type, output_data={}, success=True)
+
+    queue = PriorityTaskQueue(handler, workers=1)
+    task = AgentTask(agent_type="research", input_data={})
+    try:
+        pending = asyncio.run_coroutine_threadsafe(queue.submit(task), other)
+        for _ in range(100):
+            if queue._running:
+                break
+            time.sleep(0.01)
+
+        async def submit_here():
+            return await queue.submit(task)
+
+        with pytest.raises(RuntimeError):
+            asyncio.run(submit_here())
+        gate.set()
+        assert pending.result(timeout=5).success
+        # Once the other loop is idle the queue may move
+        assert asyncio.run(submit_here()).success
+    finally:
+        gate.set()
+        other.call_soon_threadsafe(other.stop)
+        thread.join()
+        other.close()
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def limit(self, n):
+        return FakeCursor(self.docs[:n])
+
+    async def to_list(self, length=None):
+        return self.docs if length is None else self.docs[:length]
+
+
+class FakeCollection:
+    """In-process stand-in for the handful of collection calls the state store makes."""
+
+    def __init__(self):
+        self.docs = []
+        self.bulk_calls = []
+
+    async def bulk_write(self, ops, ordered=True):
+        self.bulk_calls.append(len(ops))
+        for op in ops:
+            doc = next((d for d in self.docs if all(d.get(k) == v for k, v in op._filter.items())), None)
+            if doc is None:
+                doc = dict(op._filter, **op._doc.get("$setOnInsert", {}))
+                self.docs.append(doc)
+            doc.update(op._doc["$set"])
+
+    def find(self, query, projection=None):
+        return FakeCursor([dict(d) for d in self.docs if all(d.get(k) == v for k, v in query.items())])
+
+    async def find_one(self, query, projection=None):
+        return next((dict(d) for d in self.docs if all(d.get(k) == v for k, v in query.items())), None)
+
+    @staticmethod
+    def _matches(doc, query):
+        for key, cond in query.items():
+            if isinstance(cond, dict):
+                if "$exists" in cond and (key in doc) != cond["$exists"]:
+                    return False
+                if "$lte" in cond and not (key in doc and doc[key] <= cond["$lte"]):
+                    return False
+            elif doc.get(key) != cond:
+                return False
+        return True
+
+    async def update_one(self, query, update, upsert=False):
+        from pymongo.errors import DuplicateKeyError
+        doc = next((d for d in self.docs if self._matches(d, query)), None)
+        if doc is None and upsert:
+            # Mirrors the unique workflow_id index
+            if any(d.get("workflow_id") == query.get("workflow_id") for d in self.docs):
+                raise DuplicateKeyError("duplicate workflow_id")
+            doc = {k: v for k, v in query.items() if not isinstance(v, dict)}
+            doc.update(update.get("$setOnInsert", {}))
+            self.docs.append(doc)
+        elif doc is None:
+            return FakeQueueCollection._Result(0)
+        doc.update(update["$set"])
+        return FakeQueueCollection._Result(1)
+
+
+@pytest.mark.asyncio
+async def test_mongo_state_backend_batches_and_persists():
+    from backend.app.orchestration.state_backends import MongoStateBackend
+    statuses, executions = FakeCollection(), FakeCollection()
+    backend = MongoStateBackend(
+        statuses, executions, flush_interval=60, batch_size=1000, checkpoint_collection=FakeCollection()
+    )
+    engine = await make_engine(state_manager=StateManager(backend))
+    request = OrchestrationRequest(
+        workflow_id="wf-mongo",
+        tasks=[AgentTask(agent_type="research", input_data={"query": "q"}), AgentTask(agent_type="analysis", input_data={})],
+    )
+    await engine.run_workflow(request)
+    # Nothing written yet: updates are coalesced until the flush
+    assert statuses.bulk_calls == []
+
+    assert await backend.fetch_workflow_status("wf-mongo") == {0: "finished", 1: "finished", 2: "finished"}
+    assert statuses.bulk_calls == [3]
+    assert {d["agent_type"] for d in statuses.docs} == {"research", "analysis", "decision"}
+    assert await backend.list_workflows("success") == ["wf-mongo"]
+    await backend.close()
+
+
+@pytest.mark.asyncio
+async def test_workflow_runs_are_exclusive_across_processes():
+    from backend.app.orchestration.state_backends import MongoStateBackend
+    executions = FakeCollection()
+    first = MongoStateBackend(workflow_collection=executions, run_lease_time=60)
+    second = MongoStateBackend(workflow_collection=executions, run_lease_time=60)
+
+    assert await first.claim_workflow("wf-claim")
+    assert not await first.claim_workflow("wf-claim")
+    assert not await second.claim_workflow("wf-claim")
+    await first.release_workflow("wf-claim")
+    assert await second.claim_workflow("wf-claim")
+
+    # A claimer that dies stops renewing; once its lease lapses the workflow can run again
+    _, renewal = second._leases.pop("wf-claim")
+    renewal.cancel()
+    assert not await first.claim_workflow("wf-claim")
+    executions.docs[0]["run_lease_until"] = 0.0
+    assert await first.claim_workflow("wf-claim")
+    await first.release_workflow("wf-claim")
+
+
+@pytest.mark.asyncio
+async def test_workflow_status_is_read_from_mongo_across_processes():
+    from backend.app.orchestration.state_backends import MongoStateBackend
+    collections = dict(status_collection=FakeCollection(), workflow_collection=FakeCollection())
+    writer = MongoStateBackend(flush_interval=60, **collections)
+    writer.start_workflow("wf-shared")
+    writer.update_task_status("wf-shared", 0, "finished", "research")
+    await writer.flush()
+
+    # Another API node never saw the workflow, so its cache is empty
+    reader = StateManager(MongoStateBackend(flush_interval=60, **collections))
+    assert reader.get_workflow_status("wf-shared") == {}
+    assert await reader.fetch_workflow_status("wf-shared") == {0: "finished"}
+    await writer.close()
+    await reader.close()
+
+
+@pytest.mark.asyncio
+async def test_mongo_state_backend_bounds_backlog_while_unreachable():
+    from pymongo.errors import AutoReconnect
+    from backend.app.orchestration.state_backends import MongoStateBackend
+
+    class DownCollection(FakeCollection):
+        async def bulk_write(self, ops, ordered=True):
+            raise AutoReconnect("no primary")
+
+        def find(self, query, projection=None):
+            raise AutoReconnect("no primary")
+
+    backend = MongoStateBackend(DownCollection(), DownCollection(), flush_interval=60, max_pending=5)
+    backend.start_workflow("wf-down")
+    for index in range(10):
+        backend.update_task_status("wf-down", index, "finished")
+    with pytest.raises(AutoReconnect):
+        await backend.flush()
+    assert backend.pending == 5 and backend.dropped == 6
+    # The workflow record outlives the dropped task updates
+    assert "wf-down" in backend._pending_workflows
+    # Status reads fall back to this process's cache
+    assert len(await backend.fetch_workflow_status("wf-down")) == 10
+    with pytest.raises(AutoReconnect):
+        await backend.fetch_workflow_status("wf-elsewhere")
+
+
+@pytest.mark.asyncio
+async def test_in_memory_state_backend_evicts():
+    from backend.app.orchestration.state_backends import InMemoryStateBackend
+    backend = InMemoryStateBackend(ttl=60, max_workflows=2)
+    for wid in ("a", "b", "c"):
+        backend.start_workflow(wid)
+    assert backend.get_workflow_status("a") == {}
+    assert await backend.list_workflows("running") == ["b", "c"]
+    expired = InMemoryStateBackend(ttl=-1)
+    expired.update_task_status("x", 0, "finished")
+    assert expired.get_workflow_status("x") == {}
+
+
+@pytest.mark.asyncio
+async def test_write_behind_buffer_batches_results_and_retries():
+    from pymongo.errors import AutoReconnect
+    from backend.app.db.write_behind import WriteBehindBuffer
+
+    class ReplaceCollection:
+        def __init__(self, failures=0):
+            self.docs = {}
+            self.calls = []
+            self.failures = failures
+
+        async def bulk_write(self, ops, ordered=True):
+            if self.failures:
+                self.failures -= 1
+                raise AutoReconnect("primary stepped down")
+            self.calls.append(len(ops))
+            for op in ops:
+                self.docs[tuple(op._filter.values())] = op._doc
+
+    collections = {"AgentTask": ReplaceCollection(failures=1), "AgentResult": ReplaceCollection()}
+    from backend.app.metrics import WRITE_BEHIND_DEPTH, WRITE_BEHIND_FLUSH_SECONDS
+    flushes = WRITE_BEHIND_FLUSH_SECONDS.count()
+    buffer = WriteBehindBuffer(flush_interval=60, retry_backoff=0, resolver=collections.__getitem__)
+    engine = await make_engine(persistence=buffer)
+    request = OrchestrationRequest(
+        workflow_id="wf-persist",
+        tasks=[AgentTask(agent_type="research", input_data={"query": "q"}), AgentTask(agent_type="analysis", input_data={})],
+    )
+    await engine.run_workflow(request)
+    assert buffer.depth == 6
+    assert collections["AgentResult"].calls == []
+    buffer.collect_metrics()
+    assert WRITE_BEHIND_DEPTH.value() == 6
+
+    await buffer.close()
+    assert collections["AgentTask"].calls == [3]
+    assert collections["AgentResult"].calls == [3]
+    assert collections["AgentResult"].docs[("wf-persist:2",)]["agent_type"] == "decision"
+    assert buffer.metrics()["retries"] == 1
+    assert buffer.metrics()["flushed"] == 6 and buffer.depth == 0
+    assert WRITE_BEHIND_FLUSH_SECONDS.count() - flushes == buffer.flushes
+
+
+@pytest.mark.asyncio
+async def test_batch_runner_dedups_shared_sub_tasks():
+    from backend.app.models.api_models import BatchOrchestrationRequest
+    from backend.app.orchestration.batch_runner import BatchRunner
+    research, analysis = SleepyAgent(delay=0.01), SleepyAgent(delay=0.01)
+    engine = await make_engine(research, analysis)
+    batch = BatchOrchestrationRequest(
+        template={"tasks": [
+            {"agent_type": "research", "input_data": {"query": "shared"}},
+            {"agent_type": "research", "input_data": {}},
+            {"agent_type": "analysis", "input_data": {}},
+        ], "dependencies": {2: [0, 1]}},
+        inputs=[{1: {"query": f"item {i % 3}"}} for i in range(9)],
+        max_concurrency=4,
+        workflow_id_prefix="bulk",
+    )
+    records = [record async for record in BatchRunner(engine).run(batch)]
+
+    assert sorted(r["index"] for r in records) == list(range(9))
+    assert all(r["status"] == "success" for r in records)
+    # One shared query plus three distinct per-item queries
+    assert sorted(i["query"] for i in research.inputs) == ["item 0", "item 1", "item 2", "shared"]
+    # Analysis steps only differ by their upstream data, so they dedup the same way
+    assert sorted(i["data"][1] for i in analysis.inputs) == ["item 0", "item 1", "item 2"]
+
+
+@pytest.mark.asyncio
+async def test_spans_propagate_from_workflow_through_router_to_agent():
+    from backend.app import tracing
+    exporter = tracing.InMemorySpanExporter()
+    tracing.configure(exporter)
+    try:
+        engine = await make_engine()
+        await engine.run_workflow(OrchestrationRequest(
+            workflow_id="wf-traced",
+            tasks=[AgentTask(agent_type="research", input_data={"query": "q"})],
+        ))
+    finally:
+        tracing.configure(None)
+
+    spans = {s.name: s for s in exporter.spans if s.attributes.get("agent_type") != "decision"}
+    assert {"workflow", "workflow.step", "agent"} <= set(spans)
+    assert len({s.trace_id for s in exporter.spans}) == 1
+    assert spans["agent"].parent_id == spans["workflow.step"].span_id
+    assert spans["workflow"].parent_id is None
+
+
+@pytest.mark.asyncio
+async def test_health_check_probes_agents():
+    class FlakyAgent(SleepyAgent):
+        async def get_health(self):
+            raise RuntimeError("upstream down")
+
+    manager = AgentManager()
+    await manager.register_agent("research", FlakyAgent())
+    await manager.register_agent("analysis", SleepyAgent())
+    assert await manager.health_check() == {"research": False, "analysis": True}
+
+
+@pytest.mark.asyncio
+async def test_replica_pool_spreads_load_and_caps_concurrency():
+    replicas = [SleepyAgent(delay=0.02), SleepyAgent(delay=0.02)]
+    manager = AgentManager(max_concurrency_per_replica=2)
+    for agent in replicas:
+        await manager.register_agent("research", agent)
+    router = TaskRouter(manager, workers_per_type=8)
+    await asyncio.gather(*(
+        router.route_task(AgentTask(agent_type="research", input_data={"query": f"q{i}"})) for i in range(8)
+    ))
+
+    assert [len(a.inputs) for a in replicas] == [4, 4]
+    assert max(a.peak for a in replicas) == 2
+
+
+@pytest.mark.asyncio
+async def test_replica_pool_ejects_failing_replica_and_probe_reinstates():
+    from backend.app.orchestration.replica_pool import ReplicaPool
+
+    class FailingAgent(SleepyAgent):
+        healthy = False
+
+        async def handle_task(self, input_data):
+            raise RuntimeError("backend down")
+
+        async def get_health(self):
+            return self.healthy
+
+    bad, good = FailingAgent(), SleepyAgent(delay=0)
+    pool = ReplicaPool(failure_threshold=2, ejection_time=60)
+    pool.add(bad)
+    pool.add(good)
+    for _ in range(6):
+        try:
+            await pool.call(lambda agent: agent.handle_task({"query": "q"}))
+        except RuntimeError:
+            pass
+    assert pool.status()[0]["ejected"] and pool.status()[0]["failures"] == 2
+    assert pool.select().agent is good
+
+    await pool.probe()
+    assert not pool.status()[0]["healthy"]
+    bad.healthy = True
+    await pool.probe()
+    assert pool.status()[0] == {**pool.status()[0], "healthy": True, "ejected": False}
+
+
+@pytest.mark.asyncio
+async def test_research_replica_returning_errors_is_ejected():
+    import httpx
+    from backend.app.agents.research_agent import ResearchAgent
+    from backend.app.services.result_cache import TTLCache
+
+    def handler(request):
+        if request.url.host == "down.replica":
+            return httpx.Response(401, json={"error": "bad token"})
+        return httpx.Response(200, json=[{"generated_text": "ok"}])
+
+    def replica(url):
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        return lambda: ResearchAgent(api_key="k", api_url=url, client=client, cache=TTLCache())
+
+    manager = AgentManager(failure_threshold=2, ejection_time=60)
+    await manager.register_factory("research", replica("http://down.replica/model"))
+    await manager.register_factory("research", replica("http://up.replica/model"))
+    router = TaskRouter(manager, workers_per_type=1)
+    results = [
+        await router.route_task(AgentTask(agent_type="research", input_data={"query": f"q{i}"})) for i in range(6)
+    ]
+    await router.shutdown()
+
+    # ResearchAgent returns its error instead of raising; it still counts against the replica
+    failed = [r for r in results if not r.success]
+    assert len(failed) == 2 and "401" in failed[0].error
+    down, up = manager.get_pool("research").status()
+    assert down["ejected"] and down["failures"] == 2
+    assert up["failures"] == 0 and up["requests"] == 4
+
+
+@pytest.mark.asyncio
+async def test_research_replicas_come_from_settings(monkeypatch):
+    from backend.app.config import settings
+    monkeypatch.setattr(settings, "research_replicas", [
+        {"api_url": "http://a.replica/model", "api_key": "token-a", "max_concurrency": 3},
+        {"api_url": "http://b.replica/model"},
+    ])
+    manager = AgentManager()
+    await manager.initialize_agents()
+    manager.preload()
+    replicas = manager.get_pool("research").replicas
+    assert [(r.agent.preload().api_url, r.max_concurrency) for r in replicas] == [
+        ("http://a.replica/model", 3), ("http://b.replica/model", None),
+    ]
+    assert replicas[0].agent.preload().api_key == "token-a"
+
+
+@pytest.mark.asyncio
+async def test_warmup_loads_default_agents_and_their_model(monkeypatch):
+    from backend.app.config import settings
+    from backend.app.services import local_model
+    loads = []
+
+    def fake_pipeline_factory(task, model_path):
+        loads.append(model_path)
+        return lambda queries, batch_size, **kwargs: [[{"generated_text": q.upper()}] for q in queries]
+
+    backend = local_model.LocalModelBackend("/models/warm", pipeline_factory=fake_pipeline_factory)
+    monkeypatch.setitem(local_model._backends, "/models/warm", backend)
+    monkeypatch.setattr(settings, "research_backend", "local")
+    monkeypatch.setattr(settings, "local_model_path", "/models/warm")
+    manager = AgentManager()
+    await manager.initialize_agents()
+    await manager.initialize_agents()
+    assert [len(manager.get_pool(t).replicas) for t in ("research", "analysis")] == [1, 1]
+
+    await manager.warmup()
+    assert all(agent.loaded for agent in manager.lazy_agents())
+    assert loads == ["/models/warm"]
+
+    # Tasks reach the constructed ResearchAgent through the lazy stand-in
+    router = TaskRouter(manager)
+    result = await router.route_task(AgentTask(agent_type="research", input_data={"query": "warm query"}))
+    await router.shutdown()
+    backend.close()
+    assert result.success
+    assert result.output_data["citations"] == ["Generated by local:/models/warm"]
+    assert loads == ["/models/warm"]
+
+
+@pytest.mark.asyncio
+async def test_ewma_strategy_prefers_faster_replica():
+    from backend.app.orchestration.replica_pool import ReplicaPool
+    slow, fast = SleepyAgent(delay=0.05), SleepyAgent(delay=0.001)
+    pool = ReplicaPool(strategy="ewma")
+    pool.add(slow)
+    pool.add(fast)
+    for _ in range(10):
+        await pool.call(lambda agent: agent.handle_task({"query": "q"}))
+
+    assert len(fast.inputs) > len(slow.inputs)
+
+
+@pytest.mark.asyncio
+async def test_pipeline_benchmark_reports_percentiles_and_flags_regressions():
+    from benchmarks.bench_pipeline import parse_args, run
+    from benchmarks.harness import find_regressions
+    args = parse_args(["--requests", "20", "--concurrency", "4", "--latency-ms", "1", "--only", "router,engine"])
+    results = await run(args)
+
+    assert set(results) == {"router", "engine fan-out 4->1"}
+    assert results["router"]["requests"] == 20 and results["router"]["errors"] == 0
+    assert results["router"]["p50_ms"] <= results["router"]["p95_ms"] <= results["router"]["p99_ms"]
+    slower = {name: {**stats, "p95_ms": stats["p95_ms"] * 2 + 5} for name, stats in results.items()}
+    assert find_regressions(results, results) == []
+    assert len(find_regressions(slower, results)) == 2
+
+
+class HangingAgent(BaseAgent):
+    def __init__(self):
+        self.cancelled = False
+
+    async def handle_task(self, input_data):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+
+@pytest.mark.asyncio
+async def test_step_timeout_fails_only_that_step():
+    hanging = HangingAgent()
+    engine = await make_engine(research=hanging)
+    response = await engine.run_workflow(OrchestrationRequest(
+        workflow_id="wf-step-timeout",
+        tasks=[
+            AgentTask(agent_type="research", input_data={"query": "slow"}, timeout=0.05),
+            AgentTask(agent_type="analysis", input_data={}),
+        ],
+        dependencies={},
+    ))
+    await asyncio.sleep(0)
+
+    assert response.results[0].error == "Step timed out after 0.05s"
+    assert response.results[1].success
+    assert hanging.cancelled
+
+
+@pytest.mark.asyncio
+async def test_workflow_deadline_returns_partial_results_and_cancels_steps():
+    hanging = HangingAgent()
+    engine = await make_engine(research=hanging, analysis=SleepyAgent(delay=0))
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    response = await engine.run_workflow(OrchestrationRequest(
+        workflow_id="wf-deadline",
+        tasks=[
+            AgentTask(agent_type="research", input_data={"query": "slow"}),
+            AgentTask(agent_type="analysis", input_data={}),
+        ],
+        dependencies={},
+        timeout=0.1,
+    ))
+
+    assert loop.time() - start < 1
+    assert response.status == "timeout"
+    assert [r.agent_type for r in response.results] == ["analysis"]
+    assert hanging.cancelled
+    assert engine.state_manager.get_workflow_status("wf-deadline") == {1: "finished", 0: "cancelled"}
+
+
+@pytest.mark.asyncio
+async def test_cancel_event_stops_workflow():
+    engine = await make_engine(research=HangingAgent())
+    cancel_event = asyncio.Event()
+    asyncio.get_running_loop().call_later(0.05, cancel_event.set)
+    response = await engine.run_workflow(OrchestrationRequest(
+        workflow_id="wf-cancelled",
+        tasks=[AgentTask(agent_type="research", input_data={"query": "q"})],
+    ), cancel_event=cancel_event)
+
+    assert response.status == "cancelled"
+    assert response.results == []
+
+
+class FlakyAnalysisAgent(SleepyAgent):
+    def __init__(self, failures=1):
+        super().__init__(delay=0)
+        self.failures = failures
+
+    async def handle_task(self, input_data):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("analysis crashed")
+        return await super().handle_task(input_data)
+
+
+@pytest.mark.asyncio
+async def test_second_run_of_a_running_workflow_is_rejected():
+    from backend.app.orchestration.state_manager import WorkflowRunningError
+    engine = await make_engine(research=HangingAgent())
+    request = OrchestrationRequest(
+        workflow_id="wf-once", tasks=[AgentTask(agent_type="research", input_data={"query": "q"})],
+    )
+    cancel_event = asyncio.Event()
+    running = asyncio.ensure_future(engine.run_workflow(request, cancel_event=cancel_event))
+    await asyncio.sleep(0.01)
+
+    with pytest.raises(WorkflowRunningError):
+        await engine.run_workflow(request)
+    cancel_event.set()
+    assert (await running).status == "cancelled"
+    # Released with the first run
+    assert await engine.state_manager.claim_workflow("wf-once")
+
+
+@pytest.mark.asyncio
+async def test_resume_reuses_checkpointed_steps():
+    research = SleepyAgent(delay=0)
+    engine = await make_engine(research=research, analysis=FlakyAnalysisAgent())
+    request = OrchestrationRequest(
+        workflow_id="wf-resume",
+        tasks=[AgentTask(agent_type="research", input_data={"query": "q"}), AgentTask(agent_type="analysis", input_data={})],
+    )
+    first = await engine.run_workflow(request)
+    assert not first.results[1].success
+
+    stored = await engine.state_manager.load_request("wf-resume")
+    resumed = await engine.run_workflow(OrchestrationRequest(**stored))
+
+    assert resumed.status == "success"
+    assert len(research.inputs) == 1
+    assert resumed.results[0] == first.results[0]
+
+
+@pytest.mark.asyncio
+async def test_mongo_state_backend_hydrates_checkpoints_on_resume():
+    from backend.app.orchestration.state_backends import MongoStateBackend
+    collections = dict(
+        status_collection=FakeCollection(), workflow_collection=FakeCollection(), checkpoint_collection=FakeCollection()
+    )
+    writer = MongoStateBackend(flush_interval=60, **collections)
+    writer.start_workflow("wf-hydrate")
+    writer.save_request("wf-hydrate", {"workflow_id": "wf-hydrate", "tasks": []})
+    writer.save_checkpoint("wf-hydrate", 0, "abc", {"success": True})
+    await writer.close()
+
+    # Another worker that never saw the workflow
+    reader = MongoStateBackend(flush_interval=60, **collections)
+    assert await reader.load_checkpoint("wf-hydrate", 0, "abc") is None
+    assert await reader.load_request("wf-hydrate") == {"workflow_id": "wf-hydrate", "tasks": []}
+    assert await reader.load_checkpoint("wf-hydrate", 0, "abc") == {"success": True}
+    await reader.close()
+
+
+@pytest.mark.asyncio
+async def test_lazy_agents_construct_on_first_use_or_warmup():
+    built = []
+
+    def factory():
+        built.append(1)
+        return SleepyAgent(delay=0)
+
+    manager = AgentManager()
+    await manager.register_factory("research", factory)
+    await manager.register_factory("analysis", factory)
+    assert built == []
+    assert await manager.health_check() == {"research": True, "analysis": True}
+    assert built == []
+
+    router = TaskRouter(manager)
+    result = await router.route_task(AgentTask(agent_type="research", input_data={"query": "q"}))
+    assert result.success and built == [1]
+    await manager.warmup()
+    assert built == [1, 1]
+    await router.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_chained_analysis_steps_pass_artifact_references(monkeypatch):
+    from backend.app.agents.analysis_agent import AnalysisAgent
+    from backend.app.orchestration import workflow_engine
+    from backend.app.services.artifacts import is_artifact_ref
+    monkeypatch.setattr(workflow_engine.settings, "artifact_min_rows", 10)
+
+    class InlineAnalysis(BaseAgent):
+        def __init__(self):
+            self.agent = AnalysisAgent(execution_mode="inline")
+            self.inputs = []
+
+        async def handle_task(self, input_data):
+            self.inputs.append(input_data)
+            return await self.agent.execute(input_data)
+
+    analysis = InlineAnalysis()
+    engine = await make_engine(analysis=analysis)
+    rows = [{"x": float(i), "y": float(i % 4)} for i in range(50)]
+    response = await engine.run_workflow(OrchestrationRequest(
+        workflow_id="wf-artifact-chain",
+        tasks=[
+            AgentTask(agent_type="analysis", input_data={"data": rows}),
+            AgentTask(agent_type="analysis", input_data={"columns": ["y"]}),
+        ],
+    ))
+    assert all(r.success for r in response.results)
+    handed = analysis.inputs[1]["data"]
+    assert is_artifact_ref(handed) and handed["rows"] == 50
+    assert set(response.results[1].output_data["statistics"]) == {"y"}
+    # Artifacts are released with the workflow
+    assert not workflow_engine.artifact_store.exists(handed)
+
+
+class FakeQueueCollection:
+    """In-process stand-in for the atomic collection calls the durable task queue makes."""
+
+    class _Result:
+        def __init__(self, modified_count):
+            self.modified_count = modified_count
+
+    def __init__(self):
+        self.docs = {}
+
+    @staticmethod
+    def _matches(doc, query):
+        for key, cond in query.items():
+            value = doc.get(key)
+            if isinstance(cond, dict):
+                if "$in" in cond and value not in cond["$in"]:
+                    return False
+                if "$lte" in cond and not value <= cond["$lte"]:
+                    return False
+                if "$ne" in cond and value == cond["$ne"]:
+                    return False
+            elif value != cond:
+                return False
+        return True
+
+    @staticmethod
+    def _apply(doc, update):
+        doc.update(update.get("$set", {}))
+        for key, amount in update.get("$inc", {}).items():
+            doc[key] = doc.get(key, 0) + amount
+
+    async def insert_one(self, doc):
+        self.docs[doc["_id"]] = dict(doc)
+
+    async def find_one_and_update(self, query, update, sort=None, projection=None, return_document=False):
+        matching = [d for d in self.docs.values() if self._matches(d, query)]
+        for key, direction in reversed(sort or []):
+            matching.sort(key=lambda d: d[key], reverse=direction < 0)
+        if not matching:
+            return None
+        before = dict(matching[0])
+        self._apply(matching[0], update)
+        return dict(matching[0]) if return_document else before
+
+    async def update_one(self, query, update):
+        doc = next((d for d in self.docs.values() if self._matches(d, query)), None)
+        if doc is not None:
+            self._apply(doc, update)
+        return self._Result(int(doc is not None))
+
+    async def delete_one(self, query):
+        doc = next((d for d in self.docs.values() if self._matches(d, query)), None)
+        if doc is not None:
+            del self.docs[doc["_id"]]
+
+    async def delete_many(self, query):
+        for doc in [d for d in self.docs.values() if self._matches(d, query)]:
+            del self.docs[doc["_id"]]
+
+    def find(self, query, projection=None):
+        return FakeCursor([dict(d) for d in self.docs.values() if self._matches(d, query)])
+
+
+async def start_worker(collection, agent_types, **agents):
+    from backend.app.orchestration.durable_queue import DurableTaskQueue
+    from backend.app.worker import QueueWorker
+    manager = AgentManager()
+    for agent_type, agent in agents.items():
+        await manager.register_agent(agent_type, agent)
+    queue = DurableTaskQueue(collection, lease_time=5, poll_interval=0.01)
+    worker = QueueWorker(queue, TaskRouter(manager), agent_types, concurrency=2)
+    stop = asyncio.Event()
+    return worker, stop, asyncio.create_task(worker.run(stop))
+
+
+@pytest.mark.asyncio
+async def test_queue_mode_runs_tasks_on_separate_workers():
+    from backend.app.orchestration.durable_queue import DurableTaskQueue
+    collection = FakeQueueCollection()
+    research, analysis = SleepyAgent(delay=0.01), SleepyAgent(delay=0.01)
+    # Independent workers (as separate processes would be), split by agent type
+    research_worker, stop_research, research_run = await start_worker(collection, ["research"], research=research)
+    analysis_worker, stop_analysis, analysis_run = await start_worker(collection, ["analysis"], analysis=analysis)
+
+    # The API side has no agents of its own: every task goes through the queue
+    api_router = TaskRouter(AgentManager(), remote_queue=DurableTaskQueue(collection, poll_interval=0.01))
+    engine = WorkflowEngine(api_router, StateManager())
+    response = await engine.run_workflow(OrchestrationRequest(
+        workflow_id="wf-queue",
+        tasks=[AgentTask(agent_type="research", input_data={"query": f"q{i}"}) for i in range(4)]
+        + [AgentTask(agent_type="analysis", input_data={})],
+        dependencies={4: [0, 1, 2, 3]},
+    ))
+    assert all(r.success for r in response.results[:5])
+    assert sorted(i["query"] for i in research.inputs) == ["q0", "q1", "q2", "q3"]
+    assert len(analysis.inputs) == 1
+    assert (research_worker.processed, analysis_worker.processed) == (4, 1)
+    # Delivered results are removed from the queue
+    assert collection.docs == {}
+
+    stop_research.set()
+    stop_analysis.set()
+    await asyncio.gather(research_run, analysis_run)
+    await api_router.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_durable_queue_redelivers_expired_leases_and_fails_after_max_attempts():
+    from backend.app.orchestration.durable_queue import DurableTaskQueue
+    now = [1000.0]
+    queue = DurableTaskQueue(
+        FakeQueueCollection(), lease_time=10, max_attempts=2, poll_interval=0.01, clock=lambda: now[0]
+    )
+    submitted = asyncio.create_task(queue.submit(AgentTask(agent_type="analysis", input_data={})))
+    await asyncio.sleep(0)
+
+    first = await queue.lease(["analysis"], "worker-a")
+    assert first.attempts == 1
+    assert await queue.lease(["analysis"], "worker-b") is None
+    # worker-a dies; once its lease runs out the task is visible again
+    now[0] += 11
+    second = await queue.lease(["analysis"], "worker-b")
+    assert (second.task_id, second.attempts) == (first.task_id, 2)
+    # A late ack from the worker that lost the lease is ignored
+    late = AgentResult(agent_type="analysis", output_data={}, success=True)
+    assert not await queue.ack(first, "worker-a", late)
+
+    now[0] += 11
+    assert await queue.lease(["analysis"], "worker-c") is None
+    result = await asyncio.wait_for(submitted, 1)
+    assert not result.success and result.error == "Task abandoned after 2 attempts"
+    await queue.close()
+
+
+@pytest.mark.asyncio
+async def test_durable_queue_withdraws_cancelled_submissions():
+    from backend.app.orchestration.durable_queue import DurableTaskQueue
+    collection = FakeQueueCollection()
+    queue = DurableTaskQueue(collection, poll_interval=0.01)
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(queue.submit(AgentTask(agent_type="research", input_data={"query": "q"})), 0.05)
+    assert collection.docs == {}
+    assert await queue.lease(["research"], "worker") is None
+    await queue.close()
+
+
+@pytest.mark.asyncio
+async def test_queued_task_carries_the_submitters_deadline_to_the_worker():
+    from backend.app.orchestration.durable_queue import DurableTaskQueue
+    from backend.app.services.deadlines import deadline_scope
+    collection = FakeQueueCollection()
+    hanging = HangingAgent()
+    worker, stop, running = await start_worker(collection, ["analysis"], analysis=hanging)
+    producer = DurableTaskQueue(collection, poll_interval=0.01)
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    with deadline_scope(0.2):
+        result = await producer.submit(AgentTask(agent_type="analysis", input_data={}))
+    assert loop.time() - start < 2
+    assert not result.success and result.error == "Deadline exceeded"
+    assert hanging.cancelled
+
+    # Leased only after its deadline: failed without running
+    stop.set()
+    await running
+    with deadline_scope(0.01):
+        task_id = await producer.enqueue(AgentTask(agent_type="analysis", input_data={"late": True}))
+    await asyncio.sleep(0.05)
+    sleepy = SleepyAgent(delay=0)
+    worker, stop, running = await start_worker(collection, ["analysis"], analysis=sleepy)
+    result = await asyncio.wait_for(producer.wait_result(task_id), 5)
+    assert result.error == "Deadline exceeded before the task ran"
+    assert sleepy.inputs == []
+    stop.set()
+    await running
+    await producer.close()
+
+
+class TaggingAgent(BaseAgent):
+    def __init__(self, tag, delay):
+        self.tag = tag
+        self.delay = delay
+
+    async def handle_task(self, input_data):
+        await asyncio.sleep(self.delay)
+        return {"worker": self.tag}
+
+
+def _queue_worker_process(url, database, worker_id, delay):
+    # Spawned worker process: its own event loop and Mongo client, like `python -m backend.app.worker`
+    import motor.motor_asyncio
+    from backend.app.orchestration.durable_queue import DurableTaskQueue
+    from backend.app.worker import QueueWorker
+
+    async def serve():
+        client = motor.motor_asyncio.AsyncIOMotorClient(url, serverSelectionTimeoutMS=2000)
+        manager = AgentManager()
+        await manager.register_agent("analysis", TaggingAgent(worker_id, delay))
+        queue = DurableTaskQueue(client[database]["task_queue"], lease_time=1, poll_interval=0.05)
+        await QueueWorker(queue, TaskRouter(manager), ["analysis"], worker_id=worker_id).run()
+
+    asyncio.run(serve())
+
+
+@pytest.mark.asyncio
+async def test_killed_worker_process_task_is_redelivered_after_its_lease_expires():
+    """Needs a MongoDB server (settings.mongodb_url); skipped when none answers."""
+    import multiprocessing
+    import uuid
+    import motor.motor_asyncio
+    from backend.app.config import settings
+    from backend.app.orchestration.durable_queue import DurableTaskQueue
+    client = motor.motor_asyncio.AsyncIOMotorClient(settings.mongodb_url, serverSelectionTimeoutMS=500)
+    try:
+        await client.admin.command("ping")
+    except Exception:
+        client.close()
+        pytest.skip(f"no MongoDB server at {settings.mongodb_url}")
+    database = f"interflow_test_{uuid.uuid4().hex[:8]}"
+    collection = client[database]["task_queue"]
+    queue = DurableTaskQueue(collection, lease_time=1, poll_interval=0.05)
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=_queue_worker_process, args=(settings.mongodb_url, database, "stuck", 60))]
+    workers[0].start()
+    try:
+        task_id = await queue.enqueue(AgentTask(agent_type="analysis", input_data={}))
+        for _ in range(600):
+            doc = await collection.find_one({"_id": task_id})
+            if doc["lease_owner"] == "stuck":
+                break
+            await asyncio.sleep(0.05)
+        assert doc["lease_owner"] == "stuck"
+        # Killed mid-task: no ack, no nack, the lease just stops being extended
+        workers[0].kill()
+        workers[0].join()
+
+        workers.append(context.Process(target=_queue_worker_process, args=(settings.mongodb_url, database, "backup", 0)))
+        workers[1].start()
+        result = await asyncio.wait_for(queue.wait_result(task_id), 60)
+        assert result.success and result.output_data == {"worker": "backup"}
+    finally:
+        for worker in workers:
+            worker.kill()
+            worker.join()
+        await queue.close()
+        await client.drop_database(database)
+        client.close()
+
+
+def test_file_span_exporter_writes_batches_in_the_background(tmp_path):
+    import json
+    import time
+    from backend.app import tracing
+    path = tmp_path / "spans.jsonl"
+    tracing.configure(tracing.FileSpanExporter(str(path), flush_interval=60, batch_size=3))
+    try:
+        for i in range(3):
+            with tracing.span("step", index=i):
+                pass
+        # A full batch wakes the writer thread; nothing else writes before shutdown
+        deadline = time.time() + 5
+        while not (path.exists() and path.read_text().count("\n") == 3) and time.time() < deadline:
+            time.sleep(0.01)
+        assert len(path.read_text().splitlines()) == 3
+        with tracing.span("step", index=3):
+            pass
+        assert len(path.read_text().splitlines()) == 3
+    finally:
+        tracing.shutdown()
+
+    assert [json.loads(line)["attributes"]["index"] for line in path.read_text().splitlines()] == [0, 1, 2, 3]
+    assert tracing._exporter is None
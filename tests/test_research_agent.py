@@ -10,3 +10,398 @@ async def test_research_agent_execution():
     assert "citations" in result
     assert "confidence" in result
     assert isinstance(result["confidence"], float)
+
+
+@pytest.mark.asyncio
+async def test_research_agents_share_pooled_client():
+    from backend.app.services.http_client import http_clients
+    first, second = ResearchAgent(api_key="k"), ResearchAgent(api_key="k")
+    assert first.client is second.client
+    await http_clients.aclose()
+    assert first.client is not None and not first.client.is_closed
+    await http_clients.aclose()
+
+
+@pytest.mark.asyncio
+async def test_host_limited_transport_caps_concurrency():
+    import httpx
+    from backend.app.services.http_client import HostLimitedTransport
+    active = {"now": 0, "peak": 0}
+
+    async def handler(request):
+        active["now"] += 1
+        active["peak"] = max(active["peak"], active["now"])
+        await asyncio.sleep(0.01)
+        active["now"] -= 1
+        return httpx.Response(200, json={"ok": True})
+
+    transport = HostLimitedTransport(httpx.MockTransport(handler), max_per_host=2)
+    async with httpx.AsyncClient(transport=transport) as client:
+        responses = await asyncio.gather(*[client.get("http://upstream/x") for _ in range(6)])
+    assert all(r.status_code == 200 for r in responses)
+    assert active["peak"] == 2
+
+
+def stub_client(handler):
+    import httpx
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+@pytest.mark.asyncio
+async def test_identical_queries_are_coalesced_and_cached():
+    import httpx
+    from backend.app.services.result_cache import TTLCache
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json=[{"generated_text": "answer"}])
+
+    from backend.app.metrics import CACHE_EVENTS
+    hits, misses = CACHE_EVENTS.value(result="hit"), CACHE_EVENTS.value(result="miss")
+    cache = TTLCache(max_size=8, ttl=60)
+    agent = ResearchAgent(api_key="k", client=stub_client(handler), cache=cache)
+    results = await asyncio.gather(
+        agent.execute({"query": "AI trends"}),
+        agent.execute({"query": "  ai   TRENDS "}),
+    )
+    assert len(calls) == 1
+    assert results[0] == results[1]
+    assert cache.stats()["misses"] == 2
+
+    await agent.execute({"query": "AI trends"})
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 1
+    assert CACHE_EVENTS.value(result="hit") - hits == 1
+    assert CACHE_EVENTS.value(result="miss") - misses == 2
+    assert "# TYPE interflow_research_cache_events_total counter" in "\n".join(CACHE_EVENTS.render())
+
+
+def test_ttl_cache_evicts_lru_and_expires(tmp_path):
+    from backend.app.services.result_cache import TTLCache, SqliteCacheStore
+    cache = TTLCache(max_size=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+
+    expired = TTLCache(max_size=2, ttl=-1)
+    expired.set("a", 1)
+    assert expired.get("a") is None
+
+    path = str(tmp_path / "cache.sqlite")
+    store = SqliteCacheStore(path)
+    TTLCache(store=store).set("q", {"results": ["x"]})
+    # Writes are committed in the background; close() waits for them
+    store.close()
+    restarted = TTLCache(store=SqliteCacheStore(path))
+    assert restarted.get("q") == {"results": ["x"]}
+
+
+@pytest.mark.asyncio
+async def test_sqlite_cache_store_stays_off_the_event_loop(tmp_path):
+    import threading
+    from backend.app.services.result_cache import SqliteCacheStore, TTLCache
+    store = SqliteCacheStore(str(tmp_path / "cache.sqlite"))
+    threads = set()
+    real_get, real_flush = store._get, store._flush
+
+    def record(fn):
+        def wrapper(*args):
+            threads.add(threading.current_thread().name)
+            return fn(*args)
+        return wrapper
+
+    store._get, store._flush = record(real_get), record(real_flush)
+    cache = TTLCache(store=store)
+    for i in range(50):
+        cache.set(f"k{i}", i)
+    # Queued writes are visible before they are committed
+    assert await TTLCache(store=store).aget("k7") == 7
+    store.flush()
+    assert await TTLCache(store=store).aget("k49") == 49
+    assert await cache.aget("missing") is None
+    assert threads and all(name.startswith("cache-store") for name in threads)
+    store.close()
+
+
+def test_sqlite_cache_store_opens_on_first_use(tmp_path):
+    from backend.app.services.result_cache import SqliteCacheStore
+    path = tmp_path / "cache.sqlite"
+    store = SqliteCacheStore(str(path))
+    assert not path.exists()
+    store.close()
+    store.set("k", 1, expires_at=float("inf"))
+    store.flush()
+    assert path.exists() and store.get("k") == (1, float("inf"))
+    store.close()
+
+
+@pytest.mark.asyncio
+async def test_upstream_request_is_cancelled_with_its_last_waiter():
+    import httpx
+    from backend.app.services.result_cache import TTLCache
+    started, cancelled = asyncio.Event(), asyncio.Event()
+
+    async def handler(request):
+        started.set()
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        return httpx.Response(200, json=[{"generated_text": "late"}])
+
+    agent = ResearchAgent(api_key="k", client=stub_client(handler), cache=TTLCache())
+    agent.api_url = "http://slow-upstream.test/model"
+    first = asyncio.ensure_future(agent.execute({"query": "slow"}))
+    second = asyncio.ensure_future(agent.execute({"query": "slow"}))
+    await started.wait()
+
+    # One caller leaving keeps the shared request alive for the other
+    first.cancel()
+    await asyncio.sleep(0.01)
+    assert not cancelled.is_set() and len(agent.inflight) == 1
+
+    second.cancel()
+    await asyncio.wait_for(cancelled.wait(), 1)
+    assert len(agent.inflight) == 0
+    await asyncio.gather(first, second, return_exceptions=True)
+
+
+@pytest.mark.asyncio
+async def test_single_flight_does_not_inherit_the_first_callers_deadline():
+    from backend.app.services.deadlines import deadline_scope, remaining
+    from backend.app.services.result_cache import SingleFlight
+    flight = SingleFlight()
+    budgets = []
+
+    async def call():
+        budgets.append(remaining())
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def short_caller():
+        with deadline_scope(0.01):
+            return await asyncio.wait_for(flight.do("k", call), 0.01)
+
+    results = await asyncio.gather(short_caller(), flight.do("k", call), return_exceptions=True)
+    assert isinstance(results[0], asyncio.TimeoutError)
+    # The patient caller still gets the result, computed once and without the short budget
+    assert results[1] == "done" and budgets == [None]
+
+
+@pytest.mark.asyncio
+async def test_retry_honours_retry_after_then_succeeds(monkeypatch):
+    import httpx
+    from backend.app.services import resilience
+    sleeps = []
+    real_sleep = asyncio.sleep
+
+    async def fake_sleep(delay):
+        sleeps.append(delay)
+        await real_sleep(0)
+
+    monkeypatch.setattr(resilience.asyncio, "sleep", fake_sleep)
+    responses = iter([
+        httpx.Response(429, headers={"Retry-After": "7"}),
+        httpx.Response(200, json=[{"generated_text": "ok"}]),
+    ])
+    agent = ResearchAgent(api_key="k", client=stub_client(lambda request: next(responses)))
+    agent.api_url = "http://retry-after.test/model"
+    result = await agent.execute({"query": "retry"})
+
+    assert result["results"] == [{"generated_text": "ok"}]
+    assert max(sleeps) >= 7
+    from backend.app.metrics import UPSTREAM_REQUESTS, UPSTREAM_RETRIES
+    assert UPSTREAM_RETRIES.value(upstream="retry-after.test", reason="429") == 1
+    assert UPSTREAM_REQUESTS.value(upstream="retry-after.test", status=200) == 1
+
+
+@pytest.mark.asyncio
+async def test_circuit_opens_after_repeated_failures(monkeypatch):
+    import httpx
+    from backend.app.config import settings
+    from backend.app.services import resilience
+    calls = []
+
+    async def no_sleep(delay):
+        return None
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(503)
+
+    monkeypatch.setattr(resilience.asyncio, "sleep", no_sleep)
+    monkeypatch.setattr(settings, "circuit_failure_threshold", 3)
+    agent = ResearchAgent(api_key="k", client=stub_client(handler))
+    agent.api_url = "http://failing.test/model"
+    first = await agent.execute({"query": "a"})
+    second = await agent.execute({"query": "b"})
+
+    assert "503" in first["error"]
+    assert "Circuit open" in second["error"]
+    assert len(calls) == 3
+    assert resilience.get_circuit_breaker("failing.test").state == "open"
+
+
+def test_circuit_breaker_half_open_recovery():
+    from backend.app.services.resilience import CircuitBreaker, CircuitOpenError
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=10, clock=lambda: now[0])
+    breaker.before_call()
+    breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    now[0] = 11
+    breaker.before_call()
+    assert breaker.state == "half_open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def half_open_agent(monkeypatch, host, handler):
+    from backend.app.services import resilience
+    now = [0.0]
+    breaker = resilience.CircuitBreaker(failure_threshold=1, recovery_timeout=10, clock=lambda: now[0])
+    breaker.before_call()
+    breaker.record_failure()
+    now[0] = 11
+    monkeypatch.setitem(resilience._circuit_breakers, host, breaker)
+    agent = ResearchAgent(api_key="k", client=stub_client(handler))
+    agent.api_url = f"http://{host}/model"
+    return agent, breaker
+
+
+@pytest.mark.asyncio
+async def test_half_open_trial_ending_in_429_releases_the_slot(monkeypatch):
+    import httpx
+    from backend.app.config import settings
+    from backend.app.services import resilience
+
+    async def no_sleep(delay):
+        return None
+
+    monkeypatch.setattr(resilience.asyncio, "sleep", no_sleep)
+    monkeypatch.setattr(settings, "upstream_max_attempts", 1)
+    responses = iter([httpx.Response(429), httpx.Response(200, json=[{"generated_text": "ok"}])])
+    agent, breaker = half_open_agent(monkeypatch, "half-open-429.test", lambda request: next(responses))
+
+    assert "429" in (await agent.execute({"query": "first"}))["error"]
+    assert breaker.state == "half_open"
+    # The next call gets the trial slot and closes the circuit
+    assert (await agent.execute({"query": "second"}))["results"] == [{"generated_text": "ok"}]
+    assert breaker.state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_half_open_slot_not_taken_when_deadline_already_passed(monkeypatch):
+    import httpx
+    from backend.app.services.deadlines import DeadlineExceeded, deadline_scope
+    agent, breaker = half_open_agent(monkeypatch, "half-open-deadline.test", lambda request: httpx.Response(200, json=[]))
+    with deadline_scope(0):
+        with pytest.raises(DeadlineExceeded):
+            await agent._post({"inputs": "q"})
+    breaker.before_call()
+    assert breaker.state == "half_open"
+
+
+@pytest.mark.asyncio
+async def test_half_open_slot_released_when_trial_is_cancelled(monkeypatch):
+    import httpx
+    started = asyncio.Event()
+
+    async def hang(request):
+        started.set()
+        await asyncio.sleep(10)
+        return httpx.Response(200, json=[])
+
+    agent, breaker = half_open_agent(monkeypatch, "half-open-cancel.test", hang)
+    call = asyncio.create_task(agent._post({"inputs": "q"}))
+    await started.wait()
+    call.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await call
+    breaker.before_call()
+    assert breaker.state == "half_open"
+
+
+def test_backoff_delay_is_jittered_and_capped():
+    from backend.app.services.resilience import backoff_delay, parse_retry_after
+    delays = [backoff_delay(10, base=0.5, cap=4.0) for _ in range(50)]
+    assert all(0 <= d <= 4.0 for d in delays)
+    assert len(set(delays)) > 1
+    assert backoff_delay(1, base=0.5, cap=4.0, retry_after=9) == 9
+    assert parse_retry_after("12") == 12
+    assert parse_retry_after("garbage") is None
+
+
+@pytest.mark.asyncio
+async def test_concurrent_queries_are_micro_batched():
+    import httpx
+    import json
+    bodies = []
+
+    def handler(request):
+        inputs = json.loads(request.content)["inputs"]
+        bodies.append(inputs)
+        return httpx.Response(200, json=[[{"generated_text": f"re: {q}"}] for q in inputs])
+
+    agent = ResearchAgent(api_key="k", client=stub_client(handler), batch_size=4, batch_wait_ms=20)
+    agent.api_url = "http://batching.test/model"
+    queries = [f"batch query {i}" for i in range(5)]
+    results = await asyncio.gather(*[agent.execute({"query": q}) for q in queries])
+
+    assert [len(b) for b in bodies] == [4, 1]
+    assert [r["results"][0]["generated_text"] for r in results] == [f"re: {q}" for q in queries]
+    assert all(r["citations"] == ["Generated by http://batching.test/model"] for r in results)
+
+
+@pytest.mark.asyncio
+async def test_local_backend_batches_generation_off_the_event_loop():
+    import threading
+    from backend.app.services.local_model import LocalModelBackend
+    loads, calls = [], []
+    main_thread = threading.get_ident()
+
+    def fake_pipeline_factory(task, model_path):
+        loads.append(model_path)
+
+        def pipe(queries, batch_size, **kwargs):
+            calls.append((list(queries), threading.get_ident()))
+            return [[{"generated_text": q.upper()}] for q in queries]
+        return pipe
+
+    backend = LocalModelBackend(
+        "/models/tiny", max_batch_size=3, max_wait_ms=20, pipeline_factory=fake_pipeline_factory
+    )
+    agent = ResearchAgent(api_key=None, local_backend=backend)
+    results = await asyncio.gather(*[agent.execute({"query": f"local {i}"}) for i in range(3)])
+    backend.close()
+
+    assert loads == ["/models/tiny"]
+    assert len(calls) == 1 and calls[0][1] != main_thread
+    assert results[0]["results"] == [{"generated_text": "LOCAL 0"}]
+    assert results[0]["citations"] == ["Generated by local:/models/tiny"]
+
+
+@pytest.mark.asyncio
+async def test_retries_stop_at_the_deadline():
+    import httpx
+    from backend.app.services.deadlines import deadline_scope
+    agent = ResearchAgent(api_key="k", client=stub_client(
+        lambda request: httpx.Response(503, headers={"Retry-After": "5"})
+    ))
+    agent.api_url = "http://deadline.test/model"
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    with deadline_scope(0.5):
+        with pytest.raises(httpx.HTTPStatusError):
+            await agent._post({"inputs": "q"})
+
+    assert loop.time() - start < 0.5